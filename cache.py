@@ -0,0 +1,159 @@
+"""
+Cache de respostas da API (GETs do dashboard)
+Redis quando REDIS_URL está configurado (compartilhado entre workers/instâncias),
+senão cache em memória do processo com o mesmo TTL.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Optional, Dict, Any, Awaitable, Callable
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+class ResponseCache:
+    def __init__(self, prefix: str = "v1"):
+        self.prefix = prefix
+        self.redis = None
+
+        # Fallback local: TTL por entrada (cachetools não tem TTL por item, então um cache por expire)
+        self._local: Dict[int, TTLCache] = {}
+
+        # Versão dos dados (muda a cada clear) - base do ETag das respostas em cache
+        self._version_key = f"{prefix}:etag:version"
+        self._version = str(time.time_ns())
+
+    async def connect(self):
+        redis_url = os.environ.get("REDIS_URL")
+        if not redis_url or aioredis is None:
+            logger.info("📦 Response cache: memória local (REDIS_URL não configurado)")
+            return
+
+        try:
+            self.redis = aioredis.from_url(redis_url)
+            await self.redis.ping()
+            logger.info("📦 Response cache: Redis conectado")
+        except Exception as e:
+            logger.error("❌ Redis indisponível, usando cache local: %s", e)
+            self.redis = None
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    def make_key(self, name: str, params: Dict[str, Any]) -> str:
+        """Chave = prefixo + endpoint + sha1 dos parâmetros ordenados (ex: v1:canais:<sha1>)"""
+        checksum = hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()
+        return f"{self.prefix}:{name}:{checksum}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if self.redis is not None:
+            try:
+                return await self.redis.get(key)
+            except Exception as e:
+                logger.warning("Redis get failed: %s", e)
+                return None
+
+        return self.get_local(key)
+
+    def get_local(self, key: str) -> Optional[bytes]:
+        """Só a memória do processo (sem ida ao Redis)"""
+        for local in self._local.values():
+            value = local.get(key)
+            if value is not None:
+                return value
+        return None
+
+    def set_local(self, key: str, value: bytes, expire: int):
+        if expire not in self._local:
+            self._local[expire] = TTLCache(maxsize=256, ttl=expire)
+        self._local[expire][key] = value
+
+    async def set(self, key: str, value: bytes, expire: int):
+        if self.redis is not None:
+            try:
+                await self.redis.set(key, value, ex=expire)
+            except Exception as e:
+                logger.warning("Redis set failed: %s", e)
+            return
+
+        self.set_local(key, value, expire)
+
+    @property
+    def shared_version(self) -> bool:
+        """Versão compartilhada entre workers (Redis) - sem Redis cada processo tem a sua"""
+        return self.redis is not None
+
+    async def get_version(self) -> str:
+        """Versão atual dos dados: igual entre workers com Redis, por processo sem ele"""
+        if self.redis is not None:
+            try:
+                version = await self.redis.get(self._version_key)
+                if version is None:
+                    await self.redis.set(self._version_key, str(time.time_ns()), nx=True)
+                    version = await self.redis.get(self._version_key)
+                if version is not None:
+                    return version.decode()
+            except Exception as e:
+                logger.warning("Redis version get failed: %s", e)
+        return self._version
+
+    async def clear(self):
+        """Invalida todas as respostas em cache (escritas em canais/dados)"""
+        # Memória local sempre (também guarda as entradas quentes na frente do Redis)
+        for local in self._local.values():
+            local.clear()
+        
+        if self.redis is not None:
+            try:
+                # SCAN incremental (sem KEYS bloqueando o Redis) + UNLINK em pipeline a cada 500 chaves
+                pipe = self.redis.pipeline(transaction=False)
+                pending = 0
+                async for key in self.redis.scan_iter(match=f"{self.prefix}:*", count=500):
+                    pipe.unlink(key)
+                    pending += 1
+                    if pending >= 500:
+                        await pipe.execute()
+                        pending = 0
+                if pending:
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning("Redis clear failed: %s", e)
+
+        # Nova versão depois de apagar as entradas (timestamp, não contador: o SCAN acima apaga a chave)
+        self._version = str(time.time_ns())
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._version_key, self._version)
+            except Exception as e:
+                logger.warning("Redis version set failed: %s", e)
+
+
+class QueryCoalescer:
+    """
+    Junta requisições idênticas em andamento: enquanto o loader de uma chave está rodando,
+    quem chega com a mesma chave espera o mesmo resultado em vez de disparar outra query.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(loader())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: um cliente que desconecta não cancela a query dos outros que estão esperando
+        return await asyncio.shield(future)
@@ -6,12 +6,15 @@ import html
 import urllib.parse
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional, Any, Set
-from collections import deque
 import aiohttp
 import json
+import time
 
 logger = logging.getLogger(__name__)
 
+# Quota diária da YouTube Data API por chave (units)
+QUOTA_PER_KEY = 10000
+
 # FUNÇÃO PARA DECODIFICAR HTML ENTITIES
 def decode_html_entities(text: str) -> str:
     """Decodifica HTML entities em texto (ex: &#39; -> ')"""
@@ -22,62 +25,50 @@ def decode_html_entities(text: str) -> str:
 
 class RateLimiter:
     """
-    Rate Limiter para respeitar o limite de 100 req/100s do YouTube
-    Mantém histórico de requisições e calcula automaticamente quando pode fazer nova requisição
+    Token bucket por chave para respeitar o limite de 100 req/100s do YouTube
+    Repõe max_requests/time_window tokens por segundo; burst limitado para que
+    nenhuma janela de 100s passe de burst + max_requests (10 + 90 = 100)
+    Seguro com vários workers concorrentes: checar e consumir o token acontece sem await no meio
     """
-    def __init__(self, max_requests: int = 90, time_window: int = 100):
+    def __init__(self, max_requests: int = 90, time_window: int = 100, burst: int = 10):
         """
-        max_requests: Máximo de requisições permitidas (90 para margem de segurança)
+        max_requests: Requisições por janela em regime (90 para margem de segurança)
         time_window: Janela de tempo em segundos (100s)
+        burst: Tokens acumuláveis (rajada máxima sem espera)
         """
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests = deque()  # Armazena timestamps das requisições
-
-    def _clean_old_requests(self):
-        """Remove requisições antigas (fora da janela de 100s)"""
-        now = datetime.now(timezone.utc)
-        cutoff = now - timedelta(seconds=self.time_window)
-
-        while self.requests and self.requests[0] < cutoff:
-            self.requests.popleft()
-
-    def can_make_request(self) -> bool:
-        """Verifica se pode fazer uma nova requisição"""
-        self._clean_old_requests()
-        return len(self.requests) < self.max_requests
-
-    def get_wait_time(self) -> float:
-        """Calcula quanto tempo deve aguardar antes da próxima requisição"""
-        self._clean_old_requests()
-
-        if len(self.requests) < self.max_requests:
-            return 0.0
-
-        oldest = self.requests[0]
-        now = datetime.now(timezone.utc)
-        wait = (oldest + timedelta(seconds=self.time_window)) - now
-        return max(0.0, wait.total_seconds())
-
-    def record_request(self):
-        """Registra que uma requisição foi feita"""
-        self._clean_old_requests()
-        self.requests.append(datetime.now(timezone.utc))
+        self.burst = burst
+        self.rate = max_requests / time_window  # tokens por segundo
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    async def acquire(self):
+        """Aguarda (só o necessário) até ter um token e o consome"""
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
 
-    async def wait_if_needed(self):
-        """Aguarda automaticamente se necessário antes de fazer requisição"""
-        wait_time = self.get_wait_time()
-        if wait_time > 0:
-            logger.info(f"⏳ Rate limit próximo - aguardando {wait_time:.1f}s")
-            await asyncio.sleep(wait_time + 0.5)
+            wait_time = (1 - self.tokens) / self.rate
+            if wait_time > 1:
+                logger.info(f"⏳ Rate limit próximo - aguardando {wait_time:.1f}s")
+            await asyncio.sleep(wait_time)
 
     def get_stats(self) -> Dict:
         """Retorna estatísticas do rate limiter"""
-        self._clean_old_requests()
+        self._refill()
+        in_use = self.burst - int(self.tokens)
         return {
-            "requests_in_window": len(self.requests),
-            "max_requests": self.max_requests,
-            "utilization_pct": (len(self.requests) / self.max_requests) * 100
+            "requests_in_window": in_use,
+            "max_requests": self.burst,
+            "utilization_pct": (in_use / self.burst) * 100
         }
 
 
@@ -115,7 +106,17 @@ class YouTubeCollector:
         if not self.api_keys:
             raise ValueError("At least one YouTube API key is required")
 
-        self.rate_limiters = {i: RateLimiter() for i in range(len(self.api_keys))}
+        # Chaves só mudam no restart (env) - quota total calculada uma vez
+        self.quota_total_diario = len(self.api_keys) * QUOTA_PER_KEY
+
+        # Bucket por chave, ajustável por env sem deploy de código (padrão: 90 req/100s, rajada 10)
+        rate_max_requests = int(os.environ.get("YOUTUBE_RATE_MAX_REQUESTS", 90))
+        rate_time_window = int(os.environ.get("YOUTUBE_RATE_WINDOW", 100))
+        rate_burst = int(os.environ.get("YOUTUBE_RATE_BURST", 10))
+        self.rate_limiters = {
+            i: RateLimiter(max_requests=rate_max_requests, time_window=rate_time_window, burst=rate_burst)
+            for i in range(len(self.api_keys))
+        }
 
         self.current_key_index = 0
 
@@ -140,9 +141,17 @@ class YouTubeCollector:
         # 🚀 OTIMIZAÇÃO: Cache de channel_id para evitar requisições duplicadas
         self.channel_id_cache: Dict[str, str] = {}  # {url_canal: channel_id}
 
+        # Vídeos de 30 dias já buscados por get_canal_data - get_videos_data reaproveita na mesma coleta
+        # em vez de repetir o search.list (100 units por página) e os videos.list do mesmo canal
+        self.videos_by_canal: Dict[str, List[Dict[str, Any]]] = {}
+
+        # Sessão HTTP compartilhada (criada no primeiro request, dentro do event loop):
+        # com canais em paralelo, uma sessão por request pagava DNS + handshake TLS toda vez
+        self._session: Optional[aiohttp.ClientSession] = None
+
         logger.info(f"🚀 YouTube collector initialized with {len(self.api_keys)} API keys")
-        logger.info(f"📊 Total quota disponível: {len(self.api_keys) * 10000:,} units/dia")
-        logger.info(f"📊 Rate limiter: {self.rate_limiters[0].max_requests} req/{self.rate_limiters[0].time_window}s per key")
+        logger.info(f"📊 Total quota disponível: {self.quota_total_diario:,} units/dia")
+        logger.info(f"📊 Rate limiter: token bucket {self.rate_limiters[0].max_requests} req/{self.rate_limiters[0].time_window}s (burst {self.rate_limiters[0].burst}) per key")
 
     def reset_for_new_collection(self):
         """Reset collector state - LIMPA CHAVES SE JÁ MUDOU DE DIA UTC"""
@@ -150,6 +159,7 @@ class YouTubeCollector:
         self.total_quota_units = 0
         self.quota_units_per_key = {i: 0 for i in range(len(self.api_keys))}
         self.quota_units_per_canal = {}
+        self.videos_by_canal = {}
 
         # 🚀 OTIMIZAÇÃO: NÃO limpar channel_id_cache - pode reusar entre coletas
         # Cache persiste até restart do servidor (economiza requisições)
@@ -184,7 +194,7 @@ class YouTubeCollector:
         logger.info("🔄 COLLECTOR RESET")
         logger.info(f"📅 Dia UTC atual: {today_utc}")
         logger.info(f"🔑 Chaves disponíveis: {len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)}/{len(self.api_keys)}")
-        logger.info(f"💰 Quota total disponível: {(len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * 10000:,} units")
+        logger.info(f"💰 Quota total disponível: {(len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * QUOTA_PER_KEY:,} units")
 
         if self.exhausted_keys_date:
             logger.warning(f"⚠️  Chaves esgotadas hoje:")
@@ -237,7 +247,7 @@ class YouTubeCollector:
             "exhausted_keys": len(self.exhausted_keys_date),
             "suspended_keys": len(self.suspended_keys),
             "active_keys": len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys),
-            "total_available_quota": (len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * 10000
+            "total_available_quota": (len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * QUOTA_PER_KEY
         }
 
     def get_current_api_key(self) -> Optional[str]:
@@ -276,7 +286,7 @@ class YouTubeCollector:
 
         logger.error(f"🚨 QUOTA EXCEEDED - Key {self.current_key_index + 2} EXHAUSTED até meia-noite UTC ({today_utc})")
         logger.error(f"🔑 Chaves restantes: {len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)}/{len(self.api_keys)}")
-        logger.error(f"💰 Quota restante: {(len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * 10000:,} units")
+        logger.error(f"💰 Quota restante: {(len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * QUOTA_PER_KEY:,} units")
 
         self.rotate_to_next_key()
 
@@ -286,7 +296,7 @@ class YouTubeCollector:
 
         logger.error(f"❌ KEY SUSPENDED - Key {self.current_key_index + 2} marcada como suspensa até restart")
         logger.error(f"🔑 Chaves restantes: {len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)}/{len(self.api_keys)}")
-        logger.error(f"💰 Quota restante: {(len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * 10000:,} units")
+        logger.error(f"💰 Quota restante: {(len(self.api_keys) - len(self.exhausted_keys_date) - len(self.suspended_keys)) * QUOTA_PER_KEY:,} units")
 
         self.rotate_to_next_key()
 
@@ -310,6 +320,19 @@ class YouTubeCollector:
         """Check if canal already failed"""
         return canal_url in self.failed_canals
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+            )
+        return self._session
+
+    async def close(self):
+        """Fecha a sessão HTTP compartilhada (shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     async def make_api_request(self, url: str, params: dict, canal_name: str = "system", retry_count: int = 0) -> Optional[dict]:
         """Função para fazer requisições à API do YouTube"""
         if self.all_keys_exhausted():
@@ -321,73 +344,74 @@ class YouTubeCollector:
             return None
 
         params['key'] = current_key
+        key_index = self.current_key_index
 
-        await self.rate_limiters[self.current_key_index].wait_if_needed()
+        # Token da chave que vai na requisição (outro worker pode rotacionar durante o await)
+        await self.rate_limiters[key_index].acquire()
 
         try:
-            async with aiohttp.ClientSession() as session:
-                # 🆕 CALCULAR CUSTO REAL E INCREMENTAR CORRETAMENTE
-                request_cost = self.get_request_cost(url)
-                self.increment_quota_counter(canal_name, request_cost)
-                self.rate_limiters[self.current_key_index].record_request()
-
-                # 🚀 OTIMIZAÇÃO: Removido base_delay - RateLimiter já controla requisições
-                # if self.total_quota_units > 0:
-                #     await asyncio.sleep(self.base_delay)
-
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=30)) as response:
-
-                    if response.status == 200:
-                        data = await response.json()
-                        return data
-
-                    elif response.status == 403:
-                        error_data = await response.json()
-                        error_obj = error_data.get('error', {})
-                        error_msg = error_obj.get('message', '').lower()
-                        error_reason = ''
-                        if error_obj.get('errors'):
-                            error_reason = error_obj['errors'][0].get('reason', '').lower()
-
-                        logger.warning(f"⚠️ 403 Error - Message: '{error_msg}' | Reason: '{error_reason}'")
-
-                        # CASO 1: Quota Excedida
-                        if 'quota' in error_msg or 'quota' in error_reason or 'dailylimit' in error_reason:
-                            logger.error(f"🚨 QUOTA EXCEEDED on key {self.current_key_index + 2}")
-                            self.mark_key_as_exhausted()
-
-                            if retry_count < self.max_retries and not self.all_keys_exhausted():
-                                logger.info(f"♻️ Tentando com próxima chave disponível...")
-                                return await self.make_api_request(url, params, canal_name, retry_count + 1)
-                            return None
+            session = self._get_session()
+            # 🆕 CALCULAR CUSTO REAL E INCREMENTAR CORRETAMENTE
+            request_cost = self.get_request_cost(url)
+            self.increment_quota_counter(canal_name, request_cost)
+
+            # 🚀 OTIMIZAÇÃO: Removido base_delay - RateLimiter já controla requisições
+            # if self.total_quota_units > 0:
+            #     await asyncio.sleep(self.base_delay)
+
+            async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=30)) as response:
+
+                if response.status == 200:
+                    data = await response.json()
+                    return data
+
+                elif response.status == 403:
+                    error_data = await response.json()
+                    error_obj = error_data.get('error', {})
+                    error_msg = error_obj.get('message', '').lower()
+                    error_reason = ''
+                    if error_obj.get('errors'):
+                        error_reason = error_obj['errors'][0].get('reason', '').lower()
+
+                    logger.warning(f"⚠️ 403 Error - Message: '{error_msg}' | Reason: '{error_reason}'")
+
+                    # CASO 1: Quota Excedida
+                    if 'quota' in error_msg or 'quota' in error_reason or 'dailylimit' in error_reason:
+                        logger.error(f"🚨 QUOTA EXCEEDED on key {self.current_key_index + 2}")
+                        self.mark_key_as_exhausted()
+
+                        if retry_count < self.max_retries and not self.all_keys_exhausted():
+                            logger.info(f"♻️ Tentando com próxima chave disponível...")
+                            return await self.make_api_request(url, params, canal_name, retry_count + 1)
+                        return None
 
-                        # CASO 2: Rate Limit
-                        elif 'ratelimit' in error_msg or 'ratelimit' in error_reason or 'usageratelimit' in error_reason:
-                            if retry_count < self.max_retries:
-                                wait_time = (2 ** retry_count) * 30
-                                logger.warning(f"⏱️ RATE LIMIT hit on key {self.current_key_index + 2}")
-                                logger.info(f"♻️ Retry {retry_count + 1}/{self.max_retries} após {wait_time}s")
-                                await asyncio.sleep(wait_time)
-                                return await self.make_api_request(url, params, canal_name, retry_count + 1)
-                            else:
-                                logger.error(f"❌ Max retries atingido após rate limit")
-                                return None
-
-                        # CASO 3: 🆕 Key Suspensa (403 genérico) - AGORA ROTACIONA!
+                    # CASO 2: Rate Limit
+                    elif 'ratelimit' in error_msg or 'ratelimit' in error_reason or 'usageratelimit' in error_reason:
+                        if retry_count < self.max_retries:
+                            wait_time = (2 ** retry_count) * 30
+                            logger.warning(f"⏱️ RATE LIMIT hit on key {self.current_key_index + 2}")
+                            logger.info(f"♻️ Retry {retry_count + 1}/{self.max_retries} após {wait_time}s")
+                            await asyncio.sleep(wait_time)
+                            return await self.make_api_request(url, params, canal_name, retry_count + 1)
                         else:
-                            logger.error(f"❌ KEY SUSPENDED (403 genérico) on key {self.current_key_index + 2}: {error_msg}")
-                            self.mark_key_as_suspended()
-
-                            if retry_count < self.max_retries and not self.all_keys_exhausted():
-                                logger.info(f"♻️ Tentando com próxima chave disponível...")
-                                return await self.make_api_request(url, params, canal_name, retry_count + 1)
-                            else:
-                                logger.error(f"❌ Todas as chaves esgotadas ou suspensas")
-                                return None
+                            logger.error(f"❌ Max retries atingido após rate limit")
+                            return None
 
+                    # CASO 3: 🆕 Key Suspensa (403 genérico) - AGORA ROTACIONA!
                     else:
-                        logger.warning(f"⚠️ HTTP {response.status}: {await response.text()}")
-                        return None
+                        logger.error(f"❌ KEY SUSPENDED (403 genérico) on key {self.current_key_index + 2}: {error_msg}")
+                        self.mark_key_as_suspended()
+
+                        if retry_count < self.max_retries and not self.all_keys_exhausted():
+                            logger.info(f"♻️ Tentando com próxima chave disponível...")
+                            return await self.make_api_request(url, params, canal_name, retry_count + 1)
+                        else:
+                            logger.error(f"❌ Todas as chaves esgotadas ou suspensas")
+                            return None
+
+                else:
+                    logger.warning(f"⚠️ HTTP {response.status}: {await response.text()}")
+                    return None
 
         except asyncio.TimeoutError:
             logger.warning(f"⏱️ Timeout na requisição")
@@ -742,6 +766,7 @@ class YouTubeCollector:
 
             # 🆕 BUSCA APENAS 30 DIAS (em vez de 60)
             videos = await self.get_channel_videos(channel_id, canal_name, days=30)
+            self.videos_by_canal[url_canal] = videos
 
             if not videos:
                 logger.warning(f"⚠️ {canal_name}: NENHUM vídeo encontrado nos últimos 30 dias!")
@@ -777,6 +802,11 @@ class YouTubeCollector:
             if self.is_canal_failed(url_canal):
                 return None
 
+            # Já buscados por get_canal_data nesta coleta (0 requisições)
+            videos = self.videos_by_canal.pop(url_canal, None)
+            if videos is not None:
+                return videos
+
             if self.all_keys_exhausted():
                 return None
 
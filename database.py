@@ -1,13 +1,243 @@
 import os
 import asyncio
+import base64
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional, Any
 import logging
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from cachetools import TTLCache
+import asyncpg
+import httpx
 import json
+import threading
+from collections import Counter
 
 logger = logging.getLogger(__name__)
 
+# Chave do pg_advisory_lock que garante uma única coleta no cluster (todos os workers/instâncias)
+COLLECTION_LOCK_KEY = 784512374
+
+# Colunas aceitas em order_by de /api/videos -> valor usado quando a coluna vem nula
+VIDEO_ORDER_COLUMNS = {
+    "views_atuais": 0,
+    "likes": 0,
+    "comentarios": 0,
+    "duracao": 0,
+    "data_publicacao": ""
+}
+
+
+# Linhas por upsert em lote (limite de payload do PostgREST)
+BULK_CHUNK_SIZE = 500
+
+# Colunas de videos_historico + campos do canal anexados em get_videos_with_filters (allowlist de ?fields=)
+VIDEO_TABLE_FIELDS = {"id", "canal_id", "video_id", "titulo", "url_video", "data_publicacao", "data_coleta", "views_atuais", "likes", "comentarios", "duracao"}
+VIDEO_FIELDS = VIDEO_TABLE_FIELDS | {"nome_canal", "nicho", "subnicho", "lingua"}
+
+# Campos montados por _build_canal (allowlist de ?fields= em /api/canais)
+CANAL_FIELDS = {"id", "nome_canal", "url_canal", "nicho", "subnicho", "lingua", "tipo", "status", "ultima_coleta", "views_30d", "views_15d", "views_7d", "inscritos", "engagement_rate", "videos_publicados_7d", "score_calculado", "growth_30d", "growth_7d"}
+
+
+def parse_fields(fields: Optional[str], allowed: set) -> Optional[List[str]]:
+    """?fields=a,b,c -> lista validada contra a allowlist (ValueError se tiver campo desconhecido)"""
+    if not fields:
+        return None
+
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [f for f in selected if f not in allowed]
+    if invalid:
+        raise ValueError(f"Campos inválidos em fields: {', '.join(invalid)}")
+
+    return selected or None
+
+
+def _project(rows: List[Dict], fields: Optional[List[str]]) -> List[Dict]:
+    if not fields:
+        return rows
+    return [{f: row.get(f) for f in fields} for row in rows]
+
+
+def encode_cursor(order_val: Any, row_id: int) -> str:
+    """Gera cursor opaco (base64 JSON) com a chave da última linha da página"""
+    payload = json.dumps({"order_val": order_val, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decodifica cursor gerado por encode_cursor - ValueError se inválido"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+    if not isinstance(data, dict) or "order_val" not in data or not _is_int(data.get("id")):
+        raise ValueError("Cursor inválido")
+
+    return data
+
+
+def _is_int(value: Any) -> bool:
+    # bool é subclasse de int no Python - true/false no JSON do cursor não vale como número
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_cursor_value(order_val: Any, default: Any) -> Any:
+    """
+    order_val do cursor tem que ter o tipo da coluna ordenada (default dela): número, ou string ISO
+    nas colunas de data ("" = data nula). Cursor vem do cliente - ValueError (400) em vez de comparar
+    tipos diferentes ou montar filtro com texto arbitrário.
+    """
+    if isinstance(default, str):
+        if not isinstance(order_val, str):
+            raise ValueError("Cursor inválido")
+        if order_val:
+            try:
+                datetime.fromisoformat(order_val.replace('Z', '+00:00'))
+            except ValueError:
+                raise ValueError("Cursor inválido")
+        return order_val
+
+    if not _is_number(order_val):
+        raise ValueError("Cursor inválido")
+    return order_val
+
+
+def _order_value(row: Dict, column: str, default: Any) -> Any:
+    value = row.get(column)
+    return default if value is None else value
+
+
+def _keyset_page(rows: List[Dict], column: str, default: Any, limit: int, offset: Optional[int], after: Optional[Dict[str, Any]]):
+    """
+    Pagina uma lista já ordenada DESC por (column, id).
+    Com cursor usa keyset (column, id) < (order_val, id); sem cursor cai no offset legado.
+    Retorna (página, next_cursor) - next_cursor é None quando não há mais linhas.
+    """
+    if after is not None:
+        after_key = (check_cursor_value(after["order_val"], default), after["id"])
+        rows = [r for r in rows if (_order_value(r, column, default), r["id"]) < after_key]
+        page = rows[:limit]
+        has_more = len(rows) > limit
+    else:
+        offset = offset or 0
+        page = rows[offset:offset + limit]
+        has_more = len(rows) > offset + limit
+
+    next_cursor = None
+    if has_more and page:
+        last = page[-1]
+        next_cursor = encode_cursor(_order_value(last, column, default), last["id"])
+
+    return page, next_cursor
+
+
+async def _init_pg_connection(conn):
+    """numeric -> float como no Supabase REST: Decimal não chega em response nenhuma (nem ORJSONResponse direto)"""
+    await conn.set_type_codec("numeric", encoder=str, decoder=float, schema="pg_catalog", format="text")
+
+
+# Agregados de /api/stats em uma query (GROUP BY no banco) - mesma query da RPC system_stats
+SYSTEM_STATS_SQL = """
+    SELECT json_build_object(
+        'total_canais', (SELECT COUNT(*) FROM canais_monitorados),
+        'total_videos', (SELECT COUNT(*) FROM videos_historico),
+        'last_collection', (SELECT MAX(ultima_coleta) FROM canais_monitorados),
+        'canais_ativos', (SELECT COUNT(*) FROM canais_monitorados WHERE status = 'ativo'),
+        'por_nicho', (
+            SELECT COALESCE(json_object_agg(nicho, total), '{}'::json) FROM (
+                SELECT nicho, COUNT(*) AS total FROM canais_monitorados
+                WHERE status = 'ativo' AND nicho IS NOT NULL AND nicho <> '' GROUP BY nicho
+            ) t
+        ),
+        'por_tipo', (
+            SELECT COALESCE(json_object_agg(tipo, total), '{}'::json) FROM (
+                SELECT tipo, COUNT(*) AS total FROM canais_monitorados
+                WHERE status = 'ativo' AND tipo IS NOT NULL AND tipo <> '' GROUP BY tipo
+            ) t
+        ),
+        'por_lingua', (
+            SELECT COALESCE(json_object_agg(lingua, total), '{}'::json) FROM (
+                SELECT lingua, COUNT(*) AS total FROM canais_monitorados
+                WHERE status = 'ativo' AND lingua IS NOT NULL AND lingua <> '' GROUP BY lingua
+            ) t
+        )
+    )
+"""
+
+
+# Canais ativos + histórico mais recente (a partir de $1) numa query só - filtros $2..$6 opcionais
+CANAIS_PG_SQL = """
+    SELECT c.id, c.nome_canal, c.url_canal, c.nicho, c.subnicho, c.lingua, c.tipo, c.status, c.ultima_coleta,
+           h.data_coleta, h.views_30d, h.views_15d, h.views_7d, h.inscritos,
+           h.engagement_rate::float8 AS engagement_rate, h.videos_publicados_7d
+    FROM canais_monitorados c
+    LEFT JOIN LATERAL (
+        SELECT * FROM dados_canais_historico dh
+        WHERE dh.canal_id = c.id AND dh.data_coleta >= $1
+        ORDER BY dh.data_coleta DESC
+        LIMIT 1
+    ) h ON TRUE
+    WHERE c.status = 'ativo'
+      AND ($2::text IS NULL OR c.nicho = $2)
+      AND ($3::text IS NULL OR c.subnicho = $3)
+      AND ($4::text IS NULL OR c.lingua = $4)
+      AND ($5::text IS NULL OR c.tipo = $5)
+      AND ($6::bigint[] IS NULL OR c.id = ANY($6))
+"""
+
+
+def _build_canal(item: Dict, h: Optional[Dict]) -> Dict:
+    """Monta o canal do dashboard a partir do cadastro + histórico mais recente (ou None)"""
+    canal = {
+        "id": item["id"],
+        "nome_canal": item["nome_canal"],
+        "url_canal": item["url_canal"],
+        "nicho": item["nicho"],
+        "subnicho": item["subnicho"],
+        "lingua": item.get("lingua", "N/A"),
+        "tipo": item.get("tipo", "minerado"),
+        "status": item["status"],
+        "ultima_coleta": item.get("ultima_coleta"),
+        "views_30d": 0,
+        "views_15d": 0,
+        "views_7d": 0,
+        "inscritos": 0,
+        "engagement_rate": 0.0,
+        "videos_publicados_7d": 0,
+        "score_calculado": 0,
+        "growth_30d": 0,
+        "growth_7d": 0
+    }
+    
+    # 🔧 Se tem histórico recente, usa ele
+    if h is not None:
+        canal["views_30d"] = h.get("views_30d", 0)
+        canal["views_15d"] = h.get("views_15d", 0)
+        canal["views_7d"] = h.get("views_7d", 0)
+        canal["inscritos"] = h.get("inscritos", 0)
+        canal["engagement_rate"] = h.get("engagement_rate", 0.0)
+        canal["videos_publicados_7d"] = h.get("videos_publicados_7d", 0)
+        
+        # Calcular score
+        if canal["inscritos"] > 0:
+            score = ((canal["views_30d"] / canal["inscritos"]) * 0.7) + ((canal["views_7d"] / canal["inscritos"]) * 0.3)
+            canal["score_calculado"] = round(score, 2)
+        
+        # Calcular growth 7d
+        if canal["views_7d"] > 0 and canal["views_15d"] > 0:
+            views_anterior_7d = canal["views_15d"] - canal["views_7d"]
+            if views_anterior_7d > 0:
+                growth = ((canal["views_7d"] - views_anterior_7d) / views_anterior_7d) * 100
+                canal["growth_7d"] = round(growth, 2)
+    
+    return canal
+
+
 class SupabaseClient:
     def __init__(self):
         url = os.environ.get("SUPABASE_URL")
@@ -17,14 +247,151 @@ class SupabaseClient:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
         
         self.supabase: Client = create_client(url, key)
+        self._tune_http_session()
         logger.info("Supabase client initialized")
+        
+        # Pool asyncpg opcional (DATABASE_URL) - leituras quentes direto no Postgres, sem PostgREST
+        self.database_url = os.environ.get("DATABASE_URL")
+        self.pg_pool: Optional[asyncpg.Pool] = None
+        
+        # Quota do dia muda só durante a coleta - dashboard/health fazem polling a cada poucos segundos
+        self._quota_cache: TTLCache = TTLCache(maxsize=1, ttl=30)
+        # Um refresh por vez: probes simultâneos com o cache expirado esperam a mesma query
+        self._quota_lock = asyncio.Lock()
+        
+        # Conexão que segura o advisory lock da coleta (lock de sessão - vive enquanto a conexão vive)
+        self._collection_lock_conn: Optional[asyncpg.Connection] = None
+        self._collection_lock_held = False
+        # data_inicio das coletas deste processo - heartbeat calcula a duração sem ler a linha de volta
+        self._coleta_inicio: Dict[int, datetime] = {}
+        
+        # canais_dashboard_mv (migrations/add_canais_dashboard_mv.sql) - desliga sozinho se a view não existir
+        self._canais_mv_available = True
+        # get_canais_dashboard (migrations/add_get_canais_dashboard_rpc.sql) - idem, cai na query REST da view
+        self._canais_rpc_available = True
+        # filtros_cache (migrations/add_filtros_cache_mv.sql) - idem, cai na agregação direta
+        self._filtros_mv_available = True
+        # bulk_upsert_videos (migrations/add_bulk_upsert_videos_rpc.sql) - idem, cai no upsert REST
+        self._bulk_videos_rpc_available = True
+        # Total de /api/canais por combinação de filtros - mesma ideia do _notif_count_cache
+        self._canais_count_cache: TTLCache = TTLCache(maxsize=512, ttl=60)
+        # _fetch_canais_mv roda em asyncio.to_thread - TTLCache não é thread-safe
+        self._canais_count_lock = threading.Lock()
+        # Total de /api/notificacoes/todas por filtro (vista, dias) - páginas com cursor reaproveitam o COUNT da primeira
+        self._notif_count_cache: TTLCache = TTLCache(maxsize=32, ttl=60)
+        # notificacao_stats (migrations/add_notificacao_stats_rpc.sql) - idem, cai nos COUNTs REST
+        self._notif_stats_rpc_available = True
+        # delete_canal_cascade (migrations/add_delete_canal_cascade_rpc.sql) - idem, cai nos DELETEs REST
+        self._delete_canal_rpc_available = True
+        # system_stats (migrations/add_system_stats_rpc.sql) - idem, cai na contagem em Python
+        self._system_stats_rpc_available = True
+
+    def _tune_http_session(self):
+        """
+        Troca a sessão httpx do PostgREST por uma com pool maior e keep-alive longo:
+        com to_thread/coleta concorrente o limite padrão (20 keep-alive) forçava novos handshakes TLS.
+        Limites ajustáveis por env (SUPABASE_MAX_CONNECTIONS / SUPABASE_MAX_KEEPALIVE) sem deploy de código
+        """
+        postgrest = self.supabase.postgrest
+        old_session = postgrest.session
+        postgrest.session = httpx.Client(
+            base_url=old_session.base_url,
+            headers=old_session.headers,
+            timeout=old_session.timeout,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(
+                # Keep-alive cobre o pico normal (polling de várias abas + coleta) sem reabrir conexão
+                max_keepalive_connections=int(os.environ.get("SUPABASE_MAX_KEEPALIVE", 80)),
+                max_connections=int(os.environ.get("SUPABASE_MAX_CONNECTIONS", 200)),
+                keepalive_expiry=60
+            )
+        )
+        old_session.close()
+
+    def close(self):
+        """Fecha a sessão HTTP do PostgREST (shutdown)"""
+        self.supabase.postgrest.session.close()
+
+    async def connect_pool(self):
+        if not self.database_url or self.pg_pool is not None:
+            return
+        
+        try:
+            # min_size conexões já abertas (TLS + auth feitos) quando o primeiro request chega
+            self.pg_pool = await asyncpg.create_pool(
+                self.database_url,
+                min_size=int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                max_size=int(os.environ.get("DB_POOL_MAX_SIZE", 20)),
+                command_timeout=30,
+                init=_init_pg_connection
+            )
+            logger.info("✅ asyncpg pool created (leituras via Postgres direto)")
+        except Exception as e:
+            # Sem pool o dashboard continua funcionando via Supabase REST
+            self.pg_pool = None
+            logger.error("❌ asyncpg pool failed, using Supabase REST: %s", e)
+
+    @property
+    def collection_in_progress(self) -> bool:
+        return self._collection_lock_held
+
+    async def try_acquire_collection_lock(self) -> bool:
+        """
+        Mutex da coleta. Com pool usa pg_try_advisory_lock (vale para todos os workers/instâncias
+        e é liberado pelo Postgres se o processo morrer); sem pool, só protege este processo.
+        DATABASE_URL precisa ser conexão direta/session pooler - transaction pooler não mantém lock de sessão.
+        """
+        if self._collection_lock_held:
+            return False
+        
+        if self.pg_pool is None:
+            self._collection_lock_held = True
+            return True
+        
+        conn = await self.pg_pool.acquire()
+        try:
+            acquired = await conn.fetchval("SELECT pg_try_advisory_lock($1)", COLLECTION_LOCK_KEY)
+        except Exception:
+            await self.pg_pool.release(conn)
+            raise
+        
+        if not acquired:
+            await self.pg_pool.release(conn)
+            return False
+        
+        self._collection_lock_conn = conn
+        self._collection_lock_held = True
+        return True
+
+    async def release_collection_lock(self):
+        conn = self._collection_lock_conn
+        self._collection_lock_conn = None
+        self._collection_lock_held = False
+        
+        if conn is None:
+            return
+        
+        try:
+            await conn.execute("SELECT pg_advisory_unlock($1)", COLLECTION_LOCK_KEY)
+        except Exception as e:
+            logger.error("Error releasing collection lock: %s", e)
+        finally:
+            await self.pg_pool.release(conn)
+
+    async def close_pool(self):
+        if self.pg_pool is not None:
+            await self.pg_pool.close()
+            self.pg_pool = None
+            logger.info("asyncpg pool closed")
 
     async def test_connection(self):
         try:
-            response = self.supabase.table("canais_monitorados").select("id").limit(1).execute()
+            # Em thread: os handlers (/health) fazem gather deste ping com outras consultas
+            await asyncio.to_thread(self.supabase.table("canais_monitorados").select("id").limit(1).execute)
             return True
         except Exception as e:
-            logger.error(f"Database connection test failed: {e}")
+            logger.error("Database connection test failed: %s", e)
             raise
 
     async def upsert_canal(self, canal_data: Dict[str, Any]) -> Dict:
@@ -42,7 +409,7 @@ class SupabaseClient:
             logger.info(f"Canal upserted: {canal_data.get('nome_canal')}")
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error upserting canal: {e}")
+            logger.error("Error upserting canal: %s", e)
             raise
 
     async def get_canais_for_collection(self) -> List[Dict]:
@@ -51,91 +418,136 @@ class SupabaseClient:
             logger.info(f"Found {len(response.data)} canais needing collection")
             return response.data
         except Exception as e:
-            logger.error(f"Error getting canais for collection: {e}")
+            logger.error("Error getting canais for collection: %s", e)
             raise
 
+    def build_canal_row(self, canal_id: int, data: Dict[str, Any], data_coleta: str) -> Optional[Dict[str, Any]]:
+        """Linha de dados_canais_historico - None quando todas as views são zero (não salva)"""
+        # 🔧 CORREÇÃO: Voltei a checar views_60d (não gasta API, é só validação!)
+        views_60d = data.get("views_60d", 0)
+        views_30d = data.get("views_30d", 0)
+        views_15d = data.get("views_15d", 0)
+        views_7d = data.get("views_7d", 0)
+        
+        # Check if at least one view metric is > 0
+        if views_60d == 0 and views_30d == 0 and views_15d == 0 and views_7d == 0:
+            logger.warning(f"Skipping save for canal_id {canal_id} - all views zero")
+            return None
+        
+        return {
+            "canal_id": canal_id,
+            "data_coleta": data_coleta,
+            "views_30d": data.get("views_30d"),
+            "views_15d": data.get("views_15d"),
+            "views_7d": data.get("views_7d"),
+            "inscritos": data.get("inscritos"),
+            "videos_publicados_7d": data.get("videos_publicados_7d", 0),
+            "engagement_rate": data.get("engagement_rate", 0.0)
+        }
+
     async def save_canal_data(self, canal_id: int, data: Dict[str, Any]):
         try:
             data_coleta = datetime.now(timezone.utc).date().isoformat()
             
-            # 🔧 CORREÇÃO: Voltei a checar views_60d (não gasta API, é só validação!)
-            views_60d = data.get("views_60d", 0)
-            views_30d = data.get("views_30d", 0)
-            views_15d = data.get("views_15d", 0)
-            views_7d = data.get("views_7d", 0)
-            
-            # Check if at least one view metric is > 0
-            if views_60d == 0 and views_30d == 0 and views_15d == 0 and views_7d == 0:
-                logger.warning(f"Skipping save for canal_id {canal_id} - all views zero")
+            canal_data = self.build_canal_row(canal_id, data, data_coleta)
+            if canal_data is None:
                 return None
             
-            existing = self.supabase.table("dados_canais_historico").select("*").eq("canal_id", canal_id).eq("data_coleta", data_coleta).execute()
-            
-            canal_data = {
-                "canal_id": canal_id,
-                "data_coleta": data_coleta,
-                "views_30d": data.get("views_30d"),
-                "views_15d": data.get("views_15d"),
-                "views_7d": data.get("views_7d"),
-                "inscritos": data.get("inscritos"),
-                "videos_publicados_7d": data.get("videos_publicados_7d", 0),
-                "engagement_rate": data.get("engagement_rate", 0.0)
-            }
-            
-            if existing.data:
-                response = self.supabase.table("dados_canais_historico").update(canal_data).eq("canal_id", canal_id).eq("data_coleta", data_coleta).execute()
-            else:
-                response = self.supabase.table("dados_canais_historico").insert(canal_data).execute()
-            
-            return response.data
+            return await self.bulk_save_canal_data([canal_data])
         except Exception as e:
-            logger.error(f"Error saving canal data: {e}")
+            logger.error("Error saving canal data: %s", e)
             raise
 
+    async def bulk_save_canal_data(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Upsert em lote (chunks de BULK_CHUNK_SIZE) - unique (canal_id, data_coleta), ver migration.
+        returning=minimal e fora do event loop: a coleta continua buscando canais durante o flush.
+        """
+        for i in range(0, len(rows), BULK_CHUNK_SIZE):
+            await asyncio.to_thread(
+                self.supabase.table("dados_canais_historico")
+                .upsert(rows[i:i + BULK_CHUNK_SIZE], on_conflict="canal_id,data_coleta", returning="minimal")
+                .execute
+            )
+        return len(rows)
+
+    def build_video_row(self, canal_id: int, video: Dict[str, Any], data_coleta: str) -> Dict[str, Any]:
+        return {
+            "canal_id": canal_id,
+            "video_id": video.get("video_id"),
+            "titulo": video.get("titulo"),
+            "url_video": video.get("url_video"),
+            "data_publicacao": video.get("data_publicacao"),
+            "data_coleta": data_coleta,
+            "views_atuais": video.get("views_atuais"),
+            "likes": video.get("likes"),
+            "comentarios": video.get("comentarios"),
+            "duracao": video.get("duracao")
+        }
+
     async def save_videos_data(self, canal_id: int, videos: List[Dict[str, Any]]):
         try:
             if not videos:
                 return []
                 
             current_date = datetime.now(timezone.utc).date().isoformat()
+            rows = [self.build_video_row(canal_id, video, current_date) for video in videos]
             
-            saved_videos = []
-            for video in videos:
-                try:
-                    video_data = {
-                        "canal_id": canal_id,
-                        "video_id": video.get("video_id"),
-                        "titulo": video.get("titulo"),
-                        "url_video": video.get("url_video"),
-                        "data_publicacao": video.get("data_publicacao"),
-                        "data_coleta": current_date,
-                        "views_atuais": video.get("views_atuais"),
-                        "likes": video.get("likes"),
-                        "comentarios": video.get("comentarios"),
-                        "duracao": video.get("duracao")
-                    }
-                    
-                    existing = self.supabase.table("videos_historico").select("id").eq("video_id", video_data["video_id"]).eq("data_coleta", current_date).execute()
-                    
-                    if existing.data:
-                        response = self.supabase.table("videos_historico").update(video_data).eq("video_id", video_data["video_id"]).eq("data_coleta", current_date).execute()
-                    else:
-                        response = self.supabase.table("videos_historico").insert(video_data).execute()
-                    
-                    if response.data:
-                        saved_videos.extend(response.data)
-                        
-                except Exception as video_error:
-                    logger.warning(f"Error saving individual video {video.get('video_id')}: {video_error}")
-                    continue
+            saved_count = await self.save_videos_batch(rows)
             
-            logger.info(f"Saved {len(saved_videos)} videos for canal {canal_id}")
-            return saved_videos
+            logger.info(f"Saved {saved_count} videos for canal {canal_id}")
+            return saved_count
             
         except Exception as e:
-            logger.error(f"Error saving videos data: {e}")
+            logger.error("Error saving videos data: %s", e)
             raise
 
+    async def save_videos_batch(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Upsert em lote de vídeos (de um ou vários canais) -> quantidade de linhas gravadas.
+        Via RPC bulk_upsert_videos (um INSERT ... SELECT por chunk, sem devolver as linhas; linha igual à
+        já gravada no dia não é reescrita - migration update_bulk_upsert_videos_skip_unchanged);
+        sem a função, upsert REST com returning=minimal. Chunks de BULK_CHUNK_SIZE por round trip.
+        Round trips em asyncio.to_thread (não trava os outros canais da coleta).
+        Cada row precisa de canal_id, video_id e data_coleta (ver build_video_row);
+        unique (video_id, data_coleta) garantido pela migration add_historico_unique_keys.
+        """
+        if not rows:
+            return 0
+        
+        # Um vídeo aparece uma vez por data_coleta - última ocorrência vence
+        # (ON CONFLICT não aceita a mesma chave duas vezes no mesmo comando)
+        unique_rows = {}
+        for row in rows:
+            if row.get("video_id"):
+                unique_rows[(row["video_id"], row["data_coleta"])] = row
+        unique_rows = list(unique_rows.values())
+        
+        saved_count = 0
+        for i in range(0, len(unique_rows), BULK_CHUNK_SIZE):
+            chunk = unique_rows[i:i + BULK_CHUNK_SIZE]
+            
+            if self._bulk_videos_rpc_available:
+                try:
+                    response = await asyncio.to_thread(self.supabase.rpc("bulk_upsert_videos", {"payload": chunk}).execute)
+                    saved_count += response.data or 0
+                    continue
+                except APIError as e:
+                    # PGRST202: função não existe (migration não aplicada)
+                    if e.code != "PGRST202":
+                        raise
+                    logger.warning("bulk_upsert_videos não existe - usando upsert REST")
+                    self._bulk_videos_rpc_available = False
+            
+            await asyncio.to_thread(
+                self.supabase.table("videos_historico")
+                .upsert(chunk, on_conflict="video_id,data_coleta", returning="minimal")
+                .execute
+            )
+            saved_count += len(chunk)
+        
+        return saved_count
+
     async def update_last_collection(self, canal_id: int):
         try:
             response = self.supabase.table("canais_monitorados").update({
@@ -143,13 +555,33 @@ class SupabaseClient:
             }).eq("id", canal_id).execute()
             return response.data
         except Exception as e:
-            logger.error(f"Error updating last collection: {e}")
+            logger.error("Error updating last collection: %s", e)
+            raise
+
+    async def update_last_collection_batch(self, canal_ids: List[int], ts: Optional[str] = None) -> int:
+        """
+        Marca ultima_coleta de vários canais num único UPDATE ... WHERE id IN (...) -> quantidade de canais.
+        returning=minimal: o PostgREST não devolve as linhas inteiras de canais_monitorados.
+        """
+        try:
+            if not canal_ids:
+                return 0
+            
+            await asyncio.to_thread(
+                self.supabase.table("canais_monitorados").update({
+                    "ultima_coleta": ts or datetime.now(timezone.utc).isoformat()
+                }, returning="minimal").in_("id", canal_ids).execute
+            )
+            return len(canal_ids)
+        except Exception as e:
+            logger.error("Error updating last collection (batch): %s", e)
             raise
 
     async def create_coleta_log(self, canais_total: int) -> int:
         try:
+            data_inicio = datetime.now(timezone.utc)
             response = self.supabase.table("coletas_historico").insert({
-                "data_inicio": datetime.now(timezone.utc).isoformat(),
+                "data_inicio": data_inicio.isoformat(),
                 "status": "em_progresso",
                 "canais_total": canais_total,
                 "canais_sucesso": 0,
@@ -159,24 +591,30 @@ class SupabaseClient:
             }).execute()
             
             coleta_id = response.data[0]["id"]
+            self._coleta_inicio[coleta_id] = data_inicio
+            self._quota_cache.clear()
             return coleta_id
         except Exception as e:
-            logger.error(f"Error creating coleta log: {e}")
+            logger.error("Error creating coleta log: %s", e)
             raise
 
-    async def update_coleta_log(self, coleta_id: int, status: str, canais_sucesso: int, canais_erro: int, videos_coletados: int, requisicoes_usadas: int = 0, mensagem_erro: Optional[str] = None):
+    async def update_coleta_log(self, coleta_id: int, status: str, canais_sucesso: int, canais_erro: int, videos_coletados: int, requisicoes_usadas: int = 0, mensagem_erro: Optional[str] = None, erros_por_tipo: Optional[Dict[str, int]] = None):
         try:
-            data_inicio_response = self.supabase.table("coletas_historico").select("data_inicio").eq("id", coleta_id).execute()
-            
-            if data_inicio_response.data:
-                data_inicio = datetime.fromisoformat(data_inicio_response.data[0]["data_inicio"].replace('Z', '+00:00'))
-                data_fim = datetime.now(timezone.utc)
-                duracao = int((data_fim - data_inicio).total_seconds())
-            else:
-                duracao = 0
+            # Início guardado em create_coleta_log: o heartbeat (a cada 30s) faz só o UPDATE.
+            # Coleta de outro processo/antes do restart ainda lê data_inicio do banco
+            data_inicio = self._coleta_inicio.get(coleta_id)
+            if data_inicio is None:
+                data_inicio_response = await asyncio.to_thread(
+                    self.supabase.table("coletas_historico").select("data_inicio").eq("id", coleta_id).execute
+                )
+                if data_inicio_response.data:
+                    data_inicio = datetime.fromisoformat(data_inicio_response.data[0]["data_inicio"].replace('Z', '+00:00'))
+            
+            data_fim = datetime.now(timezone.utc)
+            duracao = int((data_fim - data_inicio).total_seconds()) if data_inicio else 0
             
             update_data = {
-                "data_fim": datetime.now(timezone.utc).isoformat(),
+                "data_fim": data_fim.isoformat(),
                 "status": status,
                 "canais_sucesso": canais_sucesso,
                 "canais_erro": canais_erro,
@@ -187,31 +625,55 @@ class SupabaseClient:
             
             if mensagem_erro:
                 update_data["mensagem_erro"] = mensagem_erro
+            if erros_por_tipo is not None:
+                update_data["erros_por_tipo"] = erros_por_tipo
             
-            response = self.supabase.table("coletas_historico").update(update_data).eq("id", coleta_id).execute()
+            response = await asyncio.to_thread(
+                self.supabase.table("coletas_historico").update(update_data).eq("id", coleta_id).execute
+            )
+            if status != "em_progresso":
+                self._coleta_inicio.pop(coleta_id, None)
             
+            # requisicoes_usadas mudou - /health e /api/coletas/historico não podem ficar 30s atrás
+            self._quota_cache.clear()
             return response.data
         except Exception as e:
-            logger.error(f"Error updating coleta log: {e}")
+            logger.error("Error updating coleta log: %s", e)
             raise
 
     async def get_coletas_historico(self, limit: int = 20) -> List[Dict]:
         try:
-            response = self.supabase.table("coletas_historico").select("*").order("data_inicio", desc=True).limit(limit).execute()
+            response = await asyncio.to_thread(
+                self.supabase.table("coletas_historico").select("*").order("data_inicio", desc=True).limit(limit).execute
+            )
             return response.data if response.data else []
         except Exception as e:
-            logger.error(f"Error fetching coletas historico: {e}")
+            logger.error("Error fetching coletas historico: %s", e)
             raise
 
+    async def collection_completed_since(self, since: str) -> bool:
+        """Se já existe coleta concluída (sucesso/parcial) iniciada a partir de `since` (ISO)"""
+        try:
+            response = await asyncio.to_thread(
+                self.supabase.table("coletas_historico").select("id").in_("status", ["sucesso", "parcial"]).gte("data_inicio", since).limit(1).execute
+            )
+            return bool(response.data)
+        except Exception as e:
+            logger.error("Error checking completed collections: %s", e)
+            return False
+
     async def cleanup_stuck_collections(self) -> int:
         try:
             # Aumentado de 1h para 2h - coletas demoram 60-80min para 263 canais
             duas_horas_atras = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
 
-            response = self.supabase.table("coletas_historico").update({
-                "status": "erro",
-                "mensagem_erro": "Coleta travada - marcada como erro automaticamente (timeout 2h)"
-            }).eq("status", "em_progresso").lt("data_inicio", duas_horas_atras).execute()
+            # to_thread: roda dentro do _collection_start_lock (main._check_and_acquire_collection)
+            response = await asyncio.to_thread(
+                self.supabase.table("coletas_historico").update({
+                    "status": "erro",
+                    "mensagem_erro": "Coleta travada - marcada como erro automaticamente (timeout 2h)"
+                }).eq("status", "em_progresso").lt("data_inicio", duas_horas_atras).execute
+            )
 
             count = len(response.data) if response.data else 0
             if count > 0:
@@ -219,153 +681,347 @@ class SupabaseClient:
 
             return count
         except Exception as e:
-            logger.error(f"Error cleaning up stuck collections: {e}")
+            logger.error("Error cleaning up stuck collections: %s", e)
             return 0
 
+    async def get_coleta(self, coleta_id: int) -> Optional[Dict]:
+        try:
+            response = await asyncio.to_thread(
+                self.supabase.table("coletas_historico").select("*").eq("id", coleta_id).limit(1).execute
+            )
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error("Error fetching coleta: %s", e)
+            raise
+
     async def delete_coleta(self, coleta_id: int):
         try:
             response = self.supabase.table("coletas_historico").delete().eq("id", coleta_id).execute()
             return response.data
         except Exception as e:
-            logger.error(f"Error deleting coleta: {e}")
+            logger.error("Error deleting coleta: %s", e)
             raise
 
     async def get_quota_diaria_usada(self) -> int:
         try:
             hoje = datetime.now(timezone.utc).date().isoformat()
             
-            response = self.supabase.table("coletas_historico").select("requisicoes_usadas").gte("data_inicio", hoje).execute()
+            # Cache de 30s por dia UTC (chave muda na virada do dia)
+            cached = self._quota_cache.get(hoje)
+            if cached is not None:
+                return cached
             
-            total = sum(coleta.get("requisicoes_usadas", 0) for coleta in response.data)
-            
-            return total
+            async with self._quota_lock:
+                # Outro probe pode ter preenchido o cache enquanto este esperava o lock
+                cached = self._quota_cache.get(hoje)
+                if cached is not None:
+                    return cached
+                
+                response = await asyncio.to_thread(
+                    self.supabase.table("coletas_historico").select("requisicoes_usadas").gte("data_inicio", hoje).execute
+                )
+                
+                total = sum(coleta.get("requisicoes_usadas", 0) for coleta in response.data)
+                
+                self._quota_cache[hoje] = total
+                return total
         except Exception as e:
-            logger.error(f"Error getting daily quota: {e}")
+            logger.error("Error getting daily quota: %s", e)
             return 0
 
-    async def get_canais_with_filters(self, nicho: Optional[str] = None, subnicho: Optional[str] = None, lingua: Optional[str] = None, tipo: Optional[str] = None, views_30d_min: Optional[int] = None, views_15d_min: Optional[int] = None, views_7d_min: Optional[int] = None, score_min: Optional[float] = None, growth_min: Optional[float] = None, limit: int = 500, offset: int = 0) -> List[Dict]:
-        try:
-            # 🔧 CORREÇÃO CRÍTICA: Buscar apenas histórico dos últimos 2 dias
-            # Isso garante que sempre pega os dados MAIS RECENTES e evita carregar dados antigos
-            dois_dias_atras = (datetime.now(timezone.utc) - timedelta(days=2)).date().isoformat()
-            
-            logger.info(f"📊 Buscando histórico a partir de: {dois_dias_atras}")
-            
-            query = self.supabase.table("canais_monitorados").select("*").eq("status", "ativo")
-            
+    def _fetch_canais_rest(self, desde, nicho, subnicho, lingua, tipo, ids) -> List[tuple]:
+        """Canais ativos + histórico mais recente via Supabase REST -> [(canal, historico|None)]"""
+        query = self.supabase.table("canais_monitorados").select("*").eq("status", "ativo")
+        
+        # Igualdades na ordem das colunas de idx_canais_tipo_nicho (tipo, nicho, subnicho)
+        if tipo:
+            query = query.eq("tipo", tipo)
+        if nicho:
+            query = query.eq("nicho", nicho)
+        if subnicho:
+            query = query.eq("subnicho", subnicho)
+        if lingua:
+            query = query.eq("lingua", lingua)
+        if ids is not None:
+            query = query.in_("id", ids)
+        
+        canais_response = query.execute()
+        
+        # 🔧 BUSCAR APENAS HISTÓRICO RECENTE (últimos 2 dias)
+        historico_query = self.supabase.table("dados_canais_historico")\
+            .select("*")\
+            .gte("data_coleta", desde.isoformat())
+        
+        if ids is not None:
+            historico_query = historico_query.in_("canal_id", ids)
+        
+        historico_response = historico_query.execute()
+        
+        logger.info(f"📊 Histórico carregado: {len(historico_response.data)} linhas (otimizado)")
+        
+        # 🔧 Pegar o MAIS RECENTE de cada canal (ordenando por data DESC)
+        historico_dict = {}
+        for h in historico_response.data:
+            canal_id = h["canal_id"]
+            data_coleta = h.get("data_coleta", "")
+            
+            if canal_id not in historico_dict:
+                historico_dict[canal_id] = h
+            elif data_coleta > historico_dict[canal_id].get("data_coleta", ""):
+                # 🔧 SEMPRE pega o mais recente
+                historico_dict[canal_id] = h
+        
+        logger.info(f"📊 Canais com histórico: {len(historico_dict)}")
+        
+        return [(item, historico_dict.get(item["id"])) for item in canais_response.data]
+
+    async def _fetch_canais_pg(self, desde, nicho, subnicho, lingua, tipo, ids) -> List[tuple]:
+        """Mesmo resultado de _fetch_canais_rest numa única query (LATERAL pega o histórico mais recente)"""
+        async with self.pg_pool.acquire() as conn:
+            # SQL fixo (filtros opcionais via "$n IS NULL OR ...") -> asyncpg reaproveita o
+            # prepared statement da conexão e o Postgres o plano, qualquer que seja o filtro
+            records = await conn.fetch(
+                CANAIS_PG_SQL,
+                desde,
+                nicho or None,
+                subnicho or None,
+                lingua or None,
+                tipo or None,
+                list(ids) if ids is not None else None
+            )
+        
+        rows = []
+        for record in records:
+            row = dict(record)
+            if row["ultima_coleta"] is not None:
+                # Mesmo formato (ISO string) que o PostgREST devolve
+                row["ultima_coleta"] = row["ultima_coleta"].isoformat()
+            rows.append((row, row if row["data_coleta"] is not None else None))
+        
+        logger.info(f"📊 Canais carregados via asyncpg: {len(rows)}")
+        return rows
+
+    def _fetch_canais_mv(self, nicho, subnicho, lingua, tipo, ids, views_30d_min, views_15d_min, views_7d_min, score_min, growth_min, limit: int, offset: int, after: Optional[Dict[str, Any]], include_total: bool = False):
+        """
+        Página de canais já montados (score/growth calculados no banco) direto da materialized view.
+        Filtros, keyset (score_calculado, id) < cursor e LIMIT vão todos para o Postgres - só a página
+        sai do banco (índice idx_canais_dashboard_mv_score). Busca limit+1 linhas para saber se há próxima.
+        Via RPC get_canais_dashboard (filtros como parâmetros de uma função SQL); sem a função, query REST na view.
+        Retorna (linhas, total) - total só com include_total: count=exact guardado por filtro (senão None).
+        """
+        # Valores do cursor entram no texto do filtro or_(): só número (order_val) e int (id, já checado
+        # em decode_cursor) - texto do cliente viraria termo de filtro extra. Checado antes de qualquer query
+        order_val = check_cursor_value(after["order_val"], 0) if after else None
+        
+        count_key = (nicho, subnicho, lingua, tipo, tuple(ids) if ids is not None else None,
+                     views_30d_min, views_15d_min, views_7d_min, score_min, growth_min)
+        
+        def _filtros(query):
+            if tipo:
+                query = query.eq("tipo", tipo)
             if nicho:
                 query = query.eq("nicho", nicho)
             if subnicho:
                 query = query.eq("subnicho", subnicho)
             if lingua:
                 query = query.eq("lingua", lingua)
-            if tipo:
-                query = query.eq("tipo", tipo)
-            
-            canais_response = query.execute()
-            
-            # 🔧 BUSCAR APENAS HISTÓRICO RECENTE (últimos 2 dias)
-            historico_response = self.supabase.table("dados_canais_historico")\
-                .select("*")\
-                .gte("data_coleta", dois_dias_atras)\
-                .execute()
+            if ids is not None:
+                query = query.in_("id", ids)
+            
+            for campo, minimo in (
+                ("score_calculado", score_min),
+                ("growth_7d", growth_min),
+                ("views_7d", views_7d_min),
+                ("views_15d", views_15d_min),
+                ("views_30d", views_30d_min),
+            ):
+                if minimo:
+                    query = query.gte(campo, minimo)
+            return query
+        
+        # COUNT só quando pedido, e no máximo um por filtro a cada 60s (cache). Com cursor o count do
+        # request só contaria o restante: sem total guardado faz o COUNT separado
+        with self._canais_count_lock:
+            total = self._canais_count_cache.get(count_key) if include_total else None
+        if include_total and total is None and after:
+            count_response = _filtros(self.supabase.table("canais_dashboard_mv").select("id", count="exact", head=True)).execute()
+            total = count_response.count or 0
+            with self._canais_count_lock:
+                self._canais_count_cache[count_key] = total
+        count = "exact" if include_total and total is None else None
+        
+        def _pagina(query):
+            if after:
+                return query.or_(
+                    f'score_calculado.lt.{order_val},and(score_calculado.eq.{order_val},id.lt.{after["id"]})'
+                ).limit(limit + 1)
+            return query.range(offset, offset + limit)
+        
+        response = None
+        if self._canais_rpc_available:
+            try:
+                # 0/None = filtro desligado (mesma regra do `if minimo` de _filtros).
+                # postgrest.rpc direto: o rpc() do client não repassa count. ORDER BY explícito: o da função
+                # não é garantido depois do wrapper do PostgREST, e o keyset depende dele
+                response = _pagina(self.supabase.postgrest.rpc("get_canais_dashboard", {
+                    "p_tipo": tipo or None,
+                    "p_nicho": nicho or None,
+                    "p_subnicho": subnicho or None,
+                    "p_lingua": lingua or None,
+                    "p_ids": ids,
+                    "p_views_30d_min": views_30d_min or None,
+                    "p_views_15d_min": views_15d_min or None,
+                    "p_views_7d_min": views_7d_min or None,
+                    "p_score_min": score_min or None,
+                    "p_growth_min": growth_min or None,
+                }, count=count).order("score_calculado", desc=True).order("id", desc=True)).execute()
+            except APIError as e:
+                # PGRST202: função não existe (migration não aplicada)
+                if e.code != "PGRST202":
+                    raise
+                logger.warning("get_canais_dashboard não existe - filtrando a view via REST")
+                self._canais_rpc_available = False
+        
+        if response is None:
+            query = _filtros(self.supabase.table("canais_dashboard_mv").select("*", count=count))
+            response = _pagina(query.order("score_calculado", desc=True).order("id", desc=True)).execute()
+        
+        if count is not None:
+            total = response.count or 0
+            with self._canais_count_lock:
+                self._canais_count_cache[count_key] = total
+        
+        return response.data or [], total
+
+    async def refresh_canais_dashboard_mv(self):
+        """REFRESH CONCURRENTLY da canais_dashboard_mv (fim da coleta / mudança em canais) - falha só loga"""
+        if not self._canais_mv_available:
+            return
+        try:
+            await asyncio.to_thread(self.supabase.rpc("refresh_canais_dashboard_mv").execute)
+        except Exception as e:
+            logger.error("Error refreshing canais_dashboard_mv: %s", e)
+
+    async def refresh_filtros_cache(self):
+        """REFRESH CONCURRENTLY da filtros_cache - falha só loga"""
+        if not self._filtros_mv_available:
+            return
+        try:
+            await asyncio.to_thread(self.supabase.rpc("refresh_filtros_cache").execute)
+        except Exception as e:
+            logger.error("Error refreshing filtros_cache: %s", e)
+
+    async def refresh_dashboard_views(self):
+        """Materialized views do dashboard - chamar depois de coleta e de mudança em canais_monitorados"""
+        await self.refresh_canais_dashboard_mv()
+        await self.refresh_filtros_cache()
+
+    async def get_canais_with_filters(self, nicho: Optional[str] = None, subnicho: Optional[str] = None, lingua: Optional[str] = None, tipo: Optional[str] = None, views_30d_min: Optional[int] = None, views_15d_min: Optional[int] = None, views_7d_min: Optional[int] = None, score_min: Optional[float] = None, growth_min: Optional[float] = None, limit: int = 500, offset: int = 0, after: Optional[Dict[str, Any]] = None, ids: Optional[List[int]] = None, fields: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+        selected_fields = parse_fields(fields, CANAL_FIELDS)
+        try:
+            # 🔧 CORREÇÃO CRÍTICA: Buscar apenas histórico dos últimos 2 dias
+            # Isso garante que sempre pega os dados MAIS RECENTES e evita carregar dados antigos
+            dois_dias_atras = (datetime.now(timezone.utc) - timedelta(days=2)).date()
             
-            logger.info(f"📊 Histórico carregado: {len(historico_response.data)} linhas (otimizado)")
+            logger.info(f"📊 Buscando histórico a partir de: {dois_dias_atras.isoformat()}")
             
-            # 🔧 Pegar o MAIS RECENTE de cada canal (ordenando por data DESC)
-            historico_dict = {}
-            for h in historico_response.data:
-                canal_id = h["canal_id"]
-                data_coleta = h.get("data_coleta", "")
-                
-                if canal_id not in historico_dict:
-                    historico_dict[canal_id] = h
-                elif data_coleta > historico_dict[canal_id].get("data_coleta", ""):
-                    # 🔧 SEMPRE pega o mais recente
-                    historico_dict[canal_id] = h
-            
-            logger.info(f"📊 Canais com histórico: {len(historico_dict)}")
-            
-            canais = []
-            for item in canais_response.data:
-                canal = {
-                    "id": item["id"],
-                    "nome_canal": item["nome_canal"],
-                    "url_canal": item["url_canal"],
-                    "nicho": item["nicho"],
-                    "subnicho": item["subnicho"],
-                    "lingua": item.get("lingua", "N/A"),
-                    "tipo": item.get("tipo", "minerado"),
-                    "status": item["status"],
-                    "ultima_coleta": item.get("ultima_coleta"),
-                    "views_30d": 0,
-                    "views_15d": 0,
-                    "views_7d": 0,
-                    "inscritos": 0,
-                    "engagement_rate": 0.0,
-                    "videos_publicados_7d": 0,
-                    "score_calculado": 0,
-                    "growth_30d": 0,
-                    "growth_7d": 0
-                }
-                
-                # 🔧 Se tem histórico recente, usa ele
-                if item["id"] in historico_dict:
-                    h = historico_dict[item["id"]]
-                    
-                    canal["views_30d"] = h.get("views_30d", 0)
-                    canal["views_15d"] = h.get("views_15d", 0)
-                    canal["views_7d"] = h.get("views_7d", 0)
-                    canal["inscritos"] = h.get("inscritos", 0)
-                    canal["engagement_rate"] = h.get("engagement_rate", 0.0)
-                    canal["videos_publicados_7d"] = h.get("videos_publicados_7d", 0)
-                    
-                    # Calcular score
-                    if canal["inscritos"] > 0:
-                        score = ((canal["views_30d"] / canal["inscritos"]) * 0.7) + ((canal["views_7d"] / canal["inscritos"]) * 0.3)
-                        canal["score_calculado"] = round(score, 2)
+            if self._canais_mv_available:
+                try:
+                    # COUNT/RPC/REST da view são chamadas síncronas do supabase-py: fora do event loop
+                    rows, total = await asyncio.to_thread(
+                        self._fetch_canais_mv, nicho, subnicho, lingua, tipo, ids, views_30d_min, views_15d_min, views_7d_min, score_min, growth_min, limit, offset or 0, after, include_total
+                    )
+                    logger.info(f"✅ Retornando {min(len(rows), limit)} canais filtrados")
                     
-                    # Calcular growth 7d
-                    if canal["views_7d"] > 0 and canal["views_15d"] > 0:
-                        views_anterior_7d = canal["views_15d"] - canal["views_7d"]
-                        if views_anterior_7d > 0:
-                            growth = ((canal["views_7d"] - views_anterior_7d) / views_anterior_7d) * 100
-                            canal["growth_7d"] = round(growth, 2)
-                
-                canais.append(canal)
-            
-            # Aplicar filtros numéricos
-            if views_30d_min:
-                canais = [c for c in canais if c.get("views_30d", 0) >= views_30d_min]
-            if views_15d_min:
-                canais = [c for c in canais if c.get("views_15d", 0) >= views_15d_min]
-            if views_7d_min:
-                canais = [c for c in canais if c.get("views_7d", 0) >= views_7d_min]
-            if score_min:
-                canais = [c for c in canais if c.get("score_calculado", 0) >= score_min]
-            if growth_min:
-                canais = [c for c in canais if c.get("growth_7d", 0) >= growth_min]
-            
-            # Ordenar por score
-            canais.sort(key=lambda x: x.get("score_calculado", 0), reverse=True)
+                    # Página já cortada no banco (limit+1 linhas): a sobra só indica que há próxima
+                    page = rows[:limit]
+                    next_cursor = None
+                    if len(rows) > limit and page:
+                        next_cursor = encode_cursor(page[-1]["score_calculado"], page[-1]["id"])
+                    return {"canais": _project(page, selected_fields), "total": total, "next_cursor": next_cursor}
+                except APIError as e:
+                    # 42P01 / PGRST205: migration da view ainda não aplicada -> caminho antigo
+                    if e.code not in ("42P01", "PGRST205"):
+                        raise
+                    logger.warning("canais_dashboard_mv não existe - calculando score na aplicação")
+                    self._canais_mv_available = False
+            
+            if self.pg_pool is not None:
+                rows = await self._fetch_canais_pg(dois_dias_atras, nicho, subnicho, lingua, tipo, ids)
+            else:
+                rows = await asyncio.to_thread(self._fetch_canais_rest, dois_dias_atras, nicho, subnicho, lingua, tipo, ids)
+            
+            canais = [_build_canal(item, h) for item, h in rows]
+            
+            # Sem a view: filtros numéricos e ordenação na aplicação.
+            # Uma só passada, score/growth primeiro (mais seletivos, cortam a avaliação do resto)
+            predicados = [
+                (campo, minimo) for campo, minimo in (
+                    ("score_calculado", score_min),
+                    ("growth_7d", growth_min),
+                    ("views_7d", views_7d_min),
+                    ("views_15d", views_15d_min),
+                    ("views_30d", views_30d_min),
+                ) if minimo
+            ]
+            if predicados:
+                canais = [c for c in canais if all(c.get(campo, 0) >= minimo for campo, minimo in predicados)]
+            
+            # Ordenar por score (id desempata - mesma chave usada pelo cursor)
+            canais.sort(key=lambda x: (x.get("score_calculado", 0), x["id"]), reverse=True)
             
             logger.info(f"✅ Retornando {len(canais)} canais filtrados")
             
-            return canais[offset:offset + limit]
+            # total real do filtro (não só da página) - já está em memória, sem COUNT extra
+            page, next_cursor = _keyset_page(canais, "score_calculado", 0, limit, offset, after)
+            return {"canais": _project(page, selected_fields), "total": len(canais) if include_total else None, "next_cursor": next_cursor}
             
+        except ValueError:
+            # Cursor inválido - erro do cliente (400), sem traceback no log
+            raise
         except Exception as e:
-            logger.error(f"Error fetching canais with filters: {e}")
+            logger.error("Error fetching canais with filters: %s", e)
             import traceback
             logger.error(traceback.format_exc())
             raise
 
-    async def get_videos_with_filters(self, nicho: Optional[str] = None, subnicho: Optional[str] = None, lingua: Optional[str] = None, canal: Optional[str] = None, periodo_publicacao: str = "30d", views_min: Optional[int] = None, growth_min: Optional[float] = None, order_by: str = "views_atuais", limit: int = 500, offset: int = 0) -> List[Dict]:
+    async def get_videos_with_filters(self, nicho: Optional[str] = None, subnicho: Optional[str] = None, lingua: Optional[str] = None, canal: Optional[str] = None, periodo_publicacao: str = "30d", views_min: Optional[int] = None, growth_min: Optional[float] = None, order_by: str = "views_atuais", limit: int = 500, offset: int = 0, after: Optional[Dict[str, Any]] = None, fields: Optional[str] = None, include_total: bool = False) -> Dict[str, Any]:
+        selected_fields = parse_fields(fields, VIDEO_FIELDS)
         try:
             days_map = {"30d": 30, "15d": 15, "7d": 7}
             days = days_map.get(periodo_publicacao, 30)
             cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+            order_column = order_by if order_by in VIDEO_ORDER_COLUMNS else "views_atuais"
+            
+            # Projeção no SELECT: só as colunas pedidas + as que dedupe/filtro/ordenação/cursor usam
+            if selected_fields:
+                columns = (set(selected_fields) & VIDEO_TABLE_FIELDS) | {"id", "canal_id", "video_id", "data_coleta", "views_atuais", order_column}
+                select = ",".join(sorted(columns))
+            else:
+                select = "*"
             
-            all_videos_response = self.supabase.table("videos_historico").select("*").gte("data_publicacao", cutoff_date).execute()
+            # Filtros de canal resolvidos antes: a query de vídeos já sai restrita a esses canal_ids
+            # (idx_videos_canal_periodo) em vez de trazer o período inteiro e filtrar na aplicação
+            canais_dict = None
+            if nicho or subnicho or lingua or canal:
+                canais_query = self.supabase.table("canais_monitorados").select("id, nome_canal, nicho, subnicho, lingua")
+                if nicho:
+                    canais_query = canais_query.eq("nicho", nicho)
+                if subnicho:
+                    canais_query = canais_query.eq("subnicho", subnicho)
+                if lingua:
+                    canais_query = canais_query.eq("lingua", lingua)
+                if canal:
+                    canais_query = canais_query.eq("nome_canal", canal)
+                canais_dict = {c["id"]: c for c in (await asyncio.to_thread(canais_query.execute)).data}
+                
+                if not canais_dict:
+                    return {"videos": [], "total": 0 if include_total else None, "next_cursor": None}
+            
+            videos_query = self.supabase.table("videos_historico").select(select).gte("data_publicacao", cutoff_date)
+            if canais_dict is not None:
+                videos_query = videos_query.in_("canal_id", list(canais_dict))
+            all_videos_response = await asyncio.to_thread(videos_query.execute)
             
             videos_dict = {}
             for video in all_videos_response.data:
@@ -383,9 +1039,12 @@ class SupabaseClient:
                 videos = [v for v in videos if v.get("views_atuais", 0) >= views_min]
             
             if videos:
-                canal_ids = list(set(v["canal_id"] for v in videos))
-                canais_response = self.supabase.table("canais_monitorados").select("*").in_("id", canal_ids).execute()
-                canais_dict = {c["id"]: c for c in canais_response.data}
+                if canais_dict is None:
+                    canal_ids = list(set(v["canal_id"] for v in videos))
+                    canais_response = await asyncio.to_thread(
+                        self.supabase.table("canais_monitorados").select("id, nome_canal, nicho, subnicho, lingua").in_("id", canal_ids).execute
+                    )
+                    canais_dict = {c["id"]: c for c in canais_response.data}
                 
                 for video in videos:
                     canal_info = canais_dict.get(video["canal_id"], {})
@@ -393,35 +1052,65 @@ class SupabaseClient:
                     video["nicho"] = canal_info.get("nicho", "Unknown")
                     video["subnicho"] = canal_info.get("subnicho", "Unknown")
                     video["lingua"] = canal_info.get("lingua", "N/A")
-                
-                if nicho:
-                    videos = [v for v in videos if v.get("nicho") == nicho]
-                if subnicho:
-                    videos = [v for v in videos if v.get("subnicho") == subnicho]
-                if lingua:
-                    videos = [v for v in videos if v.get("lingua") == lingua]
-                if canal:
-                    videos = [v for v in videos if v.get("nome_canal") == canal]
             
-            return videos
+            # Ordenação DESC por (order_by, id) - mesma chave usada pelo cursor
+            default = VIDEO_ORDER_COLUMNS[order_column]
+            videos.sort(key=lambda v: (_order_value(v, order_column, default), v["id"]), reverse=True)
+            
+            page, next_cursor = _keyset_page(videos, order_column, default, limit, offset, after)
+            return {"videos": _project(page, selected_fields), "total": len(videos) if include_total else None, "next_cursor": next_cursor}
+        except ValueError:
+            # Cursor inválido - erro do cliente (400), sem traceback no log
+            raise
         except Exception as e:
-            logger.error(f"Error fetching videos with filters: {e}")
+            logger.error("Error fetching videos with filters: %s", e)
             import traceback
             logger.error(traceback.format_exc())
             raise
             
     async def get_filter_options(self) -> Dict[str, List]:
         try:
-            nichos_response = self.supabase.table("canais_monitorados").select("nicho").execute()
+            if self._filtros_mv_available:
+                try:
+                    # Linha única já agregada e ordenada pela view
+                    response = await asyncio.to_thread(self.supabase.table("filtros_cache").select("nichos,subnichos,linguas,canais").limit(1).execute)
+                    if response.data:
+                        return response.data[0]
+                except APIError as e:
+                    if e.code not in ("42P01", "PGRST205"):
+                        raise
+                    logger.warning("filtros_cache não existe - agregando canais_monitorados")
+                    self._filtros_mv_available = False
+            
+            if self.pg_pool is not None:
+                # Uma única query no lugar de 4 chamadas REST
+                async with self.pg_pool.acquire() as conn:
+                    row = await conn.fetchrow("""
+                        SELECT
+                            array_agg(DISTINCT nicho) FILTER (WHERE nicho IS NOT NULL AND nicho <> '') AS nichos,
+                            array_agg(DISTINCT subnicho) FILTER (WHERE subnicho IS NOT NULL AND subnicho <> '') AS subnichos,
+                            array_agg(DISTINCT lingua) FILTER (WHERE lingua IS NOT NULL AND lingua <> '') AS linguas,
+                            array_agg(nome_canal) FILTER (WHERE status = 'ativo') AS canais
+                        FROM canais_monitorados
+                    """)
+                
+                return {
+                    "nichos": sorted(row["nichos"] or []),
+                    "subnichos": sorted(row["subnichos"] or []),
+                    "linguas": sorted(row["linguas"] or []),
+                    "canais": sorted(row["canais"] or [])
+                }
+            
+            nichos_response = await asyncio.to_thread(self.supabase.table("canais_monitorados").select("nicho").execute)
             nichos = list(set(item["nicho"] for item in nichos_response.data if item["nicho"]))
             
-            subnichos_response = self.supabase.table("canais_monitorados").select("subnicho").execute()
+            subnichos_response = await asyncio.to_thread(self.supabase.table("canais_monitorados").select("subnicho").execute)
             subnichos = list(set(item["subnicho"] for item in subnichos_response.data if item["subnicho"]))
             
-            linguas_response = self.supabase.table("canais_monitorados").select("lingua").execute()
+            linguas_response = await asyncio.to_thread(self.supabase.table("canais_monitorados").select("lingua").execute)
             linguas = list(set(item["lingua"] for item in linguas_response.data if item.get("lingua")))
             
-            canais_response = self.supabase.table("canais_monitorados").select("nome_canal").eq("status", "ativo").execute()
+            canais_response = await asyncio.to_thread(self.supabase.table("canais_monitorados").select("nome_canal").eq("status", "ativo").execute)
             canais = [item["nome_canal"] for item in canais_response.data]
             
             return {
@@ -431,28 +1120,59 @@ class SupabaseClient:
                 "canais": sorted(canais)
             }
         except Exception as e:
-            logger.error(f"Error fetching filter options: {e}")
+            logger.error("Error fetching filter options: %s", e)
             raise
 
     async def get_system_stats(self) -> Dict[str, Any]:
+        """
+        Agregados do dashboard: um GROUP BY no banco (pool ou RPC system_stats), um round trip.
+        Calculado no fim da coleta e guardado no cache de respostas (ver main.warm_response_cache).
+        """
         try:
-            canais_response = self.supabase.table("canais_monitorados").select("id", count="exact").execute()
-            total_canais = canais_response.count
+            if self.pg_pool is not None:
+                async with self.pg_pool.acquire() as conn:
+                    stats = json.loads(await conn.fetchval(SYSTEM_STATS_SQL))
+                return {**stats, "system_status": "healthy"}
+            
+            if self._system_stats_rpc_available:
+                try:
+                    response = await asyncio.to_thread(self.supabase.rpc("system_stats").execute)
+                    return {**response.data, "system_status": "healthy"}
+                except APIError as e:
+                    # PGRST202: função não existe (migration não aplicada)
+                    if e.code != "PGRST202":
+                        raise
+                    logger.warning("system_stats não existe - contando canais na aplicação")
+                    self._system_stats_rpc_available = False
+            
+            canais_response = await asyncio.to_thread(
+                self.supabase.table("canais_monitorados").select("nicho,tipo,lingua,status,ultima_coleta", count="exact").execute
+            )
+            canais = canais_response.data or []
+            if canais_response.count is not None and len(canais) < canais_response.count:
+                logger.warning("get_system_stats: max-rows cortou canais_monitorados (%s de %s) - aplicar migrations/add_system_stats_rpc.sql", len(canais), canais_response.count)
             
-            videos_response = self.supabase.table("videos_historico").select("id", count="exact").execute()
+            # head=True: só o COUNT (Content-Range), sem trazer ids
+            videos_response = await asyncio.to_thread(
+                self.supabase.table("videos_historico").select("id", count="exact", head=True).execute
+            )
             total_videos = videos_response.count
             
-            last_collection_response = self.supabase.table("canais_monitorados").select("ultima_coleta").order("ultima_coleta", desc=True).limit(1).execute()
-            last_collection = last_collection_response.data[0]["ultima_coleta"] if last_collection_response.data else None
+            coletas = [c["ultima_coleta"] for c in canais if c.get("ultima_coleta")]
+            ativos = [c for c in canais if c.get("status") == "ativo"]
             
             return {
-                "total_canais": total_canais,
+                "total_canais": canais_response.count if canais_response.count is not None else len(canais),
                 "total_videos": total_videos,
-                "last_collection": last_collection,
+                "last_collection": max(coletas) if coletas else None,
+                "canais_ativos": len(ativos),
+                "por_nicho": dict(Counter(c["nicho"] for c in ativos if c.get("nicho"))),
+                "por_tipo": dict(Counter(c["tipo"] for c in ativos if c.get("tipo"))),
+                "por_lingua": dict(Counter(c["lingua"] for c in ativos if c.get("lingua"))),
                 "system_status": "healthy"
             }
         except Exception as e:
-            logger.error(f"Error fetching system stats: {e}")
+            logger.error("Error fetching system stats: %s", e)
             raise
 
     async def cleanup_old_data(self):
@@ -464,24 +1184,26 @@ class SupabaseClient:
             
             logger.info(f"Cleaned up old data before {cutoff_date}")
         except Exception as e:
-            logger.error(f"Error cleaning up old data: {e}")
+            logger.error("Error cleaning up old data: %s", e)
             raise
 
     async def add_favorito(self, tipo: str, item_id: int) -> Dict:
+        """
+        Um round trip: upsert em (tipo, item_id) devolve o favorito novo ou o já existente.
+        Item inexistente -> trigger no banco levanta 23503 (foreign_key_violation), ver migration.
+        """
         try:
-            existing = self.supabase.table("favoritos").select("*").eq("tipo", tipo).eq("item_id", item_id).execute()
-            
-            if existing.data:
-                return existing.data[0]
-            
-            response = self.supabase.table("favoritos").insert({
+            response = self.supabase.table("favoritos").upsert({
                 "tipo": tipo,
                 "item_id": item_id
-            }).execute()
+            }, on_conflict="tipo,item_id").execute()
             
             return response.data[0] if response.data else None
+        except APIError:
+            # 23503 vira 404 no endpoint - não é erro do servidor
+            raise
         except Exception as e:
-            logger.error(f"Error adding favorito: {e}")
+            logger.error("Error adding favorito: %s", e)
             raise
 
     async def remove_favorito(self, tipo: str, item_id: int):
@@ -489,7 +1211,7 @@ class SupabaseClient:
             response = self.supabase.table("favoritos").delete().eq("tipo", tipo).eq("item_id", item_id).execute()
             return response.data
         except Exception as e:
-            logger.error(f"Error removing favorito: {e}")
+            logger.error("Error removing favorito: %s", e)
             raise
 
     async def get_favoritos_canais(self) -> List[Dict]:
@@ -499,72 +1221,142 @@ class SupabaseClient:
             if not favoritos_response.data:
                 return []
             
-            canal_ids = [fav["item_id"] for fav in favoritos_response.data]
-            canais = await self.get_canais_with_filters(limit=1000)
-            canais_favoritos = [c for c in canais if c["id"] in canal_ids]
+            # Busca só os canais favoritos (filtro no banco) em vez de montar todos os canais
+            canal_ids = list({fav["item_id"] for fav in favoritos_response.data})
+            result = await self.get_canais_with_filters(ids=canal_ids, limit=len(canal_ids))
             
-            return canais_favoritos
+            return result["canais"]
         except Exception as e:
-            logger.error(f"Error fetching favoritos canais: {e}")
+            logger.error("Error fetching favoritos canais: %s", e)
             raise
 
     async def get_favoritos_videos(self) -> List[Dict]:
         try:
-            favoritos_response = self.supabase.table("favoritos").select("item_id").eq("tipo", "video").execute()
+            favoritos_response = await asyncio.to_thread(
+                self.supabase.table("favoritos").select("item_id").eq("tipo", "video").execute
+            )
             
             if not favoritos_response.data:
                 return []
             
             video_ids = [fav["item_id"] for fav in favoritos_response.data]
-            videos_response = self.supabase.table("videos_historico").select("*").in_("id", video_ids).execute()
-            videos = videos_response.data
             
-            if videos:
-                canal_ids = list(set(v["canal_id"] for v in videos))
-                canais_response = self.supabase.table("canais_monitorados").select("*").in_("id", canal_ids).execute()
-                canais_dict = {c["id"]: c for c in canais_response.data}
-                
-                for video in videos:
-                    canal_info = canais_dict.get(video["canal_id"], {})
-                    video["nome_canal"] = canal_info.get("nome_canal", "Unknown")
-                    video["nicho"] = canal_info.get("nicho", "Unknown")
-                    video["subnicho"] = canal_info.get("subnicho", "Unknown")
-                    video["lingua"] = canal_info.get("lingua", "N/A")
+            # Vídeos + dados do canal em uma única query (embed via FK videos_historico.canal_id)
+            videos_response = await asyncio.to_thread(
+                self.supabase.table("videos_historico")
+                .select("*, canais_monitorados(nome_canal, nicho, subnicho, lingua)")
+                .in_("id", video_ids)
+                .execute
+            )
+            videos = videos_response.data or []
+            
+            for video in videos:
+                canal_info = video.pop("canais_monitorados", None) or {}
+                video["nome_canal"] = canal_info.get("nome_canal", "Unknown")
+                video["nicho"] = canal_info.get("nicho", "Unknown")
+                video["subnicho"] = canal_info.get("subnicho", "Unknown")
+                video["lingua"] = canal_info.get("lingua", "N/A")
             
             return videos
         except Exception as e:
-            logger.error(f"Error fetching favoritos videos: {e}")
+            logger.error("Error fetching favoritos videos: %s", e)
             raise
 
-    async def delete_canal_permanently(self, canal_id: int):
+    async def delete_canal_permanently(self, canal_id: int) -> bool:
+        """
+        Apaga o canal com notificações, histórico e favoritos -> False se o canal não existe.
+        Via RPC delete_canal_cascade (um round trip, uma transação); sem a função, DELETEs REST em sequência.
+        """
         try:
-            self.supabase.table("videos_historico").delete().eq("canal_id", canal_id).execute()
-            self.supabase.table("dados_canais_historico").delete().eq("canal_id", canal_id).execute()
-            self.supabase.table("favoritos").delete().eq("tipo", "canal").eq("item_id", canal_id).execute()
-            self.supabase.table("canais_monitorados").delete().eq("id", canal_id).execute()
-            
-            return True
+            if self._delete_canal_rpc_available:
+                try:
+                    response = await asyncio.to_thread(
+                        self.supabase.rpc("delete_canal_cascade", {"p_canal_id": canal_id}).execute
+                    )
+                    return bool(response.data)
+                except APIError as e:
+                    # PGRST202: função não existe (migration não aplicada)
+                    if e.code != "PGRST202":
+                        raise
+                    logger.warning("delete_canal_cascade não existe - usando DELETEs REST")
+                    self._delete_canal_rpc_available = False
+            
+            def _delete_rest():
+                self.supabase.table("notificacoes").delete(returning="minimal").eq("canal_id", canal_id).execute()
+                self.supabase.table("videos_historico").delete(returning="minimal").eq("canal_id", canal_id).execute()
+                self.supabase.table("dados_canais_historico").delete(returning="minimal").eq("canal_id", canal_id).execute()
+                self.supabase.table("favoritos").delete(returning="minimal").eq("tipo", "canal").eq("item_id", canal_id).execute()
+                return self.supabase.table("canais_monitorados").delete().eq("id", canal_id).execute()
+            
+            response = await asyncio.to_thread(_delete_rest)
+            return bool(response.data)
         except Exception as e:
-            logger.error(f"Error deleting canal permanently: {e}")
+            logger.error("Error deleting canal permanently: %s", e)
             raise
 
     async def get_notificacoes_all(self, limit: int = 500, offset: int = 0, vista_filter: Optional[bool] = None, dias: Optional[int] = 30) -> List[Dict]:
+        page = await self.get_notificacoes_page(limit=limit, offset=offset, vista_filter=vista_filter, dias=dias)
+        return page["notificacoes"]
+
+    async def get_notificacoes_page(self, limit: int = 500, offset: int = 0, vista_filter: Optional[bool] = None, dias: Optional[int] = 30, after: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Página de notificações + total real do filtro + next_cursor.
+        Primeira página: count=exact no mesmo request (header Content-Range), guardado por filtro.
+        Com cursor (after): keyset em (data_disparo DESC, id DESC) - sem OFFSET - e o total
+        vem do COUNT guardado (o count do request com cursor só contaria o restante).
+        Cursor com data_disparo inválida -> ValueError (400 no endpoint).
+        """
+        # order_val vai para o texto do filtro or_(): só a saída de isoformat() de uma data válida,
+        # nunca o texto do cliente (aspas nele fechariam o valor e abririam termos de filtro novos)
+        after_disparo = None
+        if after:
+            if not isinstance(after["order_val"], str):
+                raise ValueError("Cursor inválido")
+            try:
+                after_disparo = datetime.fromisoformat(after["order_val"].replace('Z', '+00:00')).isoformat()
+            except ValueError:
+                raise ValueError("Cursor inválido")
+        
         try:
-            query = self.supabase.table("notificacoes").select(
-                "*, canais_monitorados(subnicho)"
-            )
-            
-            if dias is not None:
-                data_limite = (datetime.now(timezone.utc) - timedelta(days=dias)).isoformat()
-                query = query.gte("data_disparo", data_limite)
+            data_limite = (datetime.now(timezone.utc) - timedelta(days=dias)).isoformat() if dias is not None else None
+            
+            def _filtros(query):
+                if data_limite is not None:
+                    query = query.gte("data_disparo", data_limite)
+                if vista_filter is not None:
+                    query = query.eq("vista", vista_filter)
+                return query
+            
+            count_key = (vista_filter, dias)
+            total = None
+            if after:
+                total = self._notif_count_cache.get(count_key)
+                if total is None:
+                    count_response = await asyncio.to_thread(
+                        _filtros(self.supabase.table("notificacoes").select("id", count="exact", head=True)).execute
+                    )
+                    total = count_response.count or 0
+                    self._notif_count_cache[count_key] = total
+            
+            query = _filtros(self.supabase.table("notificacoes").select(
+                "*, canais_monitorados(subnicho)", count="exact" if total is None else None
+            )).order("data_disparo", desc=True).order("id", desc=True)
+            
+            if after:
+                query = query.or_(
+                    f'data_disparo.lt."{after_disparo}",and(data_disparo.eq."{after_disparo}",id.lt.{after["id"]})'
+                ).limit(limit)
+            else:
+                query = query.range(offset, offset + limit - 1)
             
-            if vista_filter is not None:
-                query = query.eq("vista", vista_filter)
+            response = await asyncio.to_thread(query.execute)
             
-            response = query.order("data_disparo", desc=True).range(offset, offset + limit - 1).execute()
+            if total is None:
+                total = response.count or 0
+                self._notif_count_cache[count_key] = total
             
             if not response.data:
-                return []
+                return {"notificacoes": [], "total": total, "next_cursor": None}
             
             notificacoes = response.data
             
@@ -591,10 +1383,15 @@ class SupabaseClient:
                     notif["subnicho"] = None
                 notif.pop("canais_monitorados", None)
             
-            return notificacoes
+            next_cursor = None
+            if len(notificacoes) == limit:
+                last = notificacoes[-1]
+                next_cursor = encode_cursor(last["data_disparo"], last["id"])
+            
+            return {"notificacoes": notificacoes, "total": total, "next_cursor": next_cursor}
         except Exception as e:
-            logger.error(f"Erro ao buscar notificacoes: {e}")
-            return []
+            logger.error("Erro ao buscar notificacoes: %s", e)
+            return {"notificacoes": [], "total": 0, "next_cursor": None}
     
     async def marcar_notificacao_vista(self, notif_id: int) -> bool:
         """
@@ -608,7 +1405,7 @@ class SupabaseClient:
             
             return True
         except Exception as e:
-            logger.error(f"Erro ao marcar notificacao como vista: {e}")
+            logger.error("Erro ao marcar notificacao como vista: %s", e)
             return False
     
     async def desmarcar_notificacao_vista(self, notif_id: int) -> bool:
@@ -630,7 +1427,7 @@ class SupabaseClient:
             
             return True
         except Exception as e:
-            logger.error(f"Erro ao desmarcar notificacao como vista: {e}")
+            logger.error("Erro ao desmarcar notificacao como vista: %s", e)
             return False
     
     async def marcar_todas_notificacoes_vistas(self) -> int:
@@ -645,25 +1442,69 @@ class SupabaseClient:
             
             return len(response.data) if response.data else 0
         except Exception as e:
-            logger.error(f"Erro ao marcar todas notificacoes como vistas: {e}")
+            logger.error("Erro ao marcar todas notificacoes como vistas: %s", e)
             return 0
     
     async def get_notificacao_stats(self) -> Dict:
         try:
-            total_response = self.supabase.table("notificacoes").select("id", count="exact").execute()
+            hoje = datetime.now(timezone.utc).date()
+            semana_atras = datetime.now(timezone.utc) - timedelta(days=7)
+            
+            if self.pg_pool is not None:
+                # Um scan, um round trip (no lugar de 4 COUNTs via REST)
+                async with self.pg_pool.acquire() as conn:
+                    row = await conn.fetchrow("""
+                        SELECT
+                            COUNT(*) AS total,
+                            COUNT(*) FILTER (WHERE vista = false) AS nao_vistas,
+                            COUNT(*) FILTER (WHERE data_disparo >= $1::timestamptz) AS hoje,
+                            COUNT(*) FILTER (WHERE data_disparo >= $2::timestamptz) AS esta_semana
+                        FROM notificacoes
+                    """, datetime(hoje.year, hoje.month, hoje.day, tzinfo=timezone.utc), semana_atras)
+                
+                return {
+                    "total": row["total"],
+                    "nao_vistas": row["nao_vistas"],
+                    "vistas": row["total"] - row["nao_vistas"],
+                    "hoje": row["hoje"],
+                    "esta_semana": row["esta_semana"]
+                }
+            
+            if self._notif_stats_rpc_available:
+                try:
+                    # Mesma query do pool, via RPC (migrations/add_notificacao_stats_rpc.sql)
+                    response = await asyncio.to_thread(self.supabase.rpc("notificacao_stats", {
+                        "p_hoje": hoje.isoformat(),
+                        "p_semana": semana_atras.isoformat()
+                    }).execute)
+                    row = response.data[0]
+                    return {
+                        "total": row["total"],
+                        "nao_vistas": row["nao_vistas"],
+                        "vistas": row["total"] - row["nao_vistas"],
+                        "hoje": row["hoje"],
+                        "esta_semana": row["esta_semana"]
+                    }
+                except APIError as e:
+                    # PGRST202: função não existe (migration não aplicada)
+                    if e.code != "PGRST202":
+                        raise
+                    logger.warning("notificacao_stats não existe - usando COUNTs REST")
+                    self._notif_stats_rpc_available = False
+            
+            # head=True: só o COUNT (header Content-Range), sem trazer os ids
+            total_response = self.supabase.table("notificacoes").select("id", count="exact", head=True).execute()
             total = total_response.count if total_response.count else 0
             
-            nao_vistas_response = self.supabase.table("notificacoes").select("id", count="exact").eq("vista", False).execute()
+            nao_vistas_response = self.supabase.table("notificacoes").select("id", count="exact", head=True).eq("vista", False).execute()
             nao_vistas = nao_vistas_response.count if nao_vistas_response.count else 0
             
             vistas = total - nao_vistas
             
-            hoje = datetime.now(timezone.utc).date().isoformat()
-            hoje_response = self.supabase.table("notificacoes").select("id", count="exact").gte("data_disparo", hoje).execute()
+            hoje_response = self.supabase.table("notificacoes").select("id", count="exact", head=True).gte("data_disparo", hoje.isoformat()).execute()
             hoje_count = hoje_response.count if hoje_response.count else 0
             
-            semana_atras = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-            semana_response = self.supabase.table("notificacoes").select("id", count="exact").gte("data_disparo", semana_atras).execute()
+            semana_response = self.supabase.table("notificacoes").select("id", count="exact", head=True).gte("data_disparo", semana_atras.isoformat()).execute()
             semana_count = semana_response.count if semana_response.count else 0
             
             return {
@@ -674,7 +1515,7 @@ class SupabaseClient:
                 "esta_semana": semana_count
             }
         except Exception as e:
-            logger.error(f"Erro ao buscar estatisticas de notificacoes: {e}")
+            logger.error("Erro ao buscar estatisticas de notificacoes: %s", e)
             return {
                 "total": 0,
                 "nao_vistas": 0,
@@ -688,7 +1529,7 @@ class SupabaseClient:
             response = self.supabase.table("regras_notificacoes").select("*").order("views_minimas", desc=False).execute()
             return response.data if response.data else []
         except Exception as e:
-            logger.error(f"Erro ao buscar regras de notificacoes: {e}")
+            logger.error("Erro ao buscar regras de notificacoes: %s", e)
             return []
     
     async def create_regra_notificacao(self, regra_data: Dict) -> Optional[Dict]:
@@ -706,7 +1547,7 @@ class SupabaseClient:
                 return response.data[0]
             return None
         except Exception as e:
-            logger.error(f"Erro ao criar regra de notificacao: {e}")
+            logger.error("Erro ao criar regra de notificacao: %s", e)
             return None
     
     async def update_regra_notificacao(self, regra_id: int, regra_data: Dict) -> Optional[Dict]:
@@ -724,7 +1565,7 @@ class SupabaseClient:
                 return response.data[0]
             return None
         except Exception as e:
-            logger.error(f"Erro ao atualizar regra de notificacao: {e}")
+            logger.error("Erro ao atualizar regra de notificacao: %s", e)
             return None
     
     async def delete_regra_notificacao(self, regra_id: int) -> bool:
@@ -732,7 +1573,7 @@ class SupabaseClient:
             response = self.supabase.table("regras_notificacoes").delete().eq("id", regra_id).execute()
             return True
         except Exception as e:
-            logger.error(f"Erro ao deletar regra de notificacao: {e}")
+            logger.error("Erro ao deletar regra de notificacao: %s", e)
             return False
     
     async def toggle_regra_notificacao(self, regra_id: int) -> Optional[Dict]:
@@ -750,12 +1591,15 @@ class SupabaseClient:
             
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Erro ao toggle regra de notificacao: {e}")
+            logger.error("Erro ao toggle regra de notificacao: %s", e)
             return None
 
     async def get_cached_transcription(self, video_id: str):
         try:
-            response = self.supabase.table("transcriptions").select("*").eq("video_id", video_id).execute()
+            # Fora do event loop: a sessão do PostgREST é síncrona
+            response = await asyncio.to_thread(
+                self.supabase.table("transcriptions").select("transcription").eq("video_id", video_id).limit(1).execute
+            )
             
             if response.data and len(response.data) > 0:
                 logger.info(f"✅ Cache hit for video: {video_id}")
@@ -764,7 +1608,7 @@ class SupabaseClient:
             logger.info(f"❌ Cache miss for video: {video_id}")
             return None
         except Exception as e:
-            logger.error(f"Error fetching cached transcription: {e}")
+            logger.error("Error fetching cached transcription: %s", e)
             return None
     
     async def save_transcription_cache(self, video_id: str, transcription: str):
@@ -775,12 +1619,12 @@ class SupabaseClient:
                 "updated_at": datetime.now(timezone.utc).isoformat()
             }
             
-            response = self.supabase.table("transcriptions").upsert(data).execute()
+            response = await asyncio.to_thread(self.supabase.table("transcriptions").upsert(data).execute)
             
             logger.info(f"💾 Transcription cached for video: {video_id}")
             return response.data[0] if response.data else None
         except Exception as e:
-            logger.error(f"Error saving transcription cache: {e}")
+            logger.error("Error saving transcription cache: %s", e)
             return None
 
     # =========================================================================
@@ -803,7 +1647,7 @@ class SupabaseClient:
             
             return response.data if response.data else []
         except Exception as e:
-            logger.error(f"Erro ao buscar keyword analysis: {e}")
+            logger.error("Erro ao buscar keyword analysis: %s", e)
             return []
 
     async def get_title_patterns(self, subniche: str, period_days: int = 30) -> List[Dict]:
@@ -822,7 +1666,7 @@ class SupabaseClient:
             
             return response.data if response.data else []
         except Exception as e:
-            logger.error(f"Erro ao buscar title patterns: {e}")
+            logger.error("Erro ao buscar title patterns: %s", e)
             return []
 
     async def get_top_channels_snapshot(self, subniche: str) -> List[Dict]:
@@ -840,7 +1684,7 @@ class SupabaseClient:
             
             return response.data if response.data else []
         except Exception as e:
-            logger.error(f"Erro ao buscar top channels: {e}")
+            logger.error("Erro ao buscar top channels: %s", e)
             return []
 
     async def get_gap_analysis(self, subniche: str = None) -> List[Dict]:
@@ -859,7 +1703,7 @@ class SupabaseClient:
             
             return response.data if response.data else []
         except Exception as e:
-            logger.error(f"Erro ao buscar gap analysis: {e}")
+            logger.error("Erro ao buscar gap analysis: %s", e)
             return []
 
     async def get_weekly_report_latest(self) -> Optional[Dict]:
@@ -879,7 +1723,7 @@ class SupabaseClient:
             
             return None
         except Exception as e:
-            logger.error(f"Erro ao buscar weekly report: {e}")
+            logger.error("Erro ao buscar weekly report: %s", e)
             return None
 
     async def get_all_subniches(self) -> List[str]:
@@ -896,7 +1740,7 @@ class SupabaseClient:
 
             return []
         except Exception as e:
-            logger.error(f"Erro ao buscar subniches: {e}")
+            logger.error("Erro ao buscar subniches: %s", e)
             return []
 
     # =========================================================================
@@ -951,7 +1795,7 @@ class SupabaseClient:
             return True
 
         except Exception as e:
-            logger.error(f"Erro ao salvar subniche trends snapshot: {e}")
+            logger.error("Erro ao salvar subniche trends snapshot: %s", e)
             return False
 
     async def get_subniche_trends_snapshot(self, period_days: int) -> List[Dict]:
@@ -994,7 +1838,7 @@ class SupabaseClient:
             return []
 
         except Exception as e:
-            logger.error(f"Erro ao buscar subniche trends snapshot: {e}")
+            logger.error("Erro ao buscar subniche trends snapshot: %s", e)
             return []
 
     async def get_all_subniche_trends(self) -> Dict[str, List[Dict]]:
@@ -1016,5 +1860,5 @@ class SupabaseClient:
                 "30d": trends_30d
             }
         except Exception as e:
-            logger.error(f"Erro ao buscar all subniche trends: {e}")
+            logger.error("Erro ao buscar all subniche trends: %s", e)
             return {"7d": [], "15d": [], "30d": []}
@@ -1,34 +1,139 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 import os
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
+from dataclasses import dataclass, field
+from zoneinfo import ZoneInfo
+from collections import Counter
 import asyncio
 import logging
 import uuid
-import threading
 import time
-
-from database import SupabaseClient
-from collector import YouTubeCollector
+import hashlib
+import orjson
+import httpx
+from decimal import Decimal
+
+# uvloop/httptools quando instalados - o uvicorn cria o loop (uvloop.install() é deprecated desde o 3.12
+# e redundante aqui; `uvicorn main:app` direto já escolhe os dois no modo "auto")
+try:
+    import uvloop
+    EVENT_LOOP = "uvloop"
+except ImportError:
+    # Windows / ambiente sem uvloop - segue no loop padrão do asyncio
+    EVENT_LOOP = "asyncio"
+
+try:
+    import httptools
+    HTTP_IMPL = "httptools"
+except ImportError:
+    HTTP_IMPL = "h11"
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+except ImportError:
+    # Sem SQLAlchemy os jobs ficam só em memória (recriados a cada startup)
+    SQLAlchemyJobStore = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    # Sem brotli: só gzip
+    BrotliMiddleware = None
+
+from database import SupabaseClient, decode_cursor
+from cache import ResponseCache, QueryCoalescer
+from metrics import record_collector_error, observe, setup_metrics, CANAL_FETCH_SECONDS, VIDEO_FETCH_SECONDS, SUPABASE_WRITE_SECONDS
+from postgrest.exceptions import APIError
+from collector import YouTubeCollector, QUOTA_PER_KEY
 from notifier import NotificationChecker
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.jobstores.base import ConflictingIdError
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="YouTube Dashboard API", version="1.0.0")
+def _orjson_default(obj: Any):
+    # numeric do asyncpg chega como Decimal - orjson não serializa sozinho
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+def dumps(payload: Any) -> bytes:
+    """orjson com datetime naive tratado como UTC, Decimal -> float e chaves int (payloads montados à mão)"""
+    return orjson.dumps(payload, default=_orjson_default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS)
+
+
+class AppJSONResponse(ORJSONResponse):
+    """ORJSONResponse com o mesmo dumps do cache/ETag: Decimal do asyncpg e datetime naive não quebram a resposta"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# orjson: serialização bem mais rápida nas listas grandes (videos, notificações)
+app = FastAPI(title="YouTube Dashboard API", version="1.0.0", default_response_class=AppJSONResponse)
+
+# CORS_ORIGINS="https://dashboard.exemplo.com,https://outro" restringe à origem do dashboard (padrão: qualquer)
+# Sem barra final (o navegador manda o Origin sem ela) e sem repetidas: o middleware só faz membership
+CORS_ORIGINS = list(dict.fromkeys(
+    origin.strip().rstrip("/") for origin in os.environ.get("CORS_ORIGINS", "*").split(",") if origin.strip()
+))
+if "*" in CORS_ORIGINS:
+    logger.warning("⚠️ CORS liberado para qualquer origem - configure CORS_ORIGINS com a URL do dashboard")
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS,
+    # Credenciais só com lista explícita (a spec de CORS não aceita "*" com credenciais)
+    allow_credentials="*" not in CORS_ORIGINS,
+    # Listas fixas: o preflight responde com strings prontas em vez de ecoar o que o navegador pediu
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    max_age=86400,  # navegador guarda o preflight por 1 dia em vez de repetir OPTIONS a cada polling
 )
 
+
+class StreamAwareGZipMiddleware(GZipMiddleware):
+    """GZip para as listas JSON; SSE passa direto (gzip seguraria os eventos no buffer do compressor)"""
+    
+    excluded_paths = {"/api/coletas/stream"}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# JSON de /api/canais, /api/videos etc. comprime ~10x. Brotli (quality 4) quando o cliente aceita br:
+# ~15-20% menor que gzip no JSON com custo de CPU parecido; gzip para o resto (level 5, não o 9 padrão)
+if BrotliMiddleware is not None:
+    app.add_middleware(
+        BrotliMiddleware,
+        quality=4,
+        minimum_size=1024,
+        gzip_fallback=True,
+        excluded_handlers=[f"^{path}$" for path in StreamAwareGZipMiddleware.excluded_paths]
+    )
+else:
+    app.add_middleware(StreamAwareGZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Prometheus em /metrics (latência por endpoint + métricas da coleta) - middleware tem que entrar
+# antes da app subir, por isso aqui e não no startup_event
+setup_metrics(app)
+
 # ========================================
 # 🆕 MODELOS PYDANTIC
 # ========================================
@@ -49,45 +154,147 @@ db = SupabaseClient()
 collector = YouTubeCollector()
 notifier = NotificationChecker(db.supabase)
 
-collection_in_progress = False
-last_collection_time = None
+SCHEDULER_TIMEZONE = "America/Sao_Paulo"
+scheduler = AsyncIOScheduler(timezone=SCHEDULER_TIMEZONE)
+# Dados mudam só na coleta diária e em add/update/delete de canal (que limpam o cache) -
+# TTL longo é só rede de segurança. "v1" versiona o formato das chaves/valores no Redis
+response_cache = ResponseCache(prefix="v1")
+# Cache miss simultâneo da mesma chave (auto-refresh de vários dashboards) vira uma query só
+query_coalescer = QueryCoalescer()
+
+COLLECTION_COOLDOWN_SECONDS = 60
+
+# Canais por lote de escrita (vídeos + ultima_coleta) durante a coleta
+COLLECTION_BATCH_SIZE = 50
+# Vídeos pendentes que já disparam a gravação do lote (canais com muitos vídeos no período)
+COLLECTION_FLUSH_VIDEO_ROWS = 1000
+
+# Intervalo do progresso gravado em coletas_historico durante a coleta (o SSE recebe cada canal)
+COLLECTION_HEARTBEAT_SECONDS = 30
+# Limpeza de dados antigos só quando a coleta foi boa o bastante (fração de canais com sucesso)
+CLEANUP_SUCCESS_RATIO = float(os.environ.get("CLEANUP_SUCCESS_RATIO", 0.5))
+
+# Canais coletados em paralelo
+COLLECTION_CONCURRENCY = int(os.environ.get("COLLECT_CONCURRENCY", 10))
+
+
+# Progresso da coleta em andamento (coleta_id -> último estado) e assinantes SSE de cada coleta
+coleta_progress: Dict[int, Dict[str, Any]] = {}
+coleta_subscribers: Dict[int, List[asyncio.Queue]] = {}
+COLETA_FINAL_STATUS = {"sucesso", "parcial", "erro"}
+SSE_KEEPALIVE_SECONDS = 15
+# Coleta rodando em outro worker: o stream relê a linha do banco neste intervalo até o status final
+SSE_DB_POLL_SECONDS = 10
+
+
+def publish_coleta_event(coleta_id: int, update: Dict[str, Any]):
+    """Guarda o último estado da coleta e empurra para quem está ouvindo /api/coletas/stream"""
+    coleta_progress[coleta_id] = update
+    for queue in coleta_subscribers.get(coleta_id, []):
+        queue.put_nowait(update)
+
+
+@dataclass
+class CollectState:
+    """Estado da última coleta (em app.state.collect). A trava "coleta em andamento" é o lock do banco"""
+    last_time: Optional[datetime] = None  # exibição (/health)
+    last_monotonic: Optional[float] = None  # cooldown - imune a ajuste do relógio
+
+
+app.state.collect = CollectState()
+
+
+@dataclass
+class CollectionCounters:
+    """Contadores da coleta - workers rodam no mesmo event loop, incremento sem await no meio é atômico"""
+    sucesso: int = 0
+    erro: int = 0
+    videos: int = 0
+    processados: int = 0
+    erros_por_tipo: Counter = field(default_factory=Counter)
 
 # ========================================
 # SISTEMA DE JOBS ASSÍNCRONOS
 # ========================================
 
-transcription_jobs: Dict[str, Dict[str, Any]] = {}
-jobs_lock = threading.Lock()
+@dataclass
+class TranscriptionState:
+    """
+    Jobs de transcrição (em app.state.transcription). Jobs rodam como tasks no event loop
+    (não mais threads), então leitura/escrita do dict não precisa de lock
+    """
+    jobs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Referência forte às tasks em andamento (o event loop só guarda weakref)
+    tasks: set = field(default_factory=set)
+
+
+app.state.transcription = TranscriptionState()
+
+# Com REDIS_URL o job também vai para o Redis: o status pode ser consultado em qualquer worker
+TRANSCRIPTION_JOB_TTL = 3600
+_JOB_DATETIME_FIELDS = ("created_at", "completed_at", "failed_at")
+
+def _transcription_job_key(job_id: str) -> str:
+    # Fora do prefixo do response_cache (clear() apaga v1:*)
+    return f"transcribe:job:{job_id}"
+
+async def publish_transcription_job(job: Dict[str, Any]):
+    redis = response_cache.redis
+    if redis is None:
+        return
+    try:
+        await redis.set(_transcription_job_key(job['job_id']), dumps(job), ex=TRANSCRIPTION_JOB_TTL)
+    except Exception as e:
+        logger.warning("Redis set transcription job failed: %s", e)
+
+async def load_transcription_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job deste worker ou, com Redis, de qualquer outro -> None se não existe/expirou"""
+    job = app.state.transcription.jobs.get(job_id)
+    if job is not None or response_cache.redis is None:
+        return job
+    try:
+        raw = await response_cache.redis.get(_transcription_job_key(job_id))
+    except Exception as e:
+        logger.warning("Redis get transcription job failed: %s", e)
+        return None
+    if raw is None:
+        return None
+    job = orjson.loads(raw)
+    for name in _JOB_DATETIME_FIELDS:
+        if job.get(name):
+            job[name] = datetime.fromisoformat(job[name])
+    return job
 
 def cleanup_old_jobs():
     """Remove jobs com mais de 1 hora"""
-    with jobs_lock:
-        now = datetime.now(timezone.utc)
-        old_jobs = [
-            job_id for job_id, job in transcription_jobs.items()
-            if (now - job['created_at']).total_seconds() > 3600
-        ]
-        for job_id in old_jobs:
-            logger.info(f"🧹 Removendo job antigo: {job_id}")
-            del transcription_jobs[job_id]
-
-def process_transcription_job(job_id: str, video_id: str):
-    """Processa transcrição usando servidor M5 local com polling"""
+    jobs = app.state.transcription.jobs
+    now = datetime.now(timezone.utc)
+    old_jobs = [
+        job_id for job_id, job in jobs.items()
+        if (now - job['created_at']).total_seconds() > 3600
+    ]
+    for job_id in old_jobs:
+        logger.info(f"🧹 Removendo job antigo: {job_id}")
+        del jobs[job_id]
+
+TRANSCRIPTION_API_URL = "https://transcription.2growai.com.br"
+
+async def process_transcription_job(job_id: str, video_id: str):
+    """Processa transcrição usando servidor M5 local com polling (httpx async - não bloqueia o event loop)"""
+    http: httpx.AsyncClient = app.state.http
+    job = app.state.transcription.jobs[job_id]
     try:
         logger.info(f"🎬 [JOB {job_id}] Iniciando transcrição: {video_id}")
         
-        with jobs_lock:
-            transcription_jobs[job_id]['status'] = 'processing'
-            transcription_jobs[job_id]['message'] = 'Iniciando job no servidor M5...'
-        
-        import requests
-        import time
+        job['status'] = 'processing'
+        job['message'] = 'Iniciando job no servidor M5...'
+        await publish_transcription_job(job)
         
         # PASSO 1: Criar job no M5
         logger.info(f"📡 [JOB {job_id}] Criando job no servidor M5...")
         
-        response = requests.post(
-            "https://transcription.2growai.com.br/transcribe",
+        response = await http.post(
+            f"{TRANSCRIPTION_API_URL}/transcribe",
             json={
                 "video_id": video_id,
                 "language": "en"
@@ -111,12 +318,12 @@ def process_transcription_job(job_id: str, video_id: str):
         attempt = 0
         
         while attempt < max_attempts:
-            time.sleep(5)  # Aguardar 5 segundos entre checks
+            await asyncio.sleep(5)  # Aguardar 5 segundos entre checks
             attempt += 1
             
             try:
-                status_response = requests.get(
-                    f"https://transcription.2growai.com.br/status/{m5_job_id}",
+                status_response = await http.get(
+                    f"{TRANSCRIPTION_API_URL}/status/{m5_job_id}",
                     timeout=10
                 )
                 
@@ -127,8 +334,8 @@ def process_transcription_job(job_id: str, video_id: str):
                 m5_status = status_data.get('status')
                 
                 # Atualizar mensagem
-                with jobs_lock:
-                    transcription_jobs[job_id]['message'] = status_data.get('message', 'Processando...')
+                job['message'] = status_data.get('message', 'Processando...')
+                await publish_transcription_job(job)
                 
                 logger.info(f"📊 [JOB {job_id}] Status M5: {m5_status} ({status_data.get('elapsed_seconds')}s)")
                 
@@ -140,16 +347,20 @@ def process_transcription_job(job_id: str, video_id: str):
                     logger.info(f"✅ [JOB {job_id}] Transcrição completa: {len(transcription)} caracteres")
                     
                     # Salvar no cache
-                    asyncio.run(db.save_transcription_cache(video_id, transcription))
+                    saved = await db.save_transcription_cache(video_id, transcription)
+                    
+                    job['status'] = 'completed'
+                    job['message'] = 'Transcrição concluída'
+                    # Texto salvo no cache fica só no banco (o status busca de lá) - o job
+                    # não segura a transcrição inteira na memória do worker por 1h
+                    job['result'] = None if saved else {
+                        'transcription': transcription,
+                        'video_id': video_id
+                    }
+                    job['completed_at'] = datetime.now(timezone.utc)
+                    await publish_transcription_job(job)
                     
-                    with jobs_lock:
-                        transcription_jobs[job_id]['status'] = 'completed'
-                        transcription_jobs[job_id]['message'] = 'Transcrição concluída'
-                        transcription_jobs[job_id]['result'] = {
-                            'transcription': transcription,
-                            'video_id': video_id
-                        }
-                        transcription_jobs[job_id]['completed_at'] = datetime.now(timezone.utc)
+                    del transcription, result, status_data, status_response
                     
                     logger.info(f"✅ [JOB {job_id}] SUCESSO")
                     return
@@ -159,7 +370,7 @@ def process_transcription_job(job_id: str, video_id: str):
                     error_msg = status_data.get('error', 'Erro desconhecido no servidor M5')
                     raise Exception(error_msg)
                 
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.warning(f"⚠️ [JOB {job_id}] Erro no polling (tentativa {attempt}): {e}")
                 continue
         
@@ -169,11 +380,11 @@ def process_transcription_job(job_id: str, video_id: str):
     except Exception as e:
         logger.error(f"❌ [JOB {job_id}] ERRO: {e}")
         
-        with jobs_lock:
-            transcription_jobs[job_id]['status'] = 'failed'
-            transcription_jobs[job_id]['message'] = str(e)
-            transcription_jobs[job_id]['error'] = str(e)
-            transcription_jobs[job_id]['failed_at'] = datetime.now(timezone.utc)
+        job['status'] = 'failed'
+        job['message'] = str(e)
+        job['error'] = str(e)
+        job['failed_at'] = datetime.now(timezone.utc)
+        await publish_transcription_job(job)
 
 # ========================================
 # ENDPOINTS DE TRANSCRIÇÃO ASSÍNCRONA
@@ -201,24 +412,22 @@ async def transcribe_video_async(video_id: str):
             }
         
         job_id = str(uuid.uuid4())
+        transcription = app.state.transcription
+        
+        transcription.jobs[job_id] = {
+            'job_id': job_id,
+            'video_id': video_id,
+            'status': 'queued',
+            'message': 'Iniciando processamento...',
+            'created_at': datetime.now(timezone.utc),
+            'result': None,
+            'error': None
+        }
+        await publish_transcription_job(transcription.jobs[job_id])
         
-        with jobs_lock:
-            transcription_jobs[job_id] = {
-                'job_id': job_id,
-                'video_id': video_id,
-                'status': 'queued',
-                'message': 'Iniciando processamento...',
-                'created_at': datetime.now(timezone.utc),
-                'result': None,
-                'error': None
-            }
-        
-        thread = threading.Thread(
-            target=process_transcription_job,
-            args=(job_id, video_id),
-            daemon=True
-        )
-        thread.start()
+        task = asyncio.create_task(process_transcription_job(job_id, video_id))
+        transcription.tasks.add(task)
+        task.add_done_callback(transcription.tasks.discard)
         
         logger.info(f"🚀 Job criado: {job_id} para vídeo {video_id}")
         
@@ -230,7 +439,7 @@ async def transcribe_video_async(video_id: str):
         }
         
     except Exception as e:
-        logger.error(f"❌ Erro ao criar job de transcrição: {e}")
+        logger.error("❌ Erro ao criar job de transcrição: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -238,14 +447,12 @@ async def transcribe_video_async(video_id: str):
 async def get_transcription_status(job_id: str):
     """Verifica status do job de transcrição"""
     try:
-        with jobs_lock:
-            if job_id not in transcription_jobs:
-                raise HTTPException(
-                    status_code=404, 
-                    detail="Job não encontrado. Pode ter expirado (>1h) ou não existir."
-                )
-            
-            job = transcription_jobs[job_id]
+        job = await load_transcription_job(job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=404, 
+                detail="Job não encontrado. Pode ter expirado (>1h) ou não existir."
+            )
         
         elapsed = (datetime.now(timezone.utc) - job['created_at']).total_seconds()
         
@@ -258,7 +465,13 @@ async def get_transcription_status(job_id: str):
         }
         
         if job['status'] == 'completed':
-            response['result'] = job['result']
+            result = job['result']
+            if result is None:
+                result = {
+                    'transcription': await db.get_cached_transcription(job['video_id']),
+                    'video_id': job['video_id']
+                }
+            response['result'] = result
             response['completed_at'] = job['completed_at'].isoformat()
         
         if job['status'] == 'failed':
@@ -270,7 +483,7 @@ async def get_transcription_status(job_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Erro ao buscar status do job: {e}")
+        logger.error("❌ Erro ao buscar status do job: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -278,16 +491,15 @@ async def get_transcription_status(job_id: str):
 async def list_active_jobs():
     """Lista todos os jobs ativos"""
     try:
-        with jobs_lock:
-            jobs_list = []
-            for job_id, job in transcription_jobs.items():
-                jobs_list.append({
-                    'job_id': job['job_id'],
-                    'video_id': job['video_id'],
-                    'status': job['status'],
-                    'created_at': job['created_at'].isoformat(),
-                    'elapsed_seconds': int((datetime.now(timezone.utc) - job['created_at']).total_seconds())
-                })
+        jobs_list = []
+        for job_id, job in app.state.transcription.jobs.items():
+            jobs_list.append({
+                'job_id': job['job_id'],
+                'video_id': job['video_id'],
+                'status': job['status'],
+                'created_at': job['created_at'].isoformat(),
+                'elapsed_seconds': int((datetime.now(timezone.utc) - job['created_at']).total_seconds())
+            })
         
         return {
             "total_jobs": len(jobs_list),
@@ -295,9 +507,75 @@ async def list_active_jobs():
         }
         
     except Exception as e:
-        logger.error(f"❌ Erro ao listar jobs: {e}")
+        logger.error("❌ Erro ao listar jobs: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# ========================================
+# ETAG (polling do dashboard)
+# ========================================
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def etag_response(request: Request, payload: Any) -> Response:
+    """
+    Serializa o payload uma vez (ou recebe os bytes já serializados) e usa o hash como ETag.
+    Se o cliente mandar If-None-Match igual (polling sem mudança), responde 304 sem corpo.
+    """
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+async def cached_response(request: Request, name: str, expire: int, builder, by_params: bool = True, local_ttl: Optional[int] = None, max_age: Optional[int] = None) -> Response:
+    """
+    Resposta do cache (Redis/local) por endpoint + query params; no miss chama builder() e guarda o JSON.
+    by_params=False: endpoint sem parâmetros tem uma única entrada (cache-buster tipo ?_=123 não gera miss)
+    local_ttl: cópia na memória do processo na frente do Redis (hit sem nem o round trip do Redis)
+    max_age: Cache-Control para o navegador reaproveitar a resposta sem request nenhum (só dados que
+    podem ficar alguns segundos atrasados depois de uma edição)
+    ETag com Redis = chave + versão dos dados (muda a cada response_cache.clear(), igual em todos os
+    workers): If-None-Match igual responde 304 antes de ler/serializar/hashear o corpo
+    ETag sem Redis = md5 do corpo: a versão é por processo e o clear() de um worker não chega nos
+    outros, então o ETag segue o JSON que este worker realmente serve
+    """
+    params = dict(request.query_params.multi_items()) if by_params else {}
+    key = response_cache.make_key(name, params)
+    headers = {}
+    if max_age:
+        headers["Cache-Control"] = f"public, max-age={max_age}"
+    
+    if response_cache.shared_version:
+        version = await response_cache.get_version()
+        headers["ETag"] = f'"{hashlib.md5(f"{key}:{version}".encode()).hexdigest()}"'
+        if _etag_matches(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    
+    body = response_cache.get_local(key) if local_ttl else None
+    
+    if body is None:
+        body = await response_cache.get(key)
+        if body is None:
+            async def load() -> bytes:
+                loaded = dumps(await builder())
+                await response_cache.set(key, loaded, expire)
+                return loaded
+            
+            body = await query_coalescer.run(key, load)
+        if local_ttl:
+            response_cache.set_local(key, body, local_ttl)
+    
+    if "ETag" not in headers:
+        headers["ETag"] = f'"{hashlib.md5(body).hexdigest()}"'
+        if _etag_matches(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # ========================================
 # ENDPOINTS ORIGINAIS
 # ========================================
@@ -306,29 +584,46 @@ async def list_active_jobs():
 async def root():
     return {"message": "YouTube Dashboard API is running", "status": "healthy", "version": "1.0"}
 
+# Último ping OK no banco (monotonic) - probes de health a cada poucos segundos não batem no Supabase
+_last_ok_ts = 0.0
+_PING_TTL = 10.0
+
+# Timestamp ISO do /health reaproveitado por até 1s (probes disparam várias vezes por segundo)
+_hc_ts_cache: tuple = (0.0, "")
+
 @app.get("/health")
 async def health_check():
+    global _last_ok_ts, _hc_ts_cache
     try:
-        await db.test_connection()
-        
-        quota_usada = await db.get_quota_diaria_usada()
+        now = time.monotonic()
+        if now - _hc_ts_cache[0] >= 1.0:
+            _hc_ts_cache = (now, datetime.now(timezone.utc).isoformat())
+        if now - _last_ok_ts >= _PING_TTL:
+            # Falha não é cacheada: próximo probe testa de novo. Ping e quota em paralelo
+            _, quota_usada = await asyncio.gather(db.test_connection(), db.get_quota_diaria_usada())
+            _last_ok_ts = now
+        else:
+            quota_usada = await db.get_quota_diaria_usada()
         
         return {
             "status": "healthy", 
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": _hc_ts_cache[1],
             "supabase": "connected",
             "youtube_api": "configured",
-            "collection_in_progress": collection_in_progress,
-            "last_collection": last_collection_time.isoformat() if last_collection_time else None,
+            "collection_in_progress": db.collection_in_progress,
+            "last_collection": app.state.collect.last_time,
             "quota_usada_hoje": quota_usada,
-            "active_transcription_jobs": len(transcription_jobs)
+            "active_transcription_jobs": len(app.state.transcription.jobs)
         }
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(status_code=503, detail="Service unhealthy")
 
-@app.get("/api/canais")
+# Listas paginadas (/api/canais, /api/nossos-canais, /api/videos): next_cursor é o sinal de "tem mais";
+# total só com ?include_total=true (COUNT no banco, guardado por filtro) - senão vem null
+@app.api_route("/api/canais", methods=["GET", "HEAD"])
 async def get_canais(
+    request: Request,
     nicho: Optional[str] = None,
     subnicho: Optional[str] = None,
     lingua: Optional[str] = None,
@@ -339,10 +634,14 @@ async def get_canais(
     score_min: Optional[float] = None,
     growth_min: Optional[float] = None,
     limit: Optional[int] = 500,
-    offset: Optional[int] = 0
+    offset: Optional[int] = Query(0, deprecated=True),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include_total: bool = False
 ):
-    try:
-        canais = await db.get_canais_with_filters(
+    async def build():
+        after = decode_cursor(cursor) if cursor else None
+        result = await db.get_canais_with_filters(
             nicho=nicho,
             subnicho=subnicho,
             lingua=lingua,
@@ -353,15 +652,25 @@ async def get_canais(
             score_min=score_min,
             growth_min=growth_min,
             limit=limit,
-            offset=offset
+            offset=offset,
+            after=after,
+            fields=fields,
+            include_total=include_total
         )
-        return {"canais": canais, "total": len(canais)}
+        canais = result["canais"]
+        return {"canais": canais, "total": result["total"], "page_size": len(canais), "next_cursor": result["next_cursor"]}
+    
+    try:
+        return await cached_response(request, "canais", 300, build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error fetching canais: {e}")
+        logger.error("Error fetching canais: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/nossos-canais")
+@app.api_route("/api/nossos-canais", methods=["GET", "HEAD"])
 async def get_nossos_canais(
+    request: Request,
     nicho: Optional[str] = None,
     subnicho: Optional[str] = None,
     lingua: Optional[str] = None,
@@ -371,10 +680,14 @@ async def get_nossos_canais(
     score_min: Optional[float] = None,
     growth_min: Optional[float] = None,
     limit: Optional[int] = 100,
-    offset: Optional[int] = 0
+    offset: Optional[int] = Query(0, deprecated=True),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include_total: bool = False
 ):
-    try:
-        canais = await db.get_canais_with_filters(
+    async def build():
+        after = decode_cursor(cursor) if cursor else None
+        result = await db.get_canais_with_filters(
             nicho=nicho,
             subnicho=subnicho,
             lingua=lingua,
@@ -385,15 +698,25 @@ async def get_nossos_canais(
             score_min=score_min,
             growth_min=growth_min,
             limit=limit,
-            offset=offset
+            offset=offset,
+            after=after,
+            fields=fields,
+            include_total=include_total
         )
-        return {"canais": canais, "total": len(canais)}
+        canais = result["canais"]
+        return {"canais": canais, "total": result["total"], "page_size": len(canais), "next_cursor": result["next_cursor"]}
+    
+    try:
+        return await cached_response(request, "nossos-canais", 300, build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error fetching nossos canais: {e}")
+        logger.error("Error fetching nossos canais: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/videos")
+@app.api_route("/api/videos", methods=["GET", "HEAD"])
 async def get_videos(
+    request: Request,
     nicho: Optional[str] = None,
     subnicho: Optional[str] = None,
     lingua: Optional[str] = None,
@@ -403,10 +726,14 @@ async def get_videos(
     growth_min: Optional[float] = None,
     order_by: Optional[str] = "views_atuais",
     limit: Optional[int] = 100,
-    offset: Optional[int] = None
+    offset: Optional[int] = Query(None, deprecated=True),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    include_total: bool = False
 ):
-    try:
-        videos = await db.get_videos_with_filters(
+    async def build():
+        after = decode_cursor(cursor) if cursor else None
+        result = await db.get_videos_with_filters(
             nicho=nicho,
             subnicho=subnicho,
             lingua=lingua,
@@ -416,20 +743,29 @@ async def get_videos(
             growth_min=growth_min,
             order_by=order_by,
             limit=limit,
-            offset=offset
+            offset=offset,
+            after=after,
+            fields=fields,
+            include_total=include_total
         )
-        return {"videos": videos, "total": len(videos)}
+        videos = result["videos"]
+        return {"videos": videos, "total": result["total"], "page_size": len(videos), "next_cursor": result["next_cursor"]}
+    
+    try:
+        return await cached_response(request, "videos", 300, build)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error fetching videos: {e}")
+        logger.error("Error fetching videos: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/filtros")
-async def get_filtros():
+@app.api_route("/api/filtros", methods=["GET", "HEAD"])
+async def get_filtros(request: Request):
     try:
-        filtros = await db.get_filter_options()
-        return filtros
+        # Opções de filtro só mudam com canal novo: o navegador reaproveita por 60s a cada render do painel
+        return await cached_response(request, "filtros", FILTROS_CACHE_TTL, db.get_filter_options, by_params=False, local_ttl=600, max_age=60)
     except Exception as e:
-        logger.error(f"Error fetching filtros: {e}")
+        logger.error("Error fetching filtros: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/add-canal")
@@ -454,9 +790,11 @@ async def add_canal_manual(
         }
         
         result = await db.upsert_canal(canal_data)
+        await db.refresh_dashboard_views()
+        await response_cache.clear()
         return {"message": "Canal added successfully", "canal": result}
     except Exception as e:
-        logger.error(f"Error adding canal: {e}")
+        logger.error("Error adding canal: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/canais/{canal_id}")
@@ -471,47 +809,60 @@ async def update_canal(
     status: str = "ativo"
 ):
     try:
-        canal_exists = db.supabase.table("canais_monitorados").select("id").eq("id", canal_id).execute()
-        if not canal_exists.data:
+        # supabase-py é síncrono: roda em thread para não travar o event loop durante o round trip.
+        # Um round trip só: o UPDATE devolve as linhas alteradas (return=representation) - vazio = 404
+        response = await asyncio.to_thread(
+            lambda: db.supabase.table("canais_monitorados").update({
+                "nome_canal": nome_canal,
+                "url_canal": url_canal,
+                "nicho": nicho,
+                "subnicho": subnicho,
+                "lingua": lingua,
+                "tipo": tipo,
+                "status": status
+            }).eq("id", canal_id).execute()
+        )
+        if not response.data:
             raise HTTPException(status_code=404, detail="Canal não encontrado")
         
-        response = db.supabase.table("canais_monitorados").update({
-            "nome_canal": nome_canal,
-            "url_canal": url_canal,
-            "nicho": nicho,
-            "subnicho": subnicho,
-            "lingua": lingua,
-            "tipo": tipo,
-            "status": status
-        }).eq("id", canal_id).execute()
-        
         logger.info(f"Canal updated: {nome_canal} (ID: {canal_id})")
-        return {"message": "Canal atualizado com sucesso", "canal": response.data[0] if response.data else None}
+        await db.refresh_dashboard_views()
+        await response_cache.clear()
+        return {"message": "Canal atualizado com sucesso", "canal": response.data[0]}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating canal: {e}")
+        logger.error("Error updating canal: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Serializa check + aquisição do lock da coleta: triggers simultâneos (clique duplo, scheduler junto
+# com /api/collect-data) esperam o primeiro e já veem collection_in_progress, sem ir ao banco
+_collection_start_lock = asyncio.Lock()
+
 async def can_start_collection() -> tuple[bool, str]:
-    global collection_in_progress, last_collection_time
-    
-    if collection_in_progress:
+    """Se retornar True, o lock da coleta fica com o chamador - run_collection_job libera no finally"""
+    async with _collection_start_lock:
+        return await _check_and_acquire_collection()
+
+async def _check_and_acquire_collection() -> tuple[bool, str]:
+    if db.collection_in_progress:
         return False, "Collection already in progress"
     
-    if last_collection_time:
-        time_since_last = datetime.now(timezone.utc) - last_collection_time
-        cooldown = timedelta(minutes=1)
+    collect_state = app.state.collect
+    if collect_state.last_monotonic is not None:
+        elapsed = time.monotonic() - collect_state.last_monotonic
         
-        if time_since_last < cooldown:
-            remaining = cooldown - time_since_last
-            seconds = int(remaining.total_seconds())
+        if elapsed < COLLECTION_COOLDOWN_SECONDS:
+            seconds = int(COLLECTION_COOLDOWN_SECONDS - elapsed)
             return False, f"Cooldown: aguarde {seconds}s"
     
+    if not await db.try_acquire_collection_lock():
+        return False, "Collection already in progress"
+    
     try:
         await db.cleanup_stuck_collections()
     except Exception as e:
-        logger.error(f"Error cleaning stuck collections: {e}")
+        logger.error("Error cleaning stuck collections: %s", e)
     
     return True, "OK"
 
@@ -526,10 +877,9 @@ async def collect_data(background_tasks: BackgroundTasks):
         background_tasks.add_task(run_collection_job)
         return {"message": "Collection started", "status": "processing"}
     except Exception as e:
-        logger.error(f"Error starting collection: {e}")
+        logger.error("Error starting collection: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-# ⬇️⬇️⬇️ ADICIONE ESTE BLOCO AQUI ⬇️⬇️⬇️
 @app.post("/api/force-notifier")
 async def force_notifier():
     """
@@ -539,11 +889,8 @@ async def force_notifier():
     try:
         logger.info("🔔 FORÇANDO EXECUÇÃO DO NOTIFIER (manual)")
         
-        # Importar e executar o notifier
-        from notifier import NotificationChecker
-        
-        checker = NotificationChecker(db.supabase)
-        await checker.check_and_create_notifications()
+        # Mesma instância usada pela coleta (notification_worker)
+        await notifier.check_and_create_notifications()
         
         logger.info("✅ Notifier executado com sucesso!")
         
@@ -553,28 +900,43 @@ async def force_notifier():
         }
     
     except Exception as e:
-        logger.error(f"❌ Erro ao executar notifier: {e}")
+        logger.error("❌ Erro ao executar notifier: %s", e)
         import traceback
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
-# ⬆️⬆️⬆️ ATÉ AQUI ⬆️⬆️⬆️
 
-@app.get("/api/stats")
-async def get_stats():
+# Stats e filtros são recalculados no fim da coleta (warm_response_cache); mudança em canais limpa o cache
+STATS_CACHE_TTL = 86400
+FILTROS_CACHE_TTL = 3600
+
+async def warm_response_cache():
+    """Pré-calcula /api/stats e /api/filtros logo depois do clear do fim da coleta - primeiro request já é hit"""
+    for name, expire, loader in (
+        ("stats", STATS_CACHE_TTL, db.get_system_stats),
+        ("filtros", FILTROS_CACHE_TTL, db.get_filter_options),
+    ):
+        try:
+            key = response_cache.make_key(name, {})
+            await response_cache.set(key, dumps(await loader()), expire)
+        except Exception as e:
+            logger.error("Error warming %s cache: %s", name, e)
+
+@app.api_route("/api/stats", methods=["GET", "HEAD"])
+async def get_stats(request: Request):
     try:
-        stats = await db.get_system_stats()
-        return stats
+        return await cached_response(request, "stats", STATS_CACHE_TTL, db.get_system_stats, by_params=False)
     except Exception as e:
-        logger.error(f"Error fetching stats: {e}")
+        logger.error("Error fetching stats: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/cleanup")
 async def cleanup_data():
     try:
         await db.cleanup_old_data()
+        await response_cache.clear()
         return {"message": "Cleanup concluído com sucesso", "status": "success"}
     except Exception as e:
-        logger.error(f"Error in cleanup: {e}")
+        logger.error("Error in cleanup: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/reset-suspended-keys")
@@ -588,17 +950,19 @@ async def reset_suspended_keys():
             "status": "success"
         }
     except Exception as e:
-        logger.error(f"Error resetting suspended keys: {e}")
+        logger.error("Error resetting suspended keys: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/coletas/historico")
-async def get_coletas_historico(limit: Optional[int] = 20):
+@app.api_route("/api/coletas/historico", methods=["GET", "HEAD"])
+async def get_coletas_historico(request: Request, limit: Optional[int] = 20):
     try:
-        historico = await db.get_coletas_historico(limit=limit)
-        
-        quota_usada = await db.get_quota_diaria_usada()
+        historico, quota_usada = await asyncio.gather(
+            db.get_coletas_historico(limit=limit),
+            db.get_quota_diaria_usada()
+        )
         
-        quota_total = len(collector.api_keys) * 10000  
+        total_chaves = len(collector.api_keys)
+        quota_total = collector.quota_total_diario
         quota_disponivel = quota_total - quota_usada
         porcentagem_usada = (quota_usada / quota_total) * 100 if quota_total > 0 else 0
         
@@ -608,11 +972,13 @@ async def get_coletas_historico(limit: Optional[int] = 20):
         brasilia_offset = timedelta(hours=-3)
         next_reset_brasilia = next_reset + brasilia_offset
 
-        chaves_esgotadas_real = min(int(quota_usada // 10000), len(collector.api_keys))
-        chaves_suspensas_real = len(collector.suspended_keys)
-        chaves_ativas_real = len(collector.api_keys) - chaves_esgotadas_real - chaves_suspensas_real
+        chaves_esgotadas_real = min(int(quota_usada // QUOTA_PER_KEY), total_chaves)
+        chaves_suspensas_ids = list(collector.suspended_keys)
+        chaves_suspensas_real = len(chaves_suspensas_ids)
+        chaves_ativas_real = total_chaves - chaves_esgotadas_real - chaves_suspensas_real
         
-        return {
+        # Dashboard faz polling desta rota: sem coleta rodando nada muda -> 304 sem corpo
+        return etag_response(request, {
             "historico": historico,
             "total": len(historico),
             "quota_info": {
@@ -620,27 +986,97 @@ async def get_coletas_historico(limit: Optional[int] = 20):
                 "usado_hoje": quota_usada,
                 "disponivel": quota_disponivel,
                 "porcentagem_usada": round(porcentagem_usada, 1),
-                "total_chaves": len(collector.api_keys),
+                "total_chaves": total_chaves,
                 "chaves_ativas": chaves_ativas_real,
                 "chaves_esgotadas": chaves_esgotadas_real,
-                "chaves_esgotadas_ids": list(collector.exhausted_keys_date.keys()),
-                "chaves_suspensas": len(collector.suspended_keys),
-                "chaves_suspensas_ids": list(collector.suspended_keys),
+                "chaves_esgotadas_ids": list(collector.exhausted_keys_date),
+                "chaves_suspensas": chaves_suspensas_real,
+                "chaves_suspensas_ids": chaves_suspensas_ids,
                 "proximo_reset_utc": next_reset.isoformat(),
                 "proximo_reset_local": next_reset_brasilia.strftime("%d/%m/%Y %H:%M (Horário de Brasília)")
             }
-        }
+        })
     except Exception as e:
-        logger.error(f"Error fetching coletas historico: {e}")
+        logger.error("Error fetching coletas historico: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/coletas/stream")
+async def stream_coleta(coleta_id: int):
+    """Progresso da coleta via Server-Sent Events (um evento por canal processado) - substitui o polling"""
+    if coleta_id not in coleta_progress:
+        # Progresso só existe na memória do worker que roda a coleta: aqui a fonte é a linha do banco
+        # (coleta em outro worker, já terminada ou de antes do restart)
+        try:
+            coleta = await db.get_coleta(coleta_id)
+        except Exception as e:
+            logger.error("Error fetching coleta: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
+        if not coleta:
+            raise HTTPException(status_code=404, detail="Coleta não encontrada")
+        
+        async def db_events():
+            # Conexão fica aberta até o status final - sem isso o EventSource reconecta a cada ~3s
+            last = coleta
+            yield b"data: " + dumps(last) + b"\n\n"
+            while last["status"] not in COLETA_FINAL_STATUS:
+                await asyncio.sleep(SSE_DB_POLL_SECONDS)
+                try:
+                    current = await db.get_coleta(coleta_id)
+                except Exception as e:
+                    logger.warning("Error polling coleta %s: %s", coleta_id, e)
+                    current = last
+                if current is None:
+                    break
+                if current == last:
+                    yield b": keepalive\n\n"
+                else:
+                    last = current
+                    yield b"data: " + dumps(last) + b"\n\n"
+        
+        return StreamingResponse(
+            db_events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    queue = asyncio.Queue()
+    coleta_subscribers.setdefault(coleta_id, []).append(queue)
+    
+    async def events():
+        try:
+            update = coleta_progress.get(coleta_id)
+            while True:
+                if update is None:
+                    # Comentário SSE mantém a conexão viva em proxies que cortam conexões ociosas
+                    yield b": keepalive\n\n"
+                else:
+                    yield b"data: " + dumps(update) + b"\n\n"
+                    if update["status"] in COLETA_FINAL_STATUS:
+                        break
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    update = None
+        finally:
+            subscribers = coleta_subscribers.get(coleta_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                coleta_subscribers.pop(coleta_id, None)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/coletas/cleanup")
 async def cleanup_stuck_collections():
     try:
         count = await db.cleanup_stuck_collections()
         return {"message": f"{count} coletas travadas marcadas como erro", "count": count}
     except Exception as e:
-        logger.error(f"Error in cleanup: {e}")
+        logger.error("Error in cleanup: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/coletas/{coleta_id}")
@@ -649,7 +1085,7 @@ async def delete_coleta(coleta_id: int):
         await db.delete_coleta(coleta_id)
         return {"message": "Coleta deletada com sucesso"}
     except Exception as e:
-        logger.error(f"Error deleting coleta: {e}")
+        logger.error("Error deleting coleta: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/favoritos/adicionar")
@@ -658,21 +1094,19 @@ async def add_favorito(tipo: str, item_id: int):
         if tipo not in ["canal", "video"]:
             raise HTTPException(status_code=400, detail="Tipo deve ser 'canal' ou 'video'")
         
-        if tipo == "canal":
-            canal_exists = db.supabase.table("canais_monitorados").select("id").eq("id", item_id).execute()
-            if not canal_exists.data:
-                raise HTTPException(status_code=404, detail="Canal não encontrado")
-        elif tipo == "video":
-            video_exists = db.supabase.table("videos_historico").select("id").eq("id", item_id).execute()
-            if not video_exists.data:
-                raise HTTPException(status_code=404, detail="Vídeo não encontrado")
+        try:
+            result = await db.add_favorito(tipo, item_id)
+        except APIError as e:
+            # Existência validada no próprio insert (trigger -> foreign_key_violation)
+            if e.code == "23503":
+                raise HTTPException(status_code=404, detail="Canal não encontrado" if tipo == "canal" else "Vídeo não encontrado")
+            raise
         
-        result = await db.add_favorito(tipo, item_id)
         return {"message": "Favorito adicionado com sucesso", "favorito": result}
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error adding favorito: {e}")
+        logger.error("Error adding favorito: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/favoritos/remover")
@@ -684,93 +1118,111 @@ async def remove_favorito(tipo: str, item_id: int):
         await db.remove_favorito(tipo, item_id)
         return {"message": "Favorito removido com sucesso"}
     except Exception as e:
-        logger.error(f"Error removing favorito: {e}")
+        logger.error("Error removing favorito: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/favoritos/canais")
 async def get_favoritos_canais():
     try:
         canais = await db.get_favoritos_canais()
-        return {"canais": canais, "total": len(canais)}
+        # Response pronta: pula o jsonable_encoder (orjson serializa direto)
+        return AppJSONResponse({"canais": canais, "total": len(canais)})
     except Exception as e:
-        logger.error(f"Error fetching favoritos canais: {e}")
+        logger.error("Error fetching favoritos canais: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/favoritos/videos")
 async def get_favoritos_videos():
     try:
         videos = await db.get_favoritos_videos()
-        return {"videos": videos, "total": len(videos)}
+        return AppJSONResponse({"videos": videos, "total": len(videos)})
     except Exception as e:
-        logger.error(f"Error fetching favoritos videos: {e}")
+        logger.error("Error fetching favoritos videos: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/canais/{canal_id}")
 async def delete_canal(canal_id: int, permanent: bool = False):
     try:
         if permanent:
-            try:
-                notif_response = db.supabase.table("notificacoes").delete().eq("canal_id", canal_id).execute()
-                deleted_count = len(notif_response.data) if notif_response.data else 0
-                logger.info(f"Deleted {deleted_count} notifications for canal {canal_id}")
-            except Exception as e:
-                logger.warning(f"Error deleting notifications for canal {canal_id}: {e}")
-            
-            await db.delete_canal_permanently(canal_id)
+            # Notificações saem na mesma transação que o canal (delete_canal_cascade)
+            if not await db.delete_canal_permanently(canal_id):
+                raise HTTPException(status_code=404, detail="Canal não encontrado")
+            await db.refresh_dashboard_views()
+            await response_cache.clear()
             return {"message": "Canal deletado permanentemente"}
         else:
-            response = db.supabase.table("canais_monitorados").update({
-                "status": "inativo"
-            }).eq("id", canal_id).execute()
+            response = await asyncio.to_thread(
+                lambda: db.supabase.table("canais_monitorados").update({
+                    "status": "inativo"
+                }).eq("id", canal_id).execute()
+            )
+            # UPDATE devolve as linhas alteradas - vazio = canal não existe (sem SELECT antes)
+            if not response.data:
+                raise HTTPException(status_code=404, detail="Canal não encontrado")
+            await db.refresh_dashboard_views()
+            await response_cache.clear()
             return {"message": "Canal desativado", "canal": response.data}
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error deleting canal: {e}")
+        logger.error("Error deleting canal: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/notificacoes")
-async def get_notificacoes_nao_vistas():
+async def get_notificacoes_nao_vistas(request: Request):
     try:
         notificacoes = await db.get_notificacoes_nao_vistas()
-        return {
+        return etag_response(request, {
             "notificacoes": notificacoes,
             "total": len(notificacoes)
-        }
+        })
     except Exception as e:
-        logger.error(f"Error fetching notificacoes: {e}")
+        logger.error("Error fetching notificacoes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/notificacoes/todas")
 async def get_notificacoes_todas(
+    request: Request,
     limit: Optional[int] = 500,
-    offset: Optional[int] = 0,
+    offset: Optional[int] = Query(0, deprecated=True),
     vista: Optional[bool] = None,
-    dias: Optional[int] = 30
+    dias: Optional[int] = 30,
+    cursor: Optional[str] = None
 ):
     try:
-        notificacoes = await db.get_notificacoes_all(
+        page = await db.get_notificacoes_page(
             limit=limit,
             offset=offset,
             vista_filter=vista,
-            dias=dias
+            dias=dias,
+            after=decode_cursor(cursor) if cursor else None
         )
-        return {
+        notificacoes = page["notificacoes"]
+        return etag_response(request, {
             "notificacoes": notificacoes,
-            "total": len(notificacoes)
-        }
+            "total": page["total"],
+            "page_size": len(notificacoes),
+            "next_cursor": page["next_cursor"]
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error fetching all notificacoes: {e}")
+        logger.error("Error fetching all notificacoes: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/notificacoes/historico")
 async def get_notificacoes_historico(limit: Optional[int] = 100):
     try:
-        notificacoes = await db.get_notificacoes_all(limit=limit, offset=0)
-        return {
+        page = await db.get_notificacoes_page(limit=limit, offset=0)
+        notificacoes = page["notificacoes"]
+        # Response pronta: pula o jsonable_encoder (até 500 notificações com o canal embutido)
+        return AppJSONResponse({
             "historico": notificacoes,
-            "total": len(notificacoes)
-        }
+            "total": page["total"],
+            "page_size": len(notificacoes)
+        })
     except Exception as e:
-        logger.error(f"Error fetching historico: {e}")
+        logger.error("Error fetching historico: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/notificacoes/{notif_id}/marcar-vista")
@@ -791,7 +1243,7 @@ async def marcar_notificacao_vista(notif_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error marking notificacao as vista: {e}")
+        logger.error("Error marking notificacao as vista: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/notificacoes/{notif_id}/desmarcar-vista")
@@ -817,7 +1269,7 @@ async def desmarcar_notificacao_vista(notif_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Erro ao desmarcar notificação: {e}")
+        logger.error("❌ Erro ao desmarcar notificação: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/notificacoes/marcar-todas")
@@ -829,7 +1281,7 @@ async def marcar_todas_notificacoes_vistas():
             "count": count
         }
     except Exception as e:
-        logger.error(f"Error marking all notificacoes as vistas: {e}")
+        logger.error("Error marking all notificacoes as vistas: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/notificacoes/stats")
@@ -838,19 +1290,19 @@ async def get_notificacoes_stats():
         stats = await db.get_notificacao_stats()
         return stats
     except Exception as e:
-        logger.error(f"Error fetching notificacao stats: {e}")
+        logger.error("Error fetching notificacao stats: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/regras-notificacoes")
 async def get_regras_notificacoes():
     try:
         regras = await db.get_regras_notificacoes()
-        return {
+        return AppJSONResponse({
             "regras": regras,
             "total": len(regras)
-        }
+        })
     except Exception as e:
-        logger.error(f"Error fetching regras: {e}")
+        logger.error("Error fetching regras: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/regras-notificacoes")
@@ -876,7 +1328,7 @@ async def create_regra_notificacao(regra: RegraNotificacaoCreate):
         else:
             raise HTTPException(status_code=500, detail="Erro ao criar regra")
     except Exception as e:
-        logger.error(f"Error creating regra: {e}")
+        logger.error("Error creating regra: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/regras-notificacoes/{regra_id}")
@@ -904,7 +1356,7 @@ async def update_regra_notificacao(regra_id: int, regra: RegraNotificacaoCreate)
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error updating regra: {e}")
+        logger.error("Error updating regra: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/regras-notificacoes/{regra_id}")
@@ -919,7 +1371,7 @@ async def delete_regra_notificacao(regra_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error deleting regra: {e}")
+        logger.error("Error deleting regra: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/regras-notificacoes/{regra_id}/toggle")
@@ -938,7 +1390,7 @@ async def toggle_regra_notificacao(regra_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error toggling regra: {e}")
+        logger.error("Error toggling regra: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -982,7 +1434,7 @@ async def get_keywords_analysis(subniche: str = None, days: int = 30):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting keywords analysis: {e}")
+        logger.error("Error getting keywords analysis: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/analysis/title-patterns")
@@ -1016,7 +1468,7 @@ async def get_title_patterns_analysis(subniche: str, days: int = 30):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting title patterns: {e}")
+        logger.error("Error getting title patterns: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/analysis/top-channels")
@@ -1054,7 +1506,7 @@ async def get_top_channels_analysis(subniche: str, days: int = 30):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting top channels: {e}")
+        logger.error("Error getting top channels: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/analysis/subniches")
@@ -1062,9 +1514,9 @@ async def get_all_subniches():
     """Retorna lista de todos os subniches ativos"""
     try:
         subniches = await db.get_all_subniches()
-        return {"total": len(subniches), "subniches": subniches}
+        return AppJSONResponse({"total": len(subniches), "subniches": subniches})
     except Exception as e:
-        logger.error(f"Error getting subniches: {e}")
+        logger.error("Error getting subniches: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/analysis/subniche-trends")
@@ -1079,15 +1531,15 @@ async def get_subniche_trends():
         # Buscar os 3 períodos de uma vez (otimização frontend)
         trends = await db.get_all_subniche_trends()
 
-        return {
+        return AppJSONResponse({
             "success": True,
             "data": trends,
             "total_7d": len(trends.get("7d", [])),
             "total_15d": len(trends.get("15d", [])),
             "total_30d": len(trends.get("30d", []))
-        }
+        })
     except Exception as e:
-        logger.error(f"Error getting subniche trends: {e}")
+        logger.error("Error getting subniche trends: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/reports/weekly/latest")
@@ -1102,7 +1554,7 @@ async def get_latest_weekly_report():
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting weekly report: {e}")
+        logger.error("Error getting weekly report: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/reports/weekly/generate")
@@ -1116,7 +1568,7 @@ async def generate_weekly_report_endpoint():
         logger.info("✅ Weekly report generated successfully")
         return {"message": "Relatório gerado com sucesso", "report": report}
     except Exception as e:
-        logger.error(f"Error generating weekly report: {e}")
+        logger.error("Error generating weekly report: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/analysis/run-daily")
@@ -1126,7 +1578,7 @@ async def run_daily_analysis():
         await run_daily_analysis_job()
         return {"message": "Análise diária executada com sucesso"}
     except Exception as e:
-        logger.error(f"Error running daily analysis: {e}")
+        logger.error("Error running daily analysis: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/analysis/run-gaps")
@@ -1144,20 +1596,24 @@ async def run_gap_analysis():
             gaps_found[subniche] = len(gaps)
         return {"message": "Análise de gaps executada com sucesso", "gaps_found": gaps_found}
     except Exception as e:
-        logger.error(f"Error running gap analysis: {e}")
+        logger.error("Error running gap analysis: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 async def run_collection_job():
-    global collection_in_progress, last_collection_time
-    
     coleta_id = None
-    canais_sucesso = 0
-    canais_erro = 0
-    videos_total = 0
+    counters = CollectionCounters()
+    notification_task = None
+    heartbeat_task = None
+    heartbeat_stop = asyncio.Event()
+    
+    async def stop_heartbeat():
+        # Antes do UPDATE final: um heartbeat atrasado não pode sobrescrever o status com em_progresso
+        heartbeat_stop.set()
+        if heartbeat_task:
+            await heartbeat_task
     
     try:
-        collection_in_progress = True
         logger.info("=" * 80)
         logger.info("🚀 STARTING COLLECTION JOB")
         logger.info("=" * 80)
@@ -1171,142 +1627,263 @@ async def run_collection_job():
         coleta_id = await db.create_coleta_log(total_canais)
         logger.info(f"📝 Created coleta log ID: {coleta_id}")
         
-        for index, canal in enumerate(canais_to_collect, 1):
-            if collector.all_keys_exhausted():
-                logger.error("=" * 80)
-                logger.error("❌ ALL API KEYS EXHAUSTED - STOPPING COLLECTION")
-                logger.error(f"✅ Collected {canais_sucesso}/{total_canais} canais")
-                logger.error(f"📊 Total requests used: {collector.total_quota_units}")
-                logger.error("=" * 80)
-                break
+        def publish_progress(status: str):
+            if coleta_id:
+                publish_coleta_event(coleta_id, {
+                    "coleta_id": coleta_id,
+                    "status": status,
+                    "canais_total": total_canais,
+                    "canais_processados": counters.processados,
+                    "canais_sucesso": counters.sucesso,
+                    "canais_erro": counters.erro,
+                    "videos_total": counters.videos
+                })
+        
+        publish_progress("em_progresso")
+        
+        if coleta_id:
+            heartbeat_task = asyncio.create_task(coleta_heartbeat(coleta_id, counters, heartbeat_stop))
+        
+        # Escritas acumuladas e gravadas em lote (evita 2+ round trips por canal)
+        data_coleta = datetime.now(timezone.utc).date().isoformat()
+        pending_canal_rows = []
+        pending_videos = []
+        pending_last_collection = []
+        
+        # Notificações verificadas em paralelo à coleta, lote a lote, assim que os vídeos estão salvos
+        notification_queue = asyncio.Queue()
+        notification_task = asyncio.create_task(notification_worker(notification_queue))
+        
+        async def flush_pending():
+            # Copia e esvazia antes do await - outros workers continuam acumulando durante o flush
+            canal_rows_batch = pending_canal_rows[:]
+            pending_canal_rows.clear()
+            videos_batch = pending_videos[:]
+            pending_videos.clear()
+            canal_ids_batch = pending_last_collection[:]
+            pending_last_collection.clear()
             
-            try:
-                logger.info(f"[{index}/{total_canais}] 🔄 Processing: {canal['nome_canal']}")
+            if canal_rows_batch:
+                try:
+                    await db.bulk_save_canal_data(canal_rows_batch)
+                except Exception as flush_error:
+                    logger.error(f"❌ Failed to save canal data batch ({len(canal_rows_batch)} canais): {flush_error}")
+            if videos_batch:
+                try:
+                    saved_count = await db.save_videos_batch(videos_batch)
+                    logger.info(f"💾 Batch saved: {saved_count} videos")
+                    notification_queue.put_nowait(list({row["canal_id"] for row in videos_batch}))
+                except Exception as flush_error:
+                    logger.error(f"❌ Failed to save videos batch ({len(videos_batch)} videos): {flush_error}")
+            if canal_ids_batch:
+                try:
+                    await db.update_last_collection_batch(canal_ids_batch)
+                except Exception as flush_error:
+                    logger.error(f"❌ Failed to update ultima_coleta batch: {flush_error}")
+        
+        # Canais em paralelo (limitado) - RateLimiter por chave continua controlando a quota
+        sem = asyncio.Semaphore(COLLECTION_CONCURRENCY)
+        keys_exhausted = asyncio.Event()
+        # Tasks ainda esperando o semáforo - canceladas de uma vez quando as chaves acabam
+        waiting_tasks = set()
+        
+        async def _collect_one(canal):
+            async with sem:
+                waiting_tasks.discard(asyncio.current_task())
+                if keys_exhausted.is_set():
+                    return
+                
+                if collector.all_keys_exhausted():
+                    keys_exhausted.set()
+                    logger.error("=" * 80)
+                    logger.error("❌ ALL API KEYS EXHAUSTED - STOPPING COLLECTION")
+                    logger.error(f"✅ Collected {counters.sucesso}/{total_canais} canais")
+                    logger.error(f"📊 Total requests used: {collector.total_quota_units}")
+                    logger.error("=" * 80)
+                    for task in waiting_tasks:
+                        task.cancel()
+                    return
                 
-                canal_data = await collector.get_canal_data(canal['url_canal'], canal['nome_canal'])
-                if canal_data:
-                    saved = await db.save_canal_data(canal['id'], canal_data)
-                    if saved:
-                        canais_sucesso += 1
-                        logger.info(f"✅ [{index}/{total_canais}] Success: {canal['nome_canal']}")
+                try:
+                    logger.info(f"🔄 Processing: {canal['nome_canal']}")
+                    
+                    with observe(CANAL_FETCH_SECONDS):
+                        canal_data = await collector.get_canal_data(canal['url_canal'], canal['nome_canal'])
+                    if canal_data:
+                        canal_row = db.build_canal_row(canal['id'], canal_data, data_coleta)
+                        if canal_row:
+                            pending_canal_rows.append(canal_row)
+                            counters.sucesso += 1
+                            logger.info(f"✅ Success: {canal['nome_canal']}")
+                        else:
+                            counters.erro += 1
+                            logger.warning(f"⚠️ Data not saved (all zeros): {canal['nome_canal']}")
                     else:
-                        canais_erro += 1
-                        logger.warning(f"⚠️ [{index}/{total_canais}] Data not saved (all zeros): {canal['nome_canal']}")
-                else:
-                    canais_erro += 1
-                    logger.warning(f"❌ [{index}/{total_canais}] Failed: {canal['nome_canal']}")
+                        counters.erro += 1
+                        logger.warning(f"❌ Failed: {canal['nome_canal']}")
+                    
+                    with observe(VIDEO_FETCH_SECONDS):
+                        videos_data = await collector.get_videos_data(canal['url_canal'], canal['nome_canal'])
+                    if videos_data:
+                        pending_videos.extend(db.build_video_row(canal['id'], video, data_coleta) for video in videos_data)
+                        counters.videos += len(videos_data)
+                    
+                    pending_last_collection.append(canal['id'])
                 
-                videos_data = await collector.get_videos_data(canal['url_canal'], canal['nome_canal'])
-                if videos_data:
-                    await db.save_videos_data(canal['id'], videos_data)
-                    videos_total += len(videos_data)
+                except Exception as e:
+                    logger.error(f"❌ Error processing {canal['nome_canal']}: {e}")
+                    counters.erro += 1
+                    counters.erros_por_tipo[type(e).__name__] += 1
+                    record_collector_error(type(e).__name__)
+                
+                counters.processados += 1
+                index = counters.processados
+                publish_progress("em_progresso")
                 
-                await db.update_last_collection(canal['id'])
-
-                # 🚀 OTIMIZAÇÃO: Removido sleep entre canais - RateLimiter já controla
-                # await asyncio.sleep(1)
-
-                # Atualizar progresso no banco a cada 10 canais
-                if index % 10 == 0 and coleta_id:
-                    try:
-                        await db.update_coleta_log(
-                            coleta_id=coleta_id,
-                            status="em_progresso",
-                            canais_sucesso=canais_sucesso,
-                            canais_erro=canais_erro,
-                            videos_coletados=videos_total,
-                            requisicoes_usadas=collector.total_quota_units
-                        )
-                        logger.info(f"📊 Progress update: {canais_sucesso} success, {canais_erro} errors, {videos_total} videos")
-                    except Exception as update_error:
-                        logger.warning(f"⚠️ Failed to update progress: {update_error}")
-
                 # Log de progresso a cada 25 canais
                 if index % 25 == 0:
                     logger.info("=" * 80)
                     logger.info(f"🔄 PROGRESS CHECKPOINT [{index}/{total_canais}]")
-                    logger.info(f"✅ Success: {canais_sucesso} | ❌ Errors: {canais_erro} | 🎬 Videos: {videos_total}")
+                    logger.info(f"✅ Success: {counters.sucesso} | ❌ Errors: {counters.erro} | 🎬 Videos: {counters.videos}")
                     logger.info(f"📡 API Requests: {collector.total_quota_units} | ⏱️  Time elapsed: ongoing")
                     logger.info("=" * 80)
-
-            except Exception as e:
-                logger.error(f"❌ Error processing {canal['nome_canal']}: {e}")
-                canais_erro += 1
-                continue
-        
+            
+            # Flush fora do semáforo: a vaga do canal já foi liberada para o próximo enquanto o lote grava.
+            # Lote fecha a cada COLLECTION_BATCH_SIZE canais ou antes, se os vídeos acumulados já enchem um upsert
+            if index % COLLECTION_BATCH_SIZE == 0 or len(pending_videos) >= COLLECTION_FLUSH_VIDEO_ROWS:
+                with observe(SUPABASE_WRITE_SECONDS):
+                    await flush_pending()
+        
+        # TaskGroup: nenhuma task fica solta. _collect_one já trata erro por canal - o que escapar
+        # é falha inesperada, cancela os demais canais e a coleta termina como erro
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for canal in canais_to_collect:
+                    waiting_tasks.add(tg.create_task(_collect_one(canal)))
+        except* Exception as eg:
+            for error in eg.exceptions:
+                logger.error(f"❌ Unexpected error during collection: {error!r}")
+            raise
+        
+        with observe(SUPABASE_WRITE_SECONDS):
+            await flush_pending()
+        
+        await stop_heartbeat()
         stats = collector.get_request_stats()
         total_requests = stats['total_quota_units']
         
         logger.info("=" * 80)
         logger.info(f"📊 COLLECTION STATISTICS")
-        logger.info(f"✅ Success: {canais_sucesso}/{total_canais}")
-        logger.info(f"❌ Errors: {canais_erro}/{total_canais}")
-        logger.info(f"🎬 Videos: {videos_total}")
+        logger.info(f"✅ Success: {counters.sucesso}/{total_canais}")
+        logger.info(f"❌ Errors: {counters.erro}/{total_canais}")
+        logger.info(f"🎬 Videos: {counters.videos}")
         logger.info(f"📡 Total API Requests: {total_requests}")
         logger.info(f"🔑 Active keys: {stats['active_keys']}/{len(collector.api_keys)}")
         logger.info("=" * 80)
         
-        if canais_sucesso > 0:
-            try:
-                logger.info("=" * 80)
-                logger.info("🔔 CHECKING NOTIFICATIONS")
-                logger.info("=" * 80)
-                await notifier.check_and_create_notifications()
-                logger.info("✅ Notification check completed")
-            except Exception as e:
-                logger.error(f"❌ Error checking notifications: {e}")
-        
-        if canais_sucesso >= (total_canais * 0.5):
-            logger.info("🧹 Cleanup threshold met (>50% success)")
+        # Último lote já está na fila - espera o worker terminar
+        notification_queue.put_nowait(None)
+        await notification_task
+        logger.info("✅ Notification check completed")
+        
+        if counters.sucesso >= total_canais * CLEANUP_SUCCESS_RATIO:
+            logger.info(f"🧹 Cleanup threshold met (>={CLEANUP_SUCCESS_RATIO:.0%} success)")
             await db.cleanup_old_data()
         else:
-            logger.warning(f"⏭️ Skipping cleanup - only {canais_sucesso}/{total_canais} succeeded")
+            logger.warning(f"⏭️ Skipping cleanup - only {counters.sucesso}/{total_canais} succeeded")
         
-        if canais_erro == 0:
-            status = "sucesso"
-        elif canais_sucesso > 0:
-            status = "parcial"
-        else:
-            status = "erro"
+        status = "sucesso" if counters.erro == 0 else "parcial" if counters.sucesso else "erro"
         
         if coleta_id:
             await db.update_coleta_log(
                 coleta_id=coleta_id,
                 status=status,
-                canais_sucesso=canais_sucesso,
-                canais_erro=canais_erro,
-                videos_coletados=videos_total,
-                requisicoes_usadas=total_requests
+                canais_sucesso=counters.sucesso,
+                canais_erro=counters.erro,
+                videos_coletados=counters.videos,
+                requisicoes_usadas=total_requests,
+                erros_por_tipo=dict(counters.erros_por_tipo)
             )
+        publish_progress(status)
+        
+        # Dados novos - dashboard não pode continuar servindo o cache da véspera
+        await db.refresh_dashboard_views()
+        await response_cache.clear()
+        await warm_response_cache()
         
         logger.info("=" * 80)
         logger.info(f"✅ COLLECTION COMPLETED")
         logger.info("=" * 80)
         
-        last_collection_time = datetime.now(timezone.utc)
+        app.state.collect.last_time = datetime.now(timezone.utc)
+        app.state.collect.last_monotonic = time.monotonic()
         
         # Run daily analysis
         await run_daily_analysis_job()
         
     except Exception as e:
+        await stop_heartbeat()
         logger.error("=" * 80)
-        logger.error(f"❌ COLLECTION JOB FAILED: {e}")
+        logger.error("❌ COLLECTION JOB FAILED: %s", e)
         logger.error("=" * 80)
         
         if coleta_id:
             await db.update_coleta_log(
                 coleta_id=coleta_id,
                 status="erro",
-                canais_sucesso=canais_sucesso,
-                canais_erro=canais_erro,
-                videos_coletados=videos_total,
-                requisicoes_usadas=collector.total_quota_units if hasattr(collector, 'total_quota_units') else 0,
-                mensagem_erro=str(e)
+                canais_sucesso=counters.sucesso,
+                canais_erro=counters.erro,
+                videos_coletados=counters.videos,
+                requisicoes_usadas=collector.total_quota_units,
+                mensagem_erro=str(e),
+                erros_por_tipo=dict(counters.erros_por_tipo)
             )
+            publish_coleta_event(coleta_id, {**coleta_progress.get(coleta_id, {}), "coleta_id": coleta_id, "status": "erro", "mensagem_erro": str(e)})
         
         raise
     finally:
-        collection_in_progress = False
+        if notification_task and not notification_task.done():
+            notification_task.cancel()
+        if coleta_id:
+            coleta_progress.pop(coleta_id, None)
+        await db.release_collection_lock()
+
+
+async def coleta_heartbeat(coleta_id: int, counters: CollectionCounters, stop: asyncio.Event):
+    """Grava o progresso da coleta a cada COLLECTION_HEARTBEAT_SECONDS (não por canal) até stop ser setado"""
+    while True:
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=COLLECTION_HEARTBEAT_SECONDS)
+            return
+        except asyncio.TimeoutError:
+            pass
+        
+        try:
+            await db.update_coleta_log(
+                coleta_id=coleta_id,
+                status="em_progresso",
+                canais_sucesso=counters.sucesso,
+                canais_erro=counters.erro,
+                videos_coletados=counters.videos,
+                requisicoes_usadas=collector.total_quota_units
+            )
+            logger.info(f"📊 Progress update: {counters.sucesso} success, {counters.erro} errors, {counters.videos} videos")
+        except Exception as update_error:
+            logger.warning(f"⚠️ Failed to update progress: {update_error}")
+
+
+async def notification_worker(queue: asyncio.Queue):
+    """Consome lotes de canal_ids (vídeos já salvos) e verifica notificações só desses canais - None encerra"""
+    while True:
+        canal_ids = await queue.get()
+        if canal_ids is None:
+            break
+        
+        try:
+            logger.info(f"🔔 Checking notifications for {len(canal_ids)} canais")
+            await notifier.check_and_create_notifications(canal_ids=canal_ids)
+        except Exception as e:
+            logger.error("❌ Error checking notifications: %s", e)
 
 
 # =========================================================================
@@ -1350,7 +1927,7 @@ async def run_daily_analysis_job():
 
         logger.info("OK - DAILY ANALYSIS COMPLETED")
     except Exception as e:
-        logger.error(f"ERRO - DAILY ANALYSIS FAILED: {e}")
+        logger.error("ERRO - DAILY ANALYSIS FAILED: %s", e)
 
 async def run_weekly_report_job():
     """Gera relatório semanal completo (segundas 5h AM)"""
@@ -1371,24 +1948,45 @@ async def run_weekly_report_job():
         report = generator.generate_weekly_report()
         logger.info(f"✅ WEEKLY REPORT COMPLETED: {report['week_start']} to {report['week_end']}")
     except Exception as e:
-        logger.error(f"❌ WEEKLY REPORT FAILED: {e}")
+        logger.error("❌ WEEKLY REPORT FAILED: %s", e)
 
-async def weekly_report_scheduler():
-    """Background task para relatório semanal (segundas 5h AM)"""
-    while True:
-        try:
-            now = datetime.now(timezone.utc)
-            sao_paulo_tz = timezone(timedelta(hours=-3))
-            now_sp = now.astimezone(sao_paulo_tz)
-
-            if now_sp.weekday() == 0 and now_sp.hour >= 5:
-                await run_weekly_report_job()
-                await asyncio.sleep(86400)
-            else:
-                await asyncio.sleep(3600)
-        except Exception as e:
-            logger.error(f"❌ Weekly scheduler error: {e}")
-            await asyncio.sleep(3600)
+_scheduler_lock_file = None
+
+def acquire_scheduler_lock() -> bool:
+    """Lock de arquivo não bloqueante - o primeiro worker que pegar fica com os jobs agendados"""
+    global _scheduler_lock_file
+    
+    if fcntl is None:
+        return True
+    
+    lock_path = os.environ.get("SCHEDULER_LOCK_FILE", "/tmp/ytdash-scheduler.lock")
+    lock_file = open(lock_path, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    
+    # Mantém o arquivo aberto: o lock é liberado pelo SO quando o processo termina
+    _scheduler_lock_file = lock_file
+    return True
+
+
+def schedule_cron_job(func, job_id: str, trigger: CronTrigger):
+    """Registra um job cron no scheduler preservando o next_run_time de um job já persistido"""
+    try:
+        # Sem replace_existing: um job já persistido mantém o next_run_time antigo,
+        # e se ele passou durante o restart o scheduler trata como misfire e roda
+        scheduler.add_job(
+            func,
+            trigger,
+            id=job_id,
+            coalesce=True,  # várias execuções perdidas viram uma só
+            misfire_grace_time=3600  # até 1h de atraso ainda roda
+        )
+    except ConflictingIdError:
+        if str(scheduler.get_job(job_id).trigger) != str(trigger):
+            scheduler.reschedule_job(job_id, trigger=trigger)
 
 
 @app.on_event("startup")
@@ -1401,56 +1999,98 @@ async def startup_event():
         await db.test_connection()
         logger.info("✅ Database connected")
     except Exception as e:
-        logger.error(f"❌ Database failed: {e}")
+        logger.error("❌ Database failed: %s", e)
+    
+    await db.connect_pool()
+    await response_cache.connect()
+    
+    # Cliente HTTP compartilhado (transcrição): keep-alive/HTTP2 reaproveitados entre jobs
+    app.state.http = httpx.AsyncClient(
+        timeout=httpx.Timeout(1800.0),
+        http2=True,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+    )
     
     try:
         await db.cleanup_stuck_collections()
     except Exception as e:
-        logger.error(f"Error cleaning stuck collections: {e}")
+        logger.error("Error cleaning stuck collections: %s", e)
     
-    logger.info("📅 Scheduling daily collection (NO startup collection)")
-    asyncio.create_task(schedule_daily_collection())
-    asyncio.create_task(weekly_report_scheduler())
-    logger.info("=" * 80)
-
-async def schedule_daily_collection():
-    logger.info("=" * 80)
-    logger.info("⏰ PROTEÇÃO DE STARTUP ATIVADA")
-    logger.info("⏳ Aguardando 5 minutos para evitar coletas durante deploy...")
-    logger.info("=" * 80)
-    await asyncio.sleep(300)
-    logger.info("✅ Proteção de startup completa - scheduler ativo")
+    # Com vários workers só um agenda os jobs (senão cada worker dispararia a coleta diária)
+    if not acquire_scheduler_lock():
+        logger.info("📅 Scheduler ativo em outro worker - este worker só atende requisições")
+        logger.info("=" * 80)
+        return
     
-    while True:
+    # Jobstore persistente no Postgres: a última execução sobrevive a restart/deploy, então uma
+    # coleta perdida durante o restart ainda roda (dentro do misfire_grace_time) em vez de pular o dia
+    database_url = os.environ.get("DATABASE_URL")
+    if database_url and SQLAlchemyJobStore is not None:
         try:
-            now = datetime.now(timezone.utc)
-            
-            next_run = now.replace(hour=8, minute=0, second=0, microsecond=0)
-            
-            if next_run <= now:
-                next_run += timedelta(days=1)
-            
-            sleep_seconds = (next_run - now).total_seconds()
-            
-            logger.info("=" * 80)
-            logger.info(f"⏰ Next collection: {next_run.isoformat()} (05:00 AM São Paulo)")
-            logger.info(f"⏳ Sleeping for {sleep_seconds/3600:.1f} hours")
-            logger.info("=" * 80)
-            
-            await asyncio.sleep(sleep_seconds)
-            
-            can_collect, message = await can_start_collection()
-            
-            if can_collect:
-                logger.info("🚀 Starting scheduled collection...")
-                await run_collection_job()
-            else:
-                logger.warning(f"⚠️ Scheduled collection blocked: {message}")
-            
+            scheduler.add_jobstore(SQLAlchemyJobStore(url=database_url), alias="default")
+            logger.info("📅 Scheduler jobstore: Postgres (apscheduler_jobs)")
         except Exception as e:
-            logger.error(f"❌ Scheduled collection failed: {e}")
-            await asyncio.sleep(3600)
+            logger.error("❌ Jobstore persistente indisponível, usando memória: %s", e)
+    
+    # Timer absoluto (cron) em vez de sleep de horas - sem coleta no startup/deploy
+    scheduler.start()
+    schedule_cron_job(run_collection_job_guarded, "daily_collection", CronTrigger(hour=5, minute=0, timezone=SCHEDULER_TIMEZONE))
+    logger.info(f"📅 Daily collection scheduled: {scheduler.get_job('daily_collection').next_run_time.isoformat()} (05:00 AM São Paulo)")
+    # Relatório semanal no mesmo scheduler: um timer até segunda 5h em vez de acordar de hora em hora
+    schedule_cron_job(run_weekly_report_job, "weekly_report", CronTrigger(day_of_week="mon", hour=5, minute=0, timezone=SCHEDULER_TIMEZONE))
+    logger.info(f"📅 Weekly report scheduled: {scheduler.get_job('weekly_report').next_run_time.isoformat()} (segunda 05:00 AM São Paulo)")
+    logger.info("=" * 80)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    for task in list(app.state.transcription.tasks):
+        task.cancel()
+    await db.close_pool()
+    await response_cache.close()
+    await app.state.http.aclose()
+    await collector.close()
+    db.close()
+
+async def run_collection_job_guarded():
+    """Job diário do scheduler - respeita as mesmas travas do /api/collect-data"""
+    try:
+        # Idempotente por dia: misfire depois de restart/deploy (jobstore persistente) ou coleta manual
+        # já feita hoje não gasta a quota de novo. Meia-noite calculada no fuso de São Paulo (DST-safe)
+        inicio_do_dia = datetime.now(ZoneInfo(SCHEDULER_TIMEZONE)).replace(hour=0, minute=0, second=0, microsecond=0)
+        if await db.collection_completed_since(inicio_do_dia.isoformat()):
+            logger.info(f"⏭️ Scheduled collection skipped: coleta de {inicio_do_dia.date().isoformat()} já concluída")
+            return
+        
+        can_collect, message = await can_start_collection()
+        
+        if can_collect:
+            logger.info("🚀 Starting scheduled collection...")
+            await run_collection_job()
+        else:
+            logger.warning(f"⚠️ Scheduled collection blocked: {message}")
+    except Exception as e:
+        logger.error("❌ Scheduled collection failed: %s", e)
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # uvicorn supervisiona os workers (mesmo papel do master do gunicorn). Com >1 worker configurar
+    # REDIS_URL: status de transcrição e cache de respostas ficam compartilhados entre os processos;
+    # scheduler e coleta já usam lock de arquivo/advisory lock
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop=EVENT_LOOP,
+        http=HTTP_IMPL,
+        workers=workers,
+        backlog=2048,
+        # Dashboard faz polling de poucos em poucos segundos: reaproveita a conexão (padrão do uvicorn é 5s)
+        timeout_keep_alive=int(os.environ.get("KEEP_ALIVE_TIMEOUT", 30)),
+        # Uma linha de log por request (o polling do dashboard gera muitas) - latência/status por endpoint
+        # já saem no /metrics. ACCESS_LOG=true liga de volta para depurar
+        access_log=os.environ.get("ACCESS_LOG", "false").lower() == "true"
+    )
@@ -0,0 +1,67 @@
+"""
+Métricas Prometheus (scrape em /metrics)
+prometheus_client é opcional: sem ele as funções de registro viram no-op e /metrics não é montado.
+Com prometheus-fastapi-instrumentator instalado, /metrics também traz latência por endpoint.
+"""
+
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import Counter, Histogram, make_asgi_app
+except ImportError:
+    Counter = None
+    Histogram = None
+    make_asgi_app = None
+
+try:
+    from prometheus_fastapi_instrumentator import Instrumentator
+except ImportError:
+    Instrumentator = None
+
+if Counter is not None:
+    COLLECTOR_ERRORS = Counter(
+        "youtube_collector_errors",
+        "Canais com erro na coleta, por tipo de exceção",
+        ["kind"]
+    )
+    # Etapas de _collect_one - separa tempo de YouTube API do tempo de escrita no Supabase
+    CANAL_FETCH_SECONDS = Histogram("canal_fetch_seconds", "Busca dos dados do canal na YouTube API")
+    VIDEO_FETCH_SECONDS = Histogram("video_fetch_seconds", "Busca dos vídeos do canal na YouTube API")
+    SUPABASE_WRITE_SECONDS = Histogram("supabase_write_seconds", "Flush de um lote da coleta no Supabase")
+else:
+    COLLECTOR_ERRORS = None
+    CANAL_FETCH_SECONDS = None
+    VIDEO_FETCH_SECONDS = None
+    SUPABASE_WRITE_SECONDS = None
+
+
+def record_collector_error(kind: str):
+    """Conta um erro de canal (exposto como youtube_collector_errors_total{kind=...})"""
+    if COLLECTOR_ERRORS is not None:
+        COLLECTOR_ERRORS.labels(kind=kind).inc()
+
+
+@contextmanager
+def observe(histogram):
+    """Mede a duração do bloco no histograma (no-op sem prometheus_client)"""
+    if histogram is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def setup_metrics(app):
+    """Instrumenta a app (histograma de latência por endpoint) e expõe /metrics"""
+    if Instrumentator is not None:
+        Instrumentator(
+            should_group_status_codes=False,
+            excluded_handlers=["/health", "/metrics"]
+        ).instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
+    elif make_asgi_app is not None:
+        # Só prometheus_client: métricas da coleta, sem latência por endpoint
+        app.mount("/metrics", make_asgi_app())
@@ -0,0 +1,38 @@
+-- Migration: Add bulk_upsert_videos RPC
+-- Purpose: Upsert de um lote de vídeos da coleta em um único INSERT ... SELECT (sem devolver as linhas)
+-- Created: 2026-10-16
+
+-- payload: array JSON de linhas no formato de SupabaseClient.build_video_row, já sem chave repetida
+-- (ON CONFLICT não aceita a mesma (video_id, data_coleta) duas vezes no mesmo comando).
+-- jsonb_populate_recordset usa os tipos da própria tabela - nada a manter em sincronia aqui.
+CREATE OR REPLACE FUNCTION bulk_upsert_videos(payload jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  affected integer;
+BEGIN
+  INSERT INTO videos_historico (
+    canal_id, video_id, titulo, url_video, data_publicacao,
+    data_coleta, views_atuais, likes, comentarios, duracao
+  )
+  SELECT
+    canal_id, video_id, titulo, url_video, data_publicacao,
+    data_coleta, views_atuais, likes, comentarios, duracao
+  FROM jsonb_populate_recordset(NULL::videos_historico, payload)
+  ON CONFLICT (video_id, data_coleta) DO UPDATE SET
+    canal_id = EXCLUDED.canal_id,
+    titulo = EXCLUDED.titulo,
+    url_video = EXCLUDED.url_video,
+    data_publicacao = EXCLUDED.data_publicacao,
+    views_atuais = EXCLUDED.views_atuais,
+    likes = EXCLUDED.likes,
+    comentarios = EXCLUDED.comentarios,
+    duracao = EXCLUDED.duracao;
+
+  GET DIAGNOSTICS affected = ROW_COUNT;
+  RETURN affected;
+END;
+$$;
+
+COMMENT ON FUNCTION bulk_upsert_videos(jsonb) IS 'Upsert em lote de videos_historico (coleta) - retorna linhas afetadas';
@@ -0,0 +1,72 @@
+-- Migration: Add canais_dashboard_mv materialized view
+-- Purpose: /api/canais lê canais + histórico mais recente + score/growth já calculados (uma query indexada)
+-- Created: 2026-10-16
+
+-- Mesma regra de database._build_canal: histórico mais recente dos últimos 2 dias,
+-- score = (views_30d/inscritos)*0.7 + (views_7d/inscritos)*0.3,
+-- growth_7d = variação % dos últimos 7d sobre os 7d anteriores (views_15d - views_7d)
+CREATE MATERIALIZED VIEW IF NOT EXISTS canais_dashboard_mv AS
+SELECT
+  c.id,
+  c.nome_canal,
+  c.url_canal,
+  c.nicho,
+  c.subnicho,
+  COALESCE(c.lingua, 'N/A') AS lingua,
+  COALESCE(c.tipo, 'minerado') AS tipo,
+  c.status,
+  c.ultima_coleta,
+  COALESCE(h.views_30d, 0) AS views_30d,
+  COALESCE(h.views_15d, 0) AS views_15d,
+  COALESCE(h.views_7d, 0) AS views_7d,
+  COALESCE(h.inscritos, 0) AS inscritos,
+  COALESCE(h.engagement_rate, 0)::float8 AS engagement_rate,
+  COALESCE(h.videos_publicados_7d, 0) AS videos_publicados_7d,
+  CASE WHEN h.inscritos > 0
+    THEN ROUND((h.views_30d::numeric / h.inscritos) * 0.7 + (h.views_7d::numeric / h.inscritos) * 0.3, 2)::float8
+    ELSE 0
+  END AS score_calculado,
+  0 AS growth_30d,
+  CASE WHEN h.views_7d > 0 AND h.views_15d - h.views_7d > 0
+    THEN ROUND(((h.views_7d - (h.views_15d - h.views_7d))::numeric / (h.views_15d - h.views_7d)) * 100, 2)::float8
+    ELSE 0
+  END AS growth_7d
+FROM canais_monitorados c
+LEFT JOIN LATERAL (
+  SELECT * FROM dados_canais_historico dh
+  WHERE dh.canal_id = c.id AND dh.data_coleta >= CURRENT_DATE - 2
+  ORDER BY dh.data_coleta DESC
+  LIMIT 1
+) h ON TRUE
+WHERE c.status = 'ativo';
+
+-- Único por id: obrigatório para REFRESH ... CONCURRENTLY (leituras não bloqueiam durante o refresh)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_canais_dashboard_mv_id
+  ON canais_dashboard_mv (id);
+
+-- Filtros de igualdade do dashboard + ordenação padrão (score DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_canais_dashboard_mv_tipo_nicho_score
+  ON canais_dashboard_mv (tipo, nicho, score_calculado DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_canais_dashboard_mv_score
+  ON canais_dashboard_mv (score_calculado DESC, id DESC);
+
+-- Chamado via RPC no fim de cada coleta e após add/update/delete de canal
+CREATE OR REPLACE FUNCTION refresh_canais_dashboard_mv()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  REFRESH MATERIALIZED VIEW CONCURRENTLY canais_dashboard_mv;
+END;
+$$;
+
+-- SECURITY DEFINER: só o backend (service_role) pode disparar o refresh
+REVOKE EXECUTE ON FUNCTION refresh_canais_dashboard_mv() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_canais_dashboard_mv() TO service_role;
+
+GRANT SELECT ON canais_dashboard_mv TO anon, authenticated, service_role;
+
+COMMENT ON MATERIALIZED VIEW canais_dashboard_mv IS 'Canais ativos + histórico mais recente + score/growth (dashboard). Atualizada por refresh_canais_dashboard_mv()';
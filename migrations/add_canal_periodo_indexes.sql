@@ -0,0 +1,14 @@
+-- Migration: Add per-channel publication-period index on videos_historico
+-- Purpose: Vídeos de um conjunto de canais dentro da janela de publicação (notifier pós-coleta)
+-- Created: 2026-10-16
+
+-- Executar fora de transação (CONCURRENTLY), como add_dashboard_filter_indexes.sql.
+
+-- get_videos_that_hit_milestone: WHERE canal_id IN (...) AND data_publicacao >= :cutoff
+-- canal_id (igualdade, mais seletivo) na frente, período como range logo em seguida
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_videos_canal_periodo
+  ON videos_historico (canal_id, data_publicacao DESC);
+
+-- O composto de canais_monitorados já existe (idx_canais_tipo_nicho: tipo, nicho, subnicho
+-- WHERE status = 'ativo'). score / views_60d não são colunas da tabela - são derivados do
+-- histórico em get_canais_with_filters -, então (nicho, tipo, score DESC) não é indexável.
@@ -0,0 +1,8 @@
+-- Migration: Add per-exception error counts to coletas_historico
+-- Purpose: Guardar quantos canais falharam por tipo de exceção em cada coleta
+-- Created: 2026-10-16
+
+ALTER TABLE coletas_historico
+  ADD COLUMN IF NOT EXISTS erros_por_tipo JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+COMMENT ON COLUMN coletas_historico.erros_por_tipo IS 'Erros da coleta por tipo de exceção, ex: {"TimeoutError": 3}';
@@ -0,0 +1,26 @@
+-- Migration: Add indexes for /api/canais and /api/videos filters
+-- Purpose: Cobrir os WHERE de get_canais_with_filters e get_videos_with_filters (evitar seq scan)
+-- Created: 2026-10-16
+
+-- CONCURRENTLY não bloqueia escrita durante a coleta, mas não roda dentro de transação:
+-- executar cada comando separadamente (SQL Editor / psql sem BEGIN).
+
+-- Canais ativos filtrados por tipo/nicho/subnicho (parcial: inativos ficam fora do índice)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_canais_tipo_nicho
+  ON canais_monitorados (tipo, nicho, subnicho)
+  WHERE status = 'ativo';
+
+-- Histórico mais recente por canal (LATERAL ... ORDER BY data_coleta DESC LIMIT 1)
+-- e janela de 2 dias do caminho REST (data_coleta >= ...)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historico_canal_data
+  ON dados_canais_historico (canal_id, data_coleta DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_historico_data_coleta
+  ON dados_canais_historico (data_coleta);
+
+-- Vídeos por período de publicação ordenados por views
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_videos_pub_views
+  ON videos_historico (data_publicacao DESC, views_atuais DESC);
+
+-- score_calculado / growth_7d / views_*d não são colunas de canais_monitorados:
+-- vêm do histórico e são calculados na aplicação, então não há índice de score possível aqui.
@@ -0,0 +1,26 @@
+-- Migration: Add delete_canal_cascade RPC
+-- Purpose: DELETE /api/canais/{id}?permanent=true em um round trip e uma transação (notificações + histórico + canal)
+-- Created: 2026-10-16
+
+-- Antes eram 5 DELETEs separados via REST: se o último falhasse, as notificações e o histórico
+-- já tinham sido apagados e o canal continuava lá. Aqui tudo ou nada.
+-- Retorna FALSE quando o canal não existe (o endpoint responde 404).
+CREATE OR REPLACE FUNCTION delete_canal_cascade(p_canal_id bigint)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  affected integer;
+BEGIN
+  DELETE FROM notificacoes WHERE canal_id = p_canal_id;
+  DELETE FROM videos_historico WHERE canal_id = p_canal_id;
+  DELETE FROM dados_canais_historico WHERE canal_id = p_canal_id;
+  DELETE FROM favoritos WHERE tipo = 'canal' AND item_id = p_canal_id;
+  DELETE FROM canais_monitorados WHERE id = p_canal_id;
+
+  GET DIAGNOSTICS affected = ROW_COUNT;
+  RETURN affected > 0;
+END;
+$$;
+
+COMMENT ON FUNCTION delete_canal_cascade(bigint) IS 'Exclusão permanente de um canal e tudo que referencia ele, em uma transação';
@@ -0,0 +1,8 @@
+-- Migration: Add lookup index on favoritos
+-- Purpose: get_favoritos_* / add_favorito / remove_favorito filtram sempre por (tipo, item_id)
+-- Created: 2026-10-16
+
+-- favoritos.item_id é polimórfico (canal ou vídeo, conforme tipo) - não dá para ter FK direta,
+-- então o índice composto cobre os filtros eq("tipo").eq("item_id") e eq("tipo") sozinho.
+CREATE INDEX IF NOT EXISTS idx_favoritos_tipo_item
+  ON favoritos (tipo, item_id);
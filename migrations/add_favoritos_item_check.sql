@@ -0,0 +1,36 @@
+-- Migration: Validate favoritos.item_id in the database + unique (tipo, item_id)
+-- Purpose: add_favorito faz 1 upsert só (sem SELECT de existência antes / sem checar duplicata)
+-- Created: 2026-10-16
+
+-- item_id é polimórfico (canal ou vídeo conforme tipo), então não dá para usar FOREIGN KEY.
+-- O trigger faz a mesma checagem e levanta o mesmo código de erro de FK (23503),
+-- que a API traduz para 404.
+CREATE OR REPLACE FUNCTION check_favorito_item_exists()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.tipo = 'canal' AND NOT EXISTS (SELECT 1 FROM canais_monitorados WHERE id = NEW.item_id) THEN
+    RAISE EXCEPTION 'Canal % não encontrado', NEW.item_id USING ERRCODE = 'foreign_key_violation';
+  ELSIF NEW.tipo = 'video' AND NOT EXISTS (SELECT 1 FROM videos_historico WHERE id = NEW.item_id) THEN
+    RAISE EXCEPTION 'Vídeo % não encontrado', NEW.item_id USING ERRCODE = 'foreign_key_violation';
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_favoritos_item_exists ON favoritos;
+CREATE TRIGGER trg_favoritos_item_exists
+  BEFORE INSERT OR UPDATE ON favoritos
+  FOR EACH ROW EXECUTE FUNCTION check_favorito_item_exists();
+
+-- Chave do upsert (on_conflict="tipo,item_id") - remove duplicatas antes
+DELETE FROM favoritos a
+  USING favoritos b
+  WHERE a.tipo = b.tipo
+    AND a.item_id = b.item_id
+    AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_favoritos_tipo_item
+  ON favoritos (tipo, item_id);
+
+-- O índice único cobre os mesmos filtros do índice simples criado em add_favoritos_indexes
+DROP INDEX IF EXISTS idx_favoritos_tipo_item;
@@ -0,0 +1,37 @@
+-- Migration: Add filtros_cache materialized view
+-- Purpose: /api/filtros lê uma linha pronta (nichos/subnichos/linguas/canais) em vez de 4 scans de canais_monitorados
+-- Created: 2026-10-16
+
+-- Uma linha só (id = 1) com as listas já ordenadas - mesmo formato de SupabaseClient.get_filter_options
+CREATE MATERIALIZED VIEW IF NOT EXISTS filtros_cache AS
+SELECT
+  1 AS id,
+  COALESCE(array_agg(DISTINCT nicho ORDER BY nicho) FILTER (WHERE nicho IS NOT NULL AND nicho <> ''), '{}') AS nichos,
+  COALESCE(array_agg(DISTINCT subnicho ORDER BY subnicho) FILTER (WHERE subnicho IS NOT NULL AND subnicho <> ''), '{}') AS subnichos,
+  COALESCE(array_agg(DISTINCT lingua ORDER BY lingua) FILTER (WHERE lingua IS NOT NULL AND lingua <> ''), '{}') AS linguas,
+  COALESCE(array_agg(nome_canal ORDER BY nome_canal) FILTER (WHERE status = 'ativo'), '{}') AS canais
+FROM canais_monitorados;
+
+-- Índice único: obrigatório para REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_filtros_cache_id
+  ON filtros_cache (id);
+
+-- Chamado via RPC junto com refresh_canais_dashboard_mv (fim da coleta e add/update/delete de canal)
+CREATE OR REPLACE FUNCTION refresh_filtros_cache()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  REFRESH MATERIALIZED VIEW CONCURRENTLY filtros_cache;
+END;
+$$;
+
+-- SECURITY DEFINER: só o backend (service_role) pode disparar o refresh
+REVOKE EXECUTE ON FUNCTION refresh_filtros_cache() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION refresh_filtros_cache() TO service_role;
+
+GRANT SELECT ON filtros_cache TO anon, authenticated, service_role;
+
+COMMENT ON MATERIALIZED VIEW filtros_cache IS 'Opções de filtro do dashboard (/api/filtros). Atualizada por refresh_filtros_cache()';
@@ -0,0 +1,42 @@
+-- Migration: Add get_canais_dashboard RPC
+-- Purpose: /api/canais com todos os filtros em uma função SQL parametrizada sobre canais_dashboard_mv
+-- Created: 2026-10-16
+
+-- Parâmetro NULL = filtro desligado. STABLE + LANGUAGE sql + um único SELECT: o Postgres faz inline
+-- da função na query do PostgREST, então cada combinação de filtros ainda usa os índices da view
+-- (idx_canais_dashboard_mv_tipo_nicho_score / idx_canais_dashboard_mv_score).
+-- Mesma ordenação do cursor de /api/canais: score_calculado DESC, id DESC.
+CREATE OR REPLACE FUNCTION get_canais_dashboard(
+  p_tipo text DEFAULT NULL,
+  p_nicho text DEFAULT NULL,
+  p_subnicho text DEFAULT NULL,
+  p_lingua text DEFAULT NULL,
+  p_ids bigint[] DEFAULT NULL,
+  p_views_30d_min bigint DEFAULT NULL,
+  p_views_15d_min bigint DEFAULT NULL,
+  p_views_7d_min bigint DEFAULT NULL,
+  p_score_min float8 DEFAULT NULL,
+  p_growth_min float8 DEFAULT NULL
+)
+RETURNS SETOF canais_dashboard_mv
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT *
+  FROM canais_dashboard_mv
+  WHERE (p_tipo IS NULL OR tipo = p_tipo)
+    AND (p_nicho IS NULL OR nicho = p_nicho)
+    AND (p_subnicho IS NULL OR subnicho = p_subnicho)
+    AND (p_lingua IS NULL OR lingua = p_lingua)
+    AND (p_ids IS NULL OR id = ANY (p_ids))
+    AND (p_score_min IS NULL OR score_calculado >= p_score_min)
+    AND (p_growth_min IS NULL OR growth_7d >= p_growth_min)
+    AND (p_views_7d_min IS NULL OR views_7d >= p_views_7d_min)
+    AND (p_views_15d_min IS NULL OR views_15d >= p_views_15d_min)
+    AND (p_views_30d_min IS NULL OR views_30d >= p_views_30d_min)
+  ORDER BY score_calculado DESC, id DESC;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_canais_dashboard(text, text, text, text, bigint[], bigint, bigint, bigint, float8, float8) TO anon, authenticated, service_role;
+
+COMMENT ON FUNCTION get_canais_dashboard(text, text, text, text, bigint[], bigint, bigint, bigint, float8, float8) IS 'Canais do dashboard filtrados (canais_dashboard_mv) - NULL desliga o filtro';
@@ -0,0 +1,24 @@
+-- Migration: Add unique keys to dados_canais_historico and videos_historico
+-- Purpose: Permitir upsert em lote (ON CONFLICT) na coleta em vez de select + insert/update por linha
+-- Created: 2026-10-16
+
+-- 1. Remover duplicatas (mantém a linha mais nova de cada chave) - senão o índice único falha
+DELETE FROM dados_canais_historico a
+  USING dados_canais_historico b
+  WHERE a.canal_id = b.canal_id
+    AND a.data_coleta = b.data_coleta
+    AND a.id < b.id;
+
+DELETE FROM videos_historico a
+  USING videos_historico b
+  WHERE a.video_id = b.video_id
+    AND a.data_coleta = b.data_coleta
+    AND a.id < b.id;
+
+-- 2. Chaves únicas usadas em on_conflict pelo SupabaseClient
+--    (bulk_save_canal_data: "canal_id,data_coleta" / save_videos_batch: "video_id,data_coleta")
+CREATE UNIQUE INDEX IF NOT EXISTS uq_dados_canais_historico_canal_data
+  ON dados_canais_historico (canal_id, data_coleta);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_videos_historico_video_data
+  ON videos_historico (video_id, data_coleta);
@@ -0,0 +1,10 @@
+-- Migration: Add keyset pagination index on videos_historico
+-- Purpose: /api/videos pagina por cursor em (views_atuais DESC, id DESC) em vez de OFFSET
+-- Created: 2026-10-16
+
+-- Índice composto na mesma ordem da chave do cursor:
+-- WHERE (views_atuais, id) < (:order_val, :id) ORDER BY views_atuais DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_videos_views_id_keyset
+  ON videos_historico (views_atuais DESC, id DESC);
+
+COMMENT ON INDEX idx_videos_views_id_keyset IS 'Keyset pagination de /api/videos (views_atuais DESC, id DESC)';
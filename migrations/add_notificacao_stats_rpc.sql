@@ -0,0 +1,22 @@
+-- Migration: Add notificacao_stats RPC
+-- Purpose: /api/notificacoes/stats em um scan e um round trip sem DATABASE_URL (no lugar de 4 COUNTs via REST)
+-- Created: 2026-10-16
+
+-- Mesma query do caminho asyncpg de SupabaseClient.get_notificacao_stats.
+-- Sem materialized view: marcar/desmarcar vista precisa aparecer na hora no contador.
+CREATE OR REPLACE FUNCTION notificacao_stats(p_hoje timestamptz, p_semana timestamptz)
+RETURNS TABLE (total bigint, nao_vistas bigint, hoje bigint, esta_semana bigint)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT
+    COUNT(*) AS total,
+    COUNT(*) FILTER (WHERE vista = false) AS nao_vistas,
+    COUNT(*) FILTER (WHERE data_disparo >= p_hoje) AS hoje,
+    COUNT(*) FILTER (WHERE data_disparo >= p_semana) AS esta_semana
+  FROM notificacoes;
+$$;
+
+GRANT EXECUTE ON FUNCTION notificacao_stats(timestamptz, timestamptz) TO anon, authenticated, service_role;
+
+COMMENT ON FUNCTION notificacao_stats(timestamptz, timestamptz) IS 'Contadores de /api/notificacoes/stats em um scan';
@@ -0,0 +1,10 @@
+-- Migration: Add keyset pagination index on notificacoes
+-- Purpose: /api/notificacoes/todas pagina por cursor em (data_disparo DESC, id DESC) em vez de OFFSET
+-- Created: 2026-10-16
+
+-- Mesma ordem da chave do cursor:
+-- WHERE data_disparo < :v OR (data_disparo = :v AND id < :id) ORDER BY data_disparo DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_notificacoes_data_disparo_id_keyset
+  ON notificacoes (data_disparo DESC, id DESC);
+
+COMMENT ON INDEX idx_notificacoes_data_disparo_id_keyset IS 'Keyset pagination de /api/notificacoes/todas (data_disparo DESC, id DESC)';
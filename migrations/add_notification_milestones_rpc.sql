@@ -0,0 +1,61 @@
+-- Migration: Add get_notification_milestones RPC
+-- Purpose: Marcos de todas as regras ativas em uma query por verificação (no lugar de filtrar os candidatos na aplicação)
+-- Created: 2026-10-16
+
+-- Um par (regra, vídeo) por vídeo que atingiu o marco da regra: publicado dentro do período da regra,
+-- views >= views_minimas, tipo de canal da regra. Um registro por vídeo (coleta com mais views), como
+-- NotificationChecker.get_milestone_candidates. Vídeos que já tiveram notificação vista ficam de fora.
+-- Subnichos da regra continuam filtrados na aplicação.
+-- Ordenado por (regra_id, video_id) para a paginação com range() ser estável.
+CREATE OR REPLACE FUNCTION get_notification_milestones(p_canal_ids bigint[] DEFAULT NULL)
+RETURNS TABLE (
+  regra_id bigint,
+  video_id text,
+  titulo text,
+  canal_id bigint,
+  nome_canal text,
+  tipo_canal text,
+  subnicho text,
+  views_atuais bigint,
+  data_publicacao timestamptz
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH r AS (
+    SELECT id, periodo_dias, views_minimas, COALESCE(tipo_canal, 'ambos') AS tipo_canal
+    FROM regras_notificacoes
+    WHERE ativa
+  ),
+  v AS (
+    SELECT DISTINCT ON (vh.video_id) vh.video_id, vh.titulo, vh.canal_id, vh.views_atuais, vh.data_publicacao
+    FROM videos_historico vh
+    WHERE vh.data_publicacao >= now() - make_interval(days => (SELECT max(periodo_dias) FROM r)::int)
+      AND vh.views_atuais >= (SELECT min(views_minimas) FROM r)
+      AND (p_canal_ids IS NULL OR vh.canal_id = ANY (p_canal_ids))
+    ORDER BY vh.video_id, vh.views_atuais DESC
+  )
+  SELECT
+    r.id::bigint,
+    v.video_id::text,
+    v.titulo::text,
+    v.canal_id::bigint,
+    c.nome_canal::text,
+    COALESCE(c.tipo, 'minerado')::text,
+    c.subnicho::text,
+    v.views_atuais::bigint,
+    v.data_publicacao::timestamptz
+  FROM r
+  JOIN v ON v.data_publicacao >= now() - make_interval(days => r.periodo_dias::int)
+        AND v.views_atuais >= r.views_minimas
+  JOIN canais_monitorados c ON c.id = v.canal_id
+        AND (r.tipo_canal = 'ambos' OR c.tipo = r.tipo_canal)
+  WHERE NOT EXISTS (
+    SELECT 1 FROM notificacoes n WHERE n.video_id = v.video_id AND n.vista = true
+  )
+  ORDER BY r.id, v.video_id;
+$$;
+
+GRANT EXECUTE ON FUNCTION get_notification_milestones(bigint[]) TO anon, authenticated, service_role;
+
+COMMENT ON FUNCTION get_notification_milestones(bigint[]) IS 'Pares (regra, vídeo) que atingiram marco - verificação de notificações';
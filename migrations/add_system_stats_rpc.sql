@@ -0,0 +1,41 @@
+-- Migration: Add system_stats RPC
+-- Purpose: /api/stats agregado no banco (GROUP BY) em um round trip sem DATABASE_URL
+-- Created: 2026-10-16
+
+-- Mesma query do caminho asyncpg de SupabaseClient.get_system_stats (SYSTEM_STATS_SQL).
+-- Antes o backend trazia todas as linhas de canais_monitorados e contava em Python: o max-rows do
+-- PostgREST cortava a resposta e por_nicho/por_tipo/por_lingua ficavam menores que total_canais.
+CREATE OR REPLACE FUNCTION system_stats()
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT json_build_object(
+    'total_canais', (SELECT COUNT(*) FROM canais_monitorados),
+    'total_videos', (SELECT COUNT(*) FROM videos_historico),
+    'last_collection', (SELECT MAX(ultima_coleta) FROM canais_monitorados),
+    'canais_ativos', (SELECT COUNT(*) FROM canais_monitorados WHERE status = 'ativo'),
+    'por_nicho', (
+      SELECT COALESCE(json_object_agg(nicho, total), '{}'::json) FROM (
+        SELECT nicho, COUNT(*) AS total FROM canais_monitorados
+        WHERE status = 'ativo' AND nicho IS NOT NULL AND nicho <> '' GROUP BY nicho
+      ) t
+    ),
+    'por_tipo', (
+      SELECT COALESCE(json_object_agg(tipo, total), '{}'::json) FROM (
+        SELECT tipo, COUNT(*) AS total FROM canais_monitorados
+        WHERE status = 'ativo' AND tipo IS NOT NULL AND tipo <> '' GROUP BY tipo
+      ) t
+    ),
+    'por_lingua', (
+      SELECT COALESCE(json_object_agg(lingua, total), '{}'::json) FROM (
+        SELECT lingua, COUNT(*) AS total FROM canais_monitorados
+        WHERE status = 'ativo' AND lingua IS NOT NULL AND lingua <> '' GROUP BY lingua
+      ) t
+    )
+  );
+$$;
+
+GRANT EXECUTE ON FUNCTION system_stats() TO anon, authenticated, service_role;
+
+COMMENT ON FUNCTION system_stats() IS 'Agregados de /api/stats (contagens por nicho/tipo/língua) em um round trip';
@@ -0,0 +1,41 @@
+-- Migration: Skip unchanged rows in bulk_upsert_videos
+-- Purpose: Coleta repetida no mesmo dia não reescreve (nem gera WAL/dead tuples para) vídeos sem mudança
+-- Created: 2026-10-16
+
+-- Mesma função de add_bulk_upsert_videos_rpc.sql com um WHERE no DO UPDATE: a linha de
+-- (video_id, data_coleta) só é atualizada quando algum valor mudou. ROW_COUNT passa a contar
+-- só inserções e atualizações reais.
+CREATE OR REPLACE FUNCTION bulk_upsert_videos(payload jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  affected integer;
+BEGIN
+  INSERT INTO videos_historico AS v (
+    canal_id, video_id, titulo, url_video, data_publicacao,
+    data_coleta, views_atuais, likes, comentarios, duracao
+  )
+  SELECT
+    canal_id, video_id, titulo, url_video, data_publicacao,
+    data_coleta, views_atuais, likes, comentarios, duracao
+  FROM jsonb_populate_recordset(NULL::videos_historico, payload)
+  ON CONFLICT (video_id, data_coleta) DO UPDATE SET
+    canal_id = EXCLUDED.canal_id,
+    titulo = EXCLUDED.titulo,
+    url_video = EXCLUDED.url_video,
+    data_publicacao = EXCLUDED.data_publicacao,
+    views_atuais = EXCLUDED.views_atuais,
+    likes = EXCLUDED.likes,
+    comentarios = EXCLUDED.comentarios,
+    duracao = EXCLUDED.duracao
+  WHERE (v.canal_id, v.titulo, v.url_video, v.data_publicacao, v.views_atuais, v.likes, v.comentarios, v.duracao)
+    IS DISTINCT FROM
+    (EXCLUDED.canal_id, EXCLUDED.titulo, EXCLUDED.url_video, EXCLUDED.data_publicacao, EXCLUDED.views_atuais, EXCLUDED.likes, EXCLUDED.comentarios, EXCLUDED.duracao);
+
+  GET DIAGNOSTICS affected = ROW_COUNT;
+  RETURN affected;
+END;
+$$;
+
+COMMENT ON FUNCTION bulk_upsert_videos(jsonb) IS 'Upsert em lote de videos_historico (coleta) - retorna linhas inseridas/alteradas';
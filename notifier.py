@@ -5,13 +5,27 @@ Com sistema anti-duplicacao e elevacao de notificacoes.
 🆕 SUPORTA MÚLTIPLOS SUBNICHOS POR REGRA
 """
 
+import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Set, Tuple
 from supabase import Client
+from postgrest.exceptions import APIError
 
 logger = logging.getLogger(__name__)
 
+# Linhas por pagina na busca de candidatos (max-rows padrao do PostgREST)
+MILESTONE_PAGE_SIZE = 1000
+
+# Periodos com texto proprio nas mensagens (o resto vira "N dias")
+_PERIOD_MAP = {1: "24 horas", 3: "3 dias", 7: "7 dias", 14: "2 semanas"}
+
+# Linhas por INSERT de notificacoes novas
+NOTIFICATION_BATCH_SIZE = 500
+
+# video_ids/ids por consulta IN (mantem a URL do PostgREST curta)
+NOTIFICATION_LOOKUP_CHUNK = 200
+
 
 class NotificationChecker:
     """
@@ -27,12 +41,16 @@ class NotificationChecker:
             db: Cliente do Supabase para acesso ao banco de dados
         """
         self.db = db
+        # get_notification_milestones (migrations/add_notification_milestones_rpc.sql) - desliga sozinho se a
+        # função não existir, caindo na busca de candidatos + filtro por regra na aplicação
+        self._milestones_rpc_available = True
         logger.info("NotificationChecker inicializado")
     
     
-    async def check_and_create_notifications(self):
+    async def check_and_create_notifications(self, canal_ids: Optional[List[int]] = None):
         """
         Funcao principal que verifica e cria notificacoes.
+        canal_ids: limita a verificacao a esses canais (None = todos)
         
         Fluxo com anti-duplicacao:
         1. Busca regras ativas ordenadas por hierarquia
@@ -55,12 +73,26 @@ class NotificationChecker:
             
             logger.info(f"Encontradas {len(regras)} regras ativas")
             
+            # Regras ja carregadas, por periodo (comparacao de hierarquia sem ir ao banco)
+            regras_por_periodo: Dict[int, Dict] = {}
+            for regra in regras:
+                regras_por_periodo.setdefault(regra['periodo_dias'], regra)
+            
             total_criadas = 0
             total_atualizadas = 0
             total_puladas = 0
             
+            # Videos de cada regra + notificacoes ja existentes de todos eles (consultas em lote, nao uma por video)
+            videos_por_regra = await self.get_milestone_matches(regras, canal_ids)
+            video_ids = list({video['video_id'] for _, videos in videos_por_regra for video in videos})
+            nao_vistas, vistos = await self.get_existing_notifications(video_ids)
+            
+            # Notificacoes novas desta verificacao (video_id -> (video, regra)): inseridas em lote no final.
+            # Regra maior numa volta seguinte eleva aqui mesmo, sem ir ao banco
+            novas: Dict[str, tuple] = {}
+            
             # Processar cada regra (da menor para maior)
-            for regra in regras:
+            for regra, videos in videos_por_regra:
                 logger.info("-" * 80)
                 logger.info(f"Processando regra: {regra['nome_regra']}")
                 logger.info(f"Marco: {regra['views_minimas']} views em {regra['periodo_dias']} dia(s)")
@@ -71,9 +103,6 @@ class NotificationChecker:
                 else:
                     logger.info("Subnichos: TODOS")
                 
-                # Buscar videos que atingiram o marco
-                videos = await self.get_videos_that_hit_milestone(regra)
-                
                 if not videos:
                     logger.info("Nenhum video atingiu este marco")
                     continue
@@ -82,19 +111,29 @@ class NotificationChecker:
                 
                 # Processar cada video
                 for video in videos:
-                    # Limpar duplicatas antigas antes de processar
-                    await self.cleanup_duplicate_notifications(video['video_id'])
+                    pendente = novas.get(video['video_id'])
+                    if pendente:
+                        regra_anterior = pendente[1]
+                        if regra['views_minimas'] > regra_anterior['views_minimas']:
+                            novas[video['video_id']] = (video, regra)
+                            total_atualizadas += 1
+                            logger.info(f"✅ NOTIFICACAO ATUALIZADA: '{video['titulo'][:50]}...' ({regra_anterior['nome_regra']} → {regra['nome_regra']})")
+                        else:
+                            total_puladas += 1
+                            logger.info(f"⭕ Video '{video['titulo'][:50]}...' ja tem notificacao igual ou maior - PULANDO")
+                        continue
                     
-                    # Verificar se video ja tem notificacao NAO VISTA
-                    notificacao_existente = await self.get_unread_notification(video['video_id'])
+                    # Notificacao NAO VISTA do video (duplicatas ja removidas em get_existing_notifications)
+                    notificacao_existente = nao_vistas.get(video['video_id'])
                     
                     if notificacao_existente:
                         # Comparar hierarquia de regras
-                        regra_anterior = await self.get_regra_by_periodo(notificacao_existente['periodo_dias'])
+                        regra_anterior = regras_por_periodo.get(notificacao_existente['periodo_dias'])
                         
                         if regra_anterior and regra['views_minimas'] > regra_anterior['views_minimas']:
                             # Nova regra é maior - ATUALIZAR notificação
                             await self.update_notification(notificacao_existente['id'], video, regra)
+                            notificacao_existente['periodo_dias'] = regra['periodo_dias']
                             total_atualizadas += 1
                             logger.info(f"✅ NOTIFICACAO ATUALIZADA: '{video['titulo'][:50]}...' ({regra_anterior['nome_regra']} → {regra['nome_regra']})")
                         else:
@@ -102,18 +141,20 @@ class NotificationChecker:
                             logger.info(f"⭕ Video '{video['titulo'][:50]}...' ja tem notificacao igual ou maior - PULANDO")
                     else:
                         # Verificar se já foi visto alguma vez
-                        ja_visto = await self.video_already_seen(video['video_id'])
-                        
-                        if ja_visto:
+                        if video['video_id'] in vistos:
                             total_puladas += 1
                             logger.info(f"👁️ Video '{video['titulo'][:50]}...' ja foi visto anteriormente - PULANDO")
                             continue
                         
-                        # Criar nova notificacao
-                        await self.create_notification(video, regra)
+                        # Criar nova notificacao (no lote do final)
+                        novas[video['video_id']] = (video, regra)
                         total_criadas += 1
                         logger.info(f"🆕 NOTIFICACAO CRIADA: '{video['titulo'][:50]}...'")
             
+            await self.create_notifications([
+                self.build_notification(video, regra) for video, regra in novas.values()
+            ])
+            
             logger.info("=" * 80)
             logger.info(f"✅ VERIFICACAO COMPLETA")
             logger.info(f"   Criadas: {total_criadas}")
@@ -133,104 +174,65 @@ class NotificationChecker:
         Menor para maior: 15k → 50k → 100k → 150k
         """
         try:
-            response = self.db.table("regras_notificacoes")\
-                .select("*")\
-                .eq("ativa", True)\
-                .order("views_minimas")\
-                .execute()
+            response = await asyncio.to_thread(
+                self.db.table("regras_notificacoes")
+                .select("*")
+                .eq("ativa", True)
+                .order("views_minimas")
+                .execute
+            )
             return response.data if response.data else []
         except Exception as e:
             logger.error(f"Erro ao buscar regras ativas: {e}")
             return []
     
     
-    async def get_unread_notification(self, video_id: str) -> Optional[Dict]:
-        """
-        Busca notificação NÃO VISTA do vídeo.
-        Retorna apenas a primeira (mais recente).
-        """
-        try:
-            response = self.db.table("notificacoes")\
-                .select("*")\
-                .eq("video_id", video_id)\
-                .eq("vista", False)\
-                .order("created_at.desc")\
-                .limit(1)\
-                .execute()
-            
-            if response.data and len(response.data) > 0:
-                return response.data[0]
-            return None
-            
-        except Exception as e:
-            logger.error(f"Erro ao buscar notificacao nao vista: {e}")
-            return None
-    
-    
-    async def get_regra_by_periodo(self, periodo_dias: int) -> Optional[Dict]:
-        """Busca regra ativa pelo período de dias"""
-        try:
-            response = self.db.table("regras_notificacoes")\
-                .select("*")\
-                .eq("periodo_dias", periodo_dias)\
-                .eq("ativa", True)\
-                .limit(1)\
-                .execute()
-            
-            if response.data and len(response.data) > 0:
-                return response.data[0]
-            return None
-            
-        except Exception as e:
-            logger.error(f"Erro ao buscar regra por periodo: {e}")
-            return None
-    
-    
-    async def video_already_seen(self, video_id: str) -> bool:
-        """
-        Verifica se video ja teve notificacao VISTA alguma vez.
-        Se sim, nunca mais cria notificação deste vídeo.
-        """
-        try:
-            response = self.db.table("notificacoes")\
-                .select("id")\
-                .eq("video_id", video_id)\
-                .eq("vista", True)\
-                .limit(1)\
-                .execute()
-            
-            return len(response.data) > 0 if response.data else False
-            
-        except Exception as e:
-            logger.error(f"Erro ao verificar se video ja foi visto: {e}")
-            return False
-    
-    
-    async def cleanup_duplicate_notifications(self, video_id: str):
+    async def get_existing_notifications(self, video_ids: List[str]) -> Tuple[Dict[str, Dict], Set[str]]:
         """
-        Remove notificações duplicadas não vistas do mesmo vídeo.
-        Mantém apenas a mais recente.
+        Notificacoes ja existentes dos videos, em consultas IN (NOTIFICATION_LOOKUP_CHUNK ids por request).
+        Retorna (nao_vistas, vistos):
+        - nao_vistas: video_id -> notificacao NAO VISTA mais recente
+        - vistos: videos que ja tiveram notificacao VISTA (nunca mais notifica)
+        Remove as duplicatas nao vistas (mantem a mais recente) num DELETE so.
         """
+        nao_vistas: Dict[str, Dict] = {}
+        vistos: Set[str] = set()
+        duplicadas: List[int] = []
+        
         try:
-            # Buscar todas notificações não vistas do vídeo
-            response = self.db.table("notificacoes")\
-                .select("id, created_at")\
-                .eq("video_id", video_id)\
-                .eq("vista", False)\
-                .order("created_at.desc")\
-                .execute()
-            
-            if response.data and len(response.data) > 1:
-                # Manter apenas a mais recente, deletar as outras
-                ids_to_delete = [n['id'] for n in response.data[1:]]
-                
-                for notif_id in ids_to_delete:
-                    self.db.table("notificacoes").delete().eq("id", notif_id).execute()
+            for i in range(0, len(video_ids), NOTIFICATION_LOOKUP_CHUNK):
+                response = await asyncio.to_thread(
+                    self.db.table("notificacoes")
+                    .select("id, video_id, vista, periodo_dias, created_at")
+                    .in_("video_id", video_ids[i:i + NOTIFICATION_LOOKUP_CHUNK])
+                    .order("created_at.desc")
+                    .execute
+                )
                 
-                logger.info(f"🧹 Removidas {len(ids_to_delete)} notificações duplicadas do vídeo")
+                for notificacao in response.data or []:
+                    video_id = notificacao['video_id']
+                    if notificacao['vista']:
+                        vistos.add(video_id)
+                    elif video_id in nao_vistas:
+                        duplicadas.append(notificacao['id'])
+                    else:
+                        nao_vistas[video_id] = notificacao
             
         except Exception as e:
-            logger.error(f"Erro ao limpar notificações duplicadas: {e}")
+            logger.error(f"Erro ao buscar notificacoes existentes: {e}")
+            return nao_vistas, vistos
+        
+        if duplicadas:
+            try:
+                for i in range(0, len(duplicadas), NOTIFICATION_LOOKUP_CHUNK):
+                    await asyncio.to_thread(
+                        self.db.table("notificacoes").delete().in_("id", duplicadas[i:i + NOTIFICATION_LOOKUP_CHUNK]).execute
+                    )
+                logger.info(f"🧹 Removidas {len(duplicadas)} notificações duplicadas")
+            except Exception as e:
+                logger.error(f"Erro ao limpar notificações duplicadas: {e}")
+        
+        return nao_vistas, vistos
     
     
     async def update_notification(self, notification_id: int, video: Dict, regra: Dict):
@@ -238,18 +240,7 @@ class NotificationChecker:
         Atualiza notificação existente com nova regra (elevação).
         """
         try:
-            # Formatar periodo e views
-            periodo_texto = self._formatar_periodo(regra['periodo_dias'])
-            views_texto = self._formatar_views(video['views_atuais'])
-            
-            # Criar mensagem
-            mensagem = (
-                f"O video '{video['titulo']}' do canal {video['nome_canal']} "
-                f"atingiu {views_texto} views nas ultimas {periodo_texto}"
-            )
-            
-            # Tipo de alerta
-            tipo_alerta = f"{views_texto}_{regra['periodo_dias']}d"
+            mensagem, tipo_alerta = self._textos_notificacao(video, regra)
             
             # Atualizar no banco
             update_data = {
@@ -261,10 +252,12 @@ class NotificationChecker:
                 'data_disparo': datetime.now(timezone.utc).isoformat()
             }
             
-            self.db.table("notificacoes")\
-                .update(update_data)\
-                .eq("id", notification_id)\
-                .execute()
+            await asyncio.to_thread(
+                self.db.table("notificacoes")
+                .update(update_data)
+                .eq("id", notification_id)
+                .execute
+            )
             
             logger.info(f"Notificacao atualizada: {mensagem}")
             
@@ -274,120 +267,192 @@ class NotificationChecker:
             logger.error(traceback.format_exc())
     
     
-    async def get_videos_that_hit_milestone(self, regra: Dict) -> List[Dict]:
+    async def get_milestone_matches(self, regras: List[Dict], canal_ids: Optional[List[int]] = None) -> List[Tuple[Dict, List[Dict]]]:
         """
-        Busca videos que atingiram o marco especificado na regra.
-        🆕 SUPORTA FILTRO POR MÚLTIPLOS SUBNICHOS
+        Videos que atingiram o marco de cada regra -> [(regra, videos)] na ordem das regras.
+        Via RPC get_notification_milestones: o Postgres cruza regras x videos x canais numa query so
+        (ja sem os videos vistos); sem a funcao, get_milestone_candidates + videos_for_regra.
         """
-        try:
-            # Calcular data de corte
-            cutoff_date = (datetime.now(timezone.utc) - timedelta(days=regra['periodo_dias'])).isoformat()
-            
-            # Buscar videos recentes com views suficientes
-            query = self.db.table("videos_historico").select(
-                "*, canais_monitorados!inner(tipo, nome_canal, subnicho)"
-            ).gte("data_publicacao", cutoff_date).gte("views_atuais", regra['views_minimas'])
-            
-            # Filtrar por tipo de canal se necessario
-            tipo_canal = regra.get('tipo_canal', 'ambos')
-            if tipo_canal != 'ambos':
-                query = query.eq("canais_monitorados.tipo", tipo_canal)
-            
-            response = query.execute()
-            
-            # Processar resultados
-            videos = []
-            if response.data:
-                for item in response.data:
-                    canal_info = item.get('canais_monitorados', {})
-                    video_subnicho = canal_info.get('subnicho')
+        if self._milestones_rpc_available:
+            try:
+                regras_por_id = {regra['id']: regra for regra in regras}
+                videos_por_id: Dict[Any, List[Dict]] = {regra['id']: [] for regra in regras}
+                
+                offset = 0
+                while True:
+                    response = await asyncio.to_thread(
+                        self.db.rpc("get_notification_milestones", {"p_canal_ids": canal_ids})
+                        .range(offset, offset + MILESTONE_PAGE_SIZE - 1)
+                        .execute
+                    )
+                    rows = response.data or []
                     
-                    # 🆕 FILTRAR POR SUBNICHOS DA REGRA
-                    if regra.get('subnichos'):
-                        # Se regra tem subnichos específicos, verificar se vídeo está na lista
-                        if video_subnicho not in regra['subnichos']:
-                            continue  # Pula este vídeo
-                    # Se regra não tem subnichos, aceita TODOS
+                    for row in rows:
+                        regra = regras_por_id.get(row.pop('regra_id'))
+                        if regra is None:
+                            # Regra ativada/desativada entre as duas consultas
+                            continue
+                        # Se regra não tem subnichos, aceita TODOS
+                        if regra.get('subnichos') and row['subnicho'] not in regra['subnichos']:
+                            continue
+                        videos_por_id[regra['id']].append(row)
                     
-                    videos.append({
-                        'video_id': item['video_id'],
-                        'titulo': item['titulo'],
-                        'canal_id': item['canal_id'],
-                        'nome_canal': canal_info.get('nome_canal', 'Unknown'),
-                        'tipo_canal': canal_info.get('tipo', 'minerado'),
-                        'views_atuais': item['views_atuais'],
-                        'data_publicacao': item['data_publicacao']
-                    })
+                    if len(rows) < MILESTONE_PAGE_SIZE:
+                        break
+                    offset += MILESTONE_PAGE_SIZE
+                
+                return [(regra, videos_por_id[regra['id']]) for regra in regras]
+            
+            except APIError as e:
+                # PGRST202: função não existe (migration não aplicada)
+                if e.code != "PGRST202":
+                    logger.error(f"Erro ao buscar marcos via RPC: {e}")
+                    return [(regra, []) for regra in regras]
+                logger.warning("get_notification_milestones não existe - filtrando candidatos na aplicação")
+                self._milestones_rpc_available = False
+        
+        # Uma busca de videos para todas as regras
+        candidatos = await self.get_milestone_candidates(regras, canal_ids)
+        return [(regra, self.videos_for_regra(candidatos, regra)) for regra in regras]
+    
+    
+    async def get_milestone_candidates(self, regras: List[Dict], canal_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Uma busca para todas as regras: videos publicados dentro do MAIOR periodo com views >= MENOR marco.
+        Cada regra filtra essa lista em memoria (videos_for_regra) - uma query por verificacao, nao uma por regra.
+        Um registro por video (coleta mais recente = mais views).
+        canal_ids: restringe aos videos desses canais (None = todos)
+        """
+        try:
+            maior_periodo = max(regra['periodo_dias'] for regra in regras)
+            menor_marco = min(regra['views_minimas'] for regra in regras)
+            cutoff_date = (datetime.now(timezone.utc) - timedelta(days=maior_periodo)).isoformat()
+            
+            tipos = {regra.get('tipo_canal', 'ambos') for regra in regras}
+            
+            candidatos: Dict[str, Dict] = {}
+            offset = 0
+            while True:
+                query = self.db.table("videos_historico").select(
+                    "video_id, titulo, canal_id, views_atuais, data_publicacao, canais_monitorados!inner(tipo, nome_canal, subnicho)"
+                ).gte("data_publicacao", cutoff_date).gte("views_atuais", menor_marco)
+                
+                # Todas as regras no mesmo tipo de canal: filtra ja no banco
+                if len(tipos) == 1 and 'ambos' not in tipos:
+                    query = query.eq("canais_monitorados.tipo", next(iter(tipos)))
+                
+                if canal_ids is not None:
+                    query = query.in_("canal_id", canal_ids)
+                
+                # Paginado: o PostgREST corta em max-rows (1000) sem avisar
+                response = await asyncio.to_thread(query.order("id").range(offset, offset + MILESTONE_PAGE_SIZE - 1).execute)
+                rows = response.data or []
+                
+                for item in rows:
+                    atual = candidatos.get(item['video_id'])
+                    if atual is None or item['views_atuais'] > atual['views_atuais']:
+                        canal_info = item.get('canais_monitorados') or {}
+                        candidatos[item['video_id']] = {
+                            'video_id': item['video_id'],
+                            'titulo': item['titulo'],
+                            'canal_id': item['canal_id'],
+                            'nome_canal': canal_info.get('nome_canal', 'Unknown'),
+                            'tipo_canal': canal_info.get('tipo', 'minerado'),
+                            'subnicho': canal_info.get('subnicho'),
+                            'views_atuais': item['views_atuais'],
+                            'data_publicacao': item['data_publicacao'],
+                            'publicado_em': datetime.fromisoformat(item['data_publicacao'].replace('Z', '+00:00'))
+                        }
+                
+                if len(rows) < MILESTONE_PAGE_SIZE:
+                    break
+                offset += MILESTONE_PAGE_SIZE
             
-            return videos
+            return list(candidatos.values())
             
         except Exception as e:
             logger.error(f"Erro ao buscar videos que atingiram marco: {e}")
             return []
     
     
-    async def create_notification(self, video: Dict, regra: Dict):
+    def videos_for_regra(self, candidatos: List[Dict], regra: Dict) -> List[Dict]:
         """
-        Cria uma nova notificacao no banco de dados.
+        Videos (de get_milestone_candidates) que atingiram o marco da regra.
+        🆕 SUPORTA FILTRO POR MÚLTIPLOS SUBNICHOS
         """
-        try:
-            # Formatar periodo e views
-            periodo_texto = self._formatar_periodo(regra['periodo_dias'])
-            views_texto = self._formatar_views(video['views_atuais'])
-            
-            # Criar mensagem
-            mensagem = (
-                f"O video '{video['titulo']}' do canal {video['nome_canal']} "
-                f"atingiu {views_texto} views nas ultimas {periodo_texto}"
-            )
-            
-            # Tipo de alerta
-            tipo_alerta = f"{views_texto}_{regra['periodo_dias']}d"
-            
-            # Inserir no banco
-            notification_data = {
-                'video_id': video['video_id'],
-                'canal_id': video['canal_id'],
-                'nome_video': video['titulo'],
-                'nome_canal': video['nome_canal'],
-                'tipo_canal': video.get('tipo_canal', 'minerado'),
-                'views_atingidas': video['views_atuais'],
-                'periodo_dias': regra['periodo_dias'],
-                'tipo_alerta': tipo_alerta,
-                'mensagem': mensagem,
-                'vista': False,
-                'data_disparo': datetime.now(timezone.utc).isoformat()
-            }
-            
-            self.db.table("notificacoes").insert(notification_data).execute()
-            
-            logger.info(f"Notificacao criada: {mensagem}")
-            
-        except Exception as e:
-            logger.error(f"Erro ao criar notificacao: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+        cutoff = datetime.now(timezone.utc) - timedelta(days=regra['periodo_dias'])
+        tipo_canal = regra.get('tipo_canal', 'ambos')
+        subnichos = regra.get('subnichos')
+        
+        return [
+            video for video in candidatos
+            if video['views_atuais'] >= regra['views_minimas']
+            and video['publicado_em'] >= cutoff
+            and (tipo_canal == 'ambos' or video['tipo_canal'] == tipo_canal)
+            # Se regra não tem subnichos, aceita TODOS
+            and (not subnichos or video['subnicho'] in subnichos)
+        ]
+    
+    
+    def build_notification(self, video: Dict, regra: Dict) -> Dict:
+        """
+        Monta a linha de notificacao (sem ir ao banco) - inserida por create_notifications.
+        """
+        mensagem, tipo_alerta = self._textos_notificacao(video, regra)
+        
+        return {
+            'video_id': video['video_id'],
+            'canal_id': video['canal_id'],
+            'nome_video': video['titulo'],
+            'nome_canal': video['nome_canal'],
+            'tipo_canal': video.get('tipo_canal', 'minerado'),
+            'views_atingidas': video['views_atuais'],
+            'periodo_dias': regra['periodo_dias'],
+            'tipo_alerta': tipo_alerta,
+            'mensagem': mensagem,
+            'vista': False,
+            'data_disparo': datetime.now(timezone.utc).isoformat()
+        }
+    
+    
+    async def create_notifications(self, notificacoes: List[Dict]):
+        """
+        Insere as notificacoes novas em lote (um INSERT por NOTIFICATION_BATCH_SIZE linhas).
+        Um lote com erro so loga - os outros seguem.
+        """
+        for i in range(0, len(notificacoes), NOTIFICATION_BATCH_SIZE):
+            lote = notificacoes[i:i + NOTIFICATION_BATCH_SIZE]
+            try:
+                await asyncio.to_thread(self.db.table("notificacoes").insert(lote, returning="minimal").execute)
+                logger.info(f"Notificacoes criadas: {len(lote)}")
+                
+            except Exception as e:
+                logger.error(f"Erro ao criar notificacoes: {e}")
+                import traceback
+                logger.error(traceback.format_exc())
+    
+    
+    def _textos_notificacao(self, video: Dict, regra: Dict) -> Tuple[str, str]:
+        """(mensagem, tipo_alerta) da notificacao - mesmo texto na criacao e na elevacao"""
+        periodo_texto = self._formatar_periodo(regra['periodo_dias'])
+        views_texto = self._formatar_views(video['views_atuais'])
+        
+        mensagem = (
+            f"O video '{video['titulo']}' do canal {video['nome_canal']} "
+            f"atingiu {views_texto} views nas ultimas {periodo_texto}"
+        )
+        return mensagem, f"{views_texto}_{regra['periodo_dias']}d"
     
     
     def _formatar_periodo(self, periodo_dias: int) -> str:
         """Formata período em texto legível"""
-        if periodo_dias == 1:
-            return "24 horas"
-        elif periodo_dias == 3:
-            return "3 dias"
-        elif periodo_dias == 7:
-            return "7 dias"
-        elif periodo_dias == 14:
-            return "2 semanas"
-        else:
-            return f"{periodo_dias} dias"
+        return _PERIOD_MAP.get(periodo_dias) or f"{periodo_dias} dias"
     
     
     def _formatar_views(self, views: int) -> str:
         """Formata views em texto legível"""
         if views >= 1000000:
             return f"{views/1000000:.1f}M"
-        elif views >= 1000:
+        if views >= 1000:
             return f"{views/1000:.0f}k"
-        else:
-            return str(views)
+        return str(views)